@@ -16,6 +16,7 @@ import re
 import sqlite3
 import sys
 import urllib.parse
+from collections.abc import Iterable
 from datetime import datetime, timezone
 from typing import NoReturn
 
@@ -199,6 +200,40 @@ def open_db(db_path: str) -> sqlite3.Connection:
     return conn
 
 
+def load_temp_keys(
+    conn: sqlite3.Connection,
+    table: str,
+    key_type: str,
+    values: Iterable[object],
+) -> None:
+    """Replace the rows of ``temp.<table>`` with the distinct ``values``.
+
+    Lets a query join against a large key set instead of binding an
+    ``IN (...)`` list. ``open_db`` sets ``query_only``, which refuses TEMP
+    writes too, so it is lifted for the load only; ``mode=ro`` keeps the
+    main database read-only throughout.
+    """
+    (query_only,) = conn.execute("PRAGMA query_only").fetchone()
+    conn.execute("PRAGMA query_only = OFF")
+    try:
+        conn.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {table} (key {key_type} PRIMARY KEY) WITHOUT ROWID"
+        )
+        began = not conn.in_transaction
+        if began:
+            conn.execute("BEGIN")
+        conn.execute(f"DELETE FROM temp.{table}")
+        conn.executemany(
+            f"INSERT OR IGNORE INTO temp.{table} (key) VALUES (?)",
+            ((value,) for value in values),
+        )
+        if began:
+            conn.commit()
+    finally:
+        if query_only:
+            conn.execute("PRAGMA query_only = ON")
+
+
 def resolve_snapshot(
     conn: sqlite3.Connection, selector: tuple[str, int | str] | None
 ) -> sqlite3.Row | None:
@@ -7,7 +7,8 @@ the per-target SQLite, fetches only the dblocks that contain the file's
 content blocks, decrypts them through the AES Crypt File Format wrapper, and
 writes the plaintext to a destination file, stdout, or an output directory
 when in glob mode. Encrypted dblocks are cached on disk under an LRU policy;
-plaintext never persists outside the operator-chosen sink.
+plaintext persists outside the operator-chosen sink only in the opt-in
+decrypted-volume and block caches (--decrypted-cache-size, --block-cache-size).
 """
 
 from __future__ import annotations
@@ -18,23 +19,32 @@ import binascii
 import collections
 import contextlib
 import errno
+import fcntl
 import fnmatch
 import hashlib
 import io
+import itertools
 import json
+import mmap
 import os
 import re
+import shutil
 import sqlite3
 import stat
 import struct
 import sys
+import tarfile
+import tempfile
+import threading
 import time
 import urllib.parse
 import zipfile
-from collections.abc import Iterator
+import zlib
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable
+from typing import BinaryIO, Callable
 
 # Self-bootstrap: import the sibling duplicati_r2_common module regardless of
 # how the script was launched (direct path, $out/bin symlink, $PATH).
@@ -47,14 +57,17 @@ from duplicati_r2_common import (  # noqa: E402
     EXIT_USAGE,
     exact_match_variants,
     fail,
+    human_size,
     iso_utc,
     load_manifest,
+    load_temp_keys,
     open_db,
     parse_snapshot,
     resolve_db_path,
     resolve_snapshot,
     sanitize_slug,
     set_program_name,
+    warn,
 )
 
 DEFAULT_ENV_FILE = "/etc/duplicati/r2.env"
@@ -62,8 +75,30 @@ DEFAULT_CACHE_BYTES = 1 * 1024 * 1024 * 1024  # 1 GiB
 DEFAULT_CACHE_DIR = (
     os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")) + "/duplicati-r2-tools"
 )
+DEFAULT_DECRYPT_SPOOL_BYTES = 8 * 1024 * 1024  # 8 MiB
+FETCH_CHUNK_BYTES = 1024 * 1024
+HASH_BATCH_BYTES = 1024 * 1024
+# hashlib only releases the GIL for updates larger than this, so a hash pool
+# cannot overlap smaller blocks with reading and only adds handoff cost.
+HASHLIB_GIL_MINSIZE = 2048
+RANGE_RESUME_ATTEMPTS = 5
+# botocore's own default pool size; raised to cover concurrent fetchers.
+S3_DEFAULT_CONNECTIONS = 10
 MAX_OPEN_VOLUMES = 16
-SQLITE_BIND_SAFETY_MARGIN = 1
+PREFETCH_DEFAULT_PARALLEL = 4
+PREFETCH_PROGRESS_SECONDS = 2.0
+DECRYPTED_INDEX_NAME = "index.sqlite"
+DECRYPTED_LOCK_NAME = "index.lock"
+# How long a decrypted-cache index query waits on another process's write.
+DECRYPTED_INDEX_BUSY_SECONDS = 30.0
+JOURNAL_NAME = ".duplicati-r2-extract.journal"
+CACHE_LOCK_NAME = ".lock"
+CACHE_INDEX_NAME = ".index.sqlite"
+CACHE_INDEX_VERSION = 2
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+# ioctl(2) FICLONERANGE = _IOW(0x94, 13, struct file_clone_range).
+FICLONERANGE = 0x4020940D
+FILE_CLONE_RANGE = struct.Struct("qQQQ")
 
 set_program_name("duplicati-r2-extract")
 
@@ -262,6 +297,134 @@ def load_env_file(path: str) -> dict[str, str]:
     return env
 
 
+# ---------------------------------------------------------------------------
+# Stage timing
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class StageSpan:
+    """One timed stretch of a stage; the body sets ``bytes`` once known."""
+
+    bytes: int = 0
+
+
+class StageTally:
+    """Unlocked per-stage counters for one thread's block loop.
+
+    Per-block stages are added here with plain ``perf_counter`` deltas and
+    folded into the shared ``StageTimes`` once per file or hash batch, so
+    the block loop takes no lock and enters no context manager.
+    """
+
+    __slots__ = ("seconds", "bytes", "calls")
+
+    def __init__(self) -> None:
+        self.seconds: collections.Counter[str] = collections.Counter()
+        self.bytes: collections.Counter[str] = collections.Counter()
+        self.calls: collections.Counter[str] = collections.Counter()
+
+    def add(self, stage: str, started: float, nbytes: int) -> None:
+        """Count one call of ``stage`` that began at ``perf_counter`` ``started``."""
+        self.seconds[stage] += time.perf_counter() - started
+        self.bytes[stage] += nbytes
+        self.calls[stage] += 1
+
+
+class StageTimes:
+    """Cumulative wall time, bytes and call counts per pipeline stage.
+
+    One instance is shared by every thread of a run, so stages that run in
+    parallel (prefetch, hashing on the pool, writer workers) can add up to
+    more than ``elapsed_seconds``. With ``trace`` set, spans given a
+    ``label`` (a volume name, or a path for whole-file spans) are also kept
+    as Chrome trace events for ``write_trace``; per-block stages are only
+    counted, so a large restore does not produce millions of events.
+
+    Only ``--json`` and ``--trace`` read the timers. Otherwise ``enabled``
+    is False: ``span`` costs a null context and ``tally`` returns None, so
+    the block loop skips its timing entirely.
+    """
+
+    def __init__(self, trace: bool = False, enabled: bool = True):
+        self.enabled = enabled or trace
+        self._lock = threading.Lock()
+        self._seconds: collections.Counter[str] = collections.Counter()
+        self._bytes: collections.Counter[str] = collections.Counter()
+        self._calls: collections.Counter[str] = collections.Counter()
+        self._origin = time.perf_counter()
+        self.events: list[dict[str, object]] | None = [] if trace else None
+
+    def span(
+        self, stage: str, label: str | None = None
+    ) -> contextlib.AbstractContextManager[StageSpan]:
+        """Time one per-volume or per-file stretch of ``stage``."""
+        if not self.enabled:
+            return contextlib.nullcontext(StageSpan())
+        return self._span(stage, label)
+
+    def tally(self) -> StageTally | None:
+        """A fresh ``StageTally`` for a block loop, or None when disabled."""
+        return StageTally() if self.enabled else None
+
+    def merge(self, tally: StageTally | None) -> None:
+        if tally is None:
+            return
+        with self._lock:
+            self._seconds.update(tally.seconds)
+            self._bytes.update(tally.bytes)
+            self._calls.update(tally.calls)
+
+    @contextlib.contextmanager
+    def _span(self, stage: str, label: str | None) -> Iterator[StageSpan]:
+        span = StageSpan()
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._seconds[stage] += seconds
+                self._bytes[stage] += span.bytes
+                self._calls[stage] += 1
+                if self.events is not None and label is not None:
+                    self.events.append(
+                        {
+                            "name": stage,
+                            "cat": "extract",
+                            "ph": "X",
+                            "ts": round((started - self._origin) * 1e6),
+                            "dur": round(seconds * 1e6),
+                            "pid": os.getpid(),
+                            "tid": threading.get_ident(),
+                            "args": {"label": label, "bytes": span.bytes},
+                        }
+                    )
+
+    def summary(self) -> dict[str, dict[str, float | int]]:
+        with self._lock:
+            return {
+                stage: {
+                    "seconds": round(self._seconds[stage], 3),
+                    "bytes": self._bytes[stage],
+                    "calls": self._calls[stage],
+                }
+                for stage in sorted(self._calls)
+            }
+
+    def write_trace(self, path: str) -> None:
+        """Write the collected events as Chrome trace JSON (mode 0600)."""
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_NOFOLLOW", 0)
+        try:
+            fd = os.open(path, flags, 0o600)
+        except OSError as exc:
+            fail(f"failed to open --trace file {path}: {exc}", EXIT_OPEN_ERR)
+        with self._lock:
+            events = list(self.events or [])
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+
+
 # ---------------------------------------------------------------------------
 # Source transports
 # ---------------------------------------------------------------------------
@@ -273,6 +436,51 @@ class Source:
     def fetch(self, volume_name: str) -> bytes:  # pragma: no cover - interface
         raise NotImplementedError
 
+    def fetch_into(self, volume_name: str, sink: BinaryIO, offset: int = 0) -> None:
+        """Append the object's bytes from ``offset`` onward to ``sink``.
+
+        ``offset`` is the length of a prefix the caller already holds (a
+        cache partial left by an interrupted download). Volume names are
+        never reused for different content, so any earlier prefix is still
+        valid; the AES Crypt HMAC catches one that is not.
+        """
+        sink.write(self.fetch(volume_name)[offset:])
+
+    def fetch_many(
+        self,
+        volume_names: Iterable[str],
+        max_in_flight: int,
+    ) -> Iterator[tuple[str, bytes]]:
+        """Fetch ``volume_names`` concurrently; yield ``(name, body)`` as each lands.
+
+        At most ``max_in_flight`` requests, and bodies not yet consumed, are
+        outstanding at once. ``volume_names`` is consumed lazily, so a long
+        list is never queued up front. Closing the generator early cancels
+        requests that have not started; a failed fetch re-raises here.
+        Bodies bypass the cache: restores go through ``open_from_source``.
+        """
+        names = iter(volume_names)
+        running: dict[Future[bytes], str] = {}
+        with ThreadPoolExecutor(
+            max_workers=max_in_flight,
+            thread_name_prefix="duplicati-r2-fetch",
+        ) as pool:
+            try:
+                while True:
+                    while len(running) < max_in_flight:
+                        name = next(names, None)
+                        if name is None:
+                            break
+                        running[pool.submit(self.fetch, name)] = name
+                    if not running:
+                        return
+                    done, _pending = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield running.pop(future), future.result()
+            finally:
+                for future in running:
+                    future.cancel()
+
 
 def validate_volume_name(volume_name: str) -> None:
     if not volume_name or volume_name in {".", ".."} or "/" in volume_name or "\\" in volume_name:
@@ -308,9 +516,29 @@ class FileSource(Source):
         except OSError as exc:
             fail(f"failed to read {target}: {exc}", EXIT_OPEN_ERR)
 
+    def fetch_into(self, volume_name: str, sink: BinaryIO, offset: int = 0) -> None:
+        validate_volume_name(volume_name)
+        target = self.base / volume_name
+        try:
+            with open(target, "rb") as fh:
+                fh.seek(offset)
+                shutil.copyfileobj(fh, sink, FETCH_CHUNK_BYTES)
+        except FileNotFoundError:
+            fail(f"missing volume in file source: {target}", EXIT_OPEN_ERR)
+        except OSError as exc:
+            fail(f"failed to read {target}: {exc}", EXIT_OPEN_ERR)
+
 
 class S3Source(Source):
-    """Fetches encrypted volumes from an S3-compatible endpoint (R2)."""
+    """Fetches encrypted volumes from an S3-compatible endpoint (R2).
+
+    One botocore client is shared by every thread that fetches (read-ahead,
+    ``--prefetch`` warm-up, writer workers, ``fetch_many``); it is
+    thread-safe, and its urllib3 pool keeps up to ``max_connections``
+    connections alive so concurrent GETs do not each pay a fresh TLS
+    handshake. The endpoint is any S3 API; the regression checks run it
+    against a local moto server.
+    """
 
     def __init__(
         self,
@@ -320,6 +548,7 @@ class S3Source(Source):
         prefix: str,
         access_key: str,
         secret_key: str,
+        max_connections: int = S3_DEFAULT_CONNECTIONS,
     ):
         try:
             import boto3  # type: ignore
@@ -339,33 +568,76 @@ class S3Source(Source):
             config=Config(
                 signature_version="s3v4",
                 retries={"max_attempts": 5, "mode": "adaptive"},
+                max_pool_connections=max_connections,
             ),
         )
 
     def fetch(self, volume_name: str) -> bytes:
+        buf = io.BytesIO()
+        self.fetch_into(volume_name, buf)
+        return buf.getvalue()
+
+    def fetch_into(self, volume_name: str, sink: BinaryIO, offset: int = 0) -> None:
+        """Stream the object into ``sink``, resuming dropped bodies by Range.
+
+        botocore retries failed requests, but not a body that breaks off
+        mid-stream; without this a dropped connection late in a 50 MB
+        dblock restarts it from byte 0. Each resume asks for the remaining
+        ``bytes=<offset>-`` pinned to the first response's ETag.
+        """
         from botocore.exceptions import ClientError  # type: ignore
 
         validate_volume_name(volume_name)
         key = f"{self._prefix}/{volume_name}" if self._prefix else volume_name
-        try:
-            resp = self._client.get_object(Bucket=self._bucket, Key=key)
-            return resp["Body"].read()
-        except ClientError as exc:  # pragma: no cover - network path
-            code = exc.response.get("Error", {}).get("Code", "")
-            if code in {"NoSuchKey", "404", "NotFound"}:
+        url = f"s3://{self._bucket}/{key}"
+        etag: str | None = None
+        total: int | None = None
+        attempts = 0
+        while True:
+            request = {"Bucket": self._bucket, "Key": key}
+            if offset:
+                request["Range"] = f"bytes={offset}-"
+            if etag:
+                request["IfMatch"] = etag
+            try:
+                resp = self._client.get_object(**request)
+            except ClientError as exc:
+                code = exc.response.get("Error", {}).get("Code", "")
+                if code == "InvalidRange" and offset and etag is None:
+                    # The surviving partial already holds the whole object
+                    # (crash between download and rename); HMAC verifies it.
+                    return
+                if code in {"NoSuchKey", "404", "NotFound"}:
+                    fail(f"missing volume on R2: {url}", EXIT_OPEN_ERR)
+                if code in {"PreconditionFailed", "412"}:
+                    fail(f"{url} changed while resuming its download", EXIT_DATA_ERR)
+                fail(f"R2 GET failed for {url}: {exc}", EXIT_OPEN_ERR)
+            except Exception as exc:  # pragma: no cover - network path
+                fail(f"R2 GET failed for {url}: {exc}", EXIT_OPEN_ERR)
+            etag = etag or resp.get("ETag")
+            if total is None:
+                total = offset + int(resp["ContentLength"])
+            body = resp["Body"]
+            error: Exception | None = None
+            while True:
+                try:
+                    chunk = body.read(FETCH_CHUNK_BYTES)
+                except Exception as exc:
+                    error = exc
+                    break
+                if not chunk:
+                    break
+                sink.write(chunk)
+                offset += len(chunk)
+            if offset >= total:
+                return
+            attempts += 1
+            if attempts >= RANGE_RESUME_ATTEMPTS:
                 fail(
-                    f"missing volume on R2: s3://{self._bucket}/{key}",
+                    f"R2 GET for {url} stopped at byte {offset} of {total} after {attempts} attempts: {error or 'short body'}",
                     EXIT_OPEN_ERR,
                 )
-            fail(
-                f"R2 GET failed for s3://{self._bucket}/{key}: {exc}",
-                EXIT_OPEN_ERR,
-            )
-        except Exception as exc:  # pragma: no cover - network path
-            fail(
-                f"R2 GET failed for s3://{self._bucket}/{key}: {exc}",
-                EXIT_OPEN_ERR,
-            )
+            warn(f"R2 GET for {url} broke off at byte {offset} of {total}; resuming ({error or 'short body'})")
 
 
 @dataclass
@@ -476,6 +748,7 @@ def build_source(
     source_arg: str | None,
     env: dict[str, str],
     layout: BucketLayout,
+    max_connections: int = S3_DEFAULT_CONNECTIONS,
 ) -> Source:
     arg = source_arg or "s3://default"
     parsed = urllib.parse.urlparse(arg)
@@ -523,6 +796,7 @@ def build_source(
             layout.key_prefix,
             access,
             secret,
+            max_connections,
         )
     fail(f"unsupported --source scheme: {parsed.scheme!r}", EXIT_USAGE)
 
@@ -532,6 +806,92 @@ def build_source(
 # ---------------------------------------------------------------------------
 
 
+def _unlink_idle_partial(path: Path, what: str = "stale cache partial") -> None:
+    """Remove a partial unless a writer, in any process, still holds its flock.
+
+    Every cache writes through ``<name>.partial`` under an exclusive
+    ``flock`` held until the rename, so only partials an interrupted writer
+    left behind are removed.
+    """
+    flags = os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0)
+    try:
+        fd = os.open(str(path), flags)
+    except FileNotFoundError:
+        return
+    except OSError:
+        fd = None  # a planted symlink or other non-file; nobody writes through it
+    try:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if not _is_same_file(fd, path):
+                return
+        path.unlink()
+    except BlockingIOError:
+        return
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        fail(f"failed to remove {what} {path}: {exc}", EXIT_OPEN_ERR)
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def _is_same_file(fd: int, path: Path) -> bool:
+    """Whether ``path`` still names the file open on ``fd``."""
+    st = os.fstat(fd)
+    try:
+        current = os.stat(path, follow_symlinks=False)
+    except FileNotFoundError:
+        return False
+    return (current.st_dev, current.st_ino) == (st.st_dev, st.st_ino)
+
+
+def _create_partial(path: Path, what: str) -> int | None:
+    """Create ``path`` exclusively and hold a ``flock`` on it until closed.
+
+    Returns None when it already exists: another writer, possibly in another
+    process sharing the cache directory, is storing the same content, so
+    the caller just skips caching it.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+    try:
+        fd = os.open(str(path), flags, 0o600)
+    except FileExistsError:
+        return None
+    except OSError as exc:
+        fail(f"failed to create {what} {path}: {exc}", EXIT_OPEN_ERR)
+    # Uncontended unless a sweep opened it first; that sweep then unlinks it
+    # and _commit_partial sees the partial is gone.
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def _commit_partial(fd: int, tmp: Path, target: Path) -> bool:
+    """Rename the partial ``tmp`` held on ``fd`` to ``target``.
+
+    Returns False, leaving ``target`` alone, if ``tmp`` was swept before
+    this writer locked it; the caller then does not cache the content.
+    """
+    if not _is_same_file(fd, tmp):
+        return False
+    try:
+        os.replace(tmp, target)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _discard_partial(fd: int, tmp: Path) -> None:
+    """Remove an uncommitted partial if ``tmp`` still names this writer's file."""
+    if not _is_same_file(fd, tmp):
+        return
+    try:
+        tmp.unlink()
+    except FileNotFoundError:
+        pass
+
+
 class EncryptedCache:
     """LRU cache of encrypted dblocks on disk.
 
@@ -539,18 +899,36 @@ class EncryptedCache:
     bytes. The cache enforces a byte cap (`cap_bytes`); insertion evicts the
     least-recently-used entries until the new entry fits. ``cap_bytes == 0``
     disables caching: ``get`` always re-fetches and never persists.
+
+    Sizes and LRU order live in ``.index.sqlite`` (mode 0600) in the cache
+    root, so startup does not walk the directory. The index is rebuilt from
+    a scan only when it is missing or unreadable; files it has lost track
+    of are reconciled when next looked up. It also lists the partials
+    downloads have claimed, so startup can bound the ones left behind
+    without a scan.
+
+    Safe to share between threads and between processes using the same
+    root. Index updates and disk mutations run under a thread lock plus an
+    ``flock`` on ``.lock`` in the cache root. A download holds an ``flock``
+    on its ``.partial`` until it is renamed into place, so a second fetch of
+    the same volume waits for it and then reads the cached copy.
     """
 
-    def __init__(self, root: str, cap_bytes: int):
+    def __init__(self, root: str, cap_bytes: int, stages: StageTimes | None = None):
         self.root = Path(root)
         self.cap_bytes = cap_bytes
         self.bytes_fetched = 0
         self.fetches = 0
-        self._order: collections.OrderedDict[str, int] = collections.OrderedDict()
-        self._used_bytes = 0
+        self.fetch_waits = 0
+        self.stages = stages or StageTimes()
+        self._lock = threading.RLock()
+        self._lock_fd: int | None = None
+        self._lock_depth = 0
+        self._conn: sqlite3.Connection | None = None
         if cap_bytes > 0:
             self._ensure_root()
-            self._scan_existing()
+            self._open_lock()
+            self._open_index()
 
     def _ensure_root(self) -> None:
         self.root.mkdir(parents=True, exist_ok=True, mode=0o700)
@@ -567,20 +945,94 @@ class EncryptedCache:
                 EXIT_OPEN_ERR,
             )
 
+    def _open_lock(self) -> None:
+        path = self.root / CACHE_LOCK_NAME
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0)
+        try:
+            self._lock_fd = os.open(str(path), flags, 0o600)
+        except OSError as exc:
+            fail(f"failed to open cache lock {path}: {exc}", EXIT_OPEN_ERR)
+
+    def _open_index(self) -> None:
+        index = self.root / CACHE_INDEX_NAME
+        with self._locked():
+            try:
+                self._conn = self._connect_index(index)
+                (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            except sqlite3.DatabaseError as exc:
+                warn(f"cache index {index} is unusable ({exc}); rebuilding it from the cache directory")
+                if self._conn is not None:
+                    self._conn.close()
+                for suffix in ("", "-wal", "-shm"):
+                    self._unlink_partial(Path(f"{index}{suffix}"))
+                try:
+                    self._conn = self._connect_index(index)
+                except sqlite3.DatabaseError as exc:
+                    fail(f"cache index {index} is unusable ({exc}); remove {self.root} to reset it")
+                version = 0
+            if version == CACHE_INDEX_VERSION:
+                # The cap may be smaller than last run's.
+                self._evict_until_room(0)
+                self._sweep_partials()
+            else:
+                self._scan_existing()
+
+    @staticmethod
+    def _connect_index(index: Path) -> sqlite3.Connection:
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0)
+        try:
+            os.close(os.open(str(index), flags, 0o600))
+        except OSError as exc:
+            fail(f"failed to create cache index {index}: {exc}", EXIT_OPEN_ERR)
+        conn = sqlite3.connect(str(index), check_same_thread=False)
+        # Every commit is a cache hit or store; WAL with NORMAL sync skips the
+        # per-commit fsync without risking a corrupt file on power loss.
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS volume (
+                name TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS partial (
+                name TEXT PRIMARY KEY,
+                last_used INTEGER NOT NULL
+            )
+            """
+        )
+        return conn
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the thread lock and the cache-root ``flock``."""
+        with self._lock:
+            outer = self._lock_depth == 0 and self._lock_fd is not None
+            if outer:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if outer:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
     def _scan_existing(self) -> None:
-        entries: list[tuple[float, str, int]] = []
+        """Rebuild the index from the cache directory, oldest mtime first."""
+        entries: list[tuple[int, str, int]] = []
+        partials: list[tuple[int, str]] = []
         for entry in self.root.iterdir():
+            if entry.name.startswith("."):
+                continue
             try:
-                if entry.name.endswith(".partial"):
-                    try:
-                        entry.unlink()
-                    except FileNotFoundError:
-                        pass
-                    except OSError as exc:
-                        fail(
-                            f"failed to remove stale cache partial {entry}: {exc}",
-                            EXIT_OPEN_ERR,
-                        )
+                if entry.name.endswith(".partial") and entry.is_symlink():
+                    self._unlink_partial(entry)
                     continue
                 if not entry.is_file():
                     continue
@@ -589,28 +1041,158 @@ class EncryptedCache:
                 continue
             except OSError as exc:
                 fail(f"failed to inspect cache entry {entry}: {exc}", EXIT_OPEN_ERR)
-            entries.append((st.st_mtime, entry.name, st.st_size))
-        for _mtime, name, size in sorted(entries):
-            self._remember(name, size)
+            if entry.name.endswith(".partial"):
+                partials.append((st.st_mtime_ns, entry.name))
+                continue
+            entries.append((st.st_mtime_ns, entry.name, st.st_size))
+        with self._conn:
+            self._conn.execute("DELETE FROM volume")
+            self._conn.executemany(
+                "INSERT INTO volume (name, size, last_used) VALUES (?, ?, ?)",
+                ((name, size, mtime) for mtime, name, size in entries),
+            )
+            self._conn.execute("DELETE FROM partial")
+            self._conn.executemany(
+                "INSERT INTO partial (name, last_used) VALUES (?, ?)",
+                ((name.removesuffix(".partial"), mtime) for mtime, name in partials),
+            )
+            self._conn.execute(f"PRAGMA user_version = {CACHE_INDEX_VERSION}")
         self._evict_until_room(0)
+        self._sweep_partials()
 
-    def _remember(self, volume_name: str, size: int) -> None:
-        previous = self._order.get(volume_name)
-        if previous is not None:
-            self._used_bytes -= previous
-        self._order[volume_name] = size
-        self._used_bytes += size
+    def _sweep_partials(self) -> None:
+        """Bound the partials that interrupted downloads left behind.
 
-    def _forget(self, volume_name: str) -> bool:
-        size = self._order.pop(volume_name, None)
-        if size is None:
+        A partial is a prefix of its (immutable) volume, kept so the next
+        fetch resumes from there. Idle ones are kept newest first while
+        they fit in ``cap_bytes`` alongside the cached volumes; the rest,
+        and any whose volume is cached already, are removed. Partials
+        another process is still writing are left alone but still count.
+        """
+        (used,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM volume").fetchone()
+        rows = self._conn.execute("SELECT name FROM partial ORDER BY last_used DESC").fetchall()
+        for (name,) in rows:
+            path = self.root / f"{name}.partial"
+            try:
+                size = os.stat(path, follow_symlinks=False).st_size
+            except FileNotFoundError:
+                size = None
+            except OSError as exc:
+                fail(f"failed to inspect cache partial {path}: {exc}", EXIT_OPEN_ERR)
+            if size is not None and (used + size > self.cap_bytes or self.contains(name)):
+                _unlink_idle_partial(path)
+                if not os.path.lexists(path):
+                    size = None
+            if size is None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM partial WHERE name = ?", (name,))
+            else:
+                used += size
+
+    def _unlink_partial(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            fail(f"failed to remove stale cache partial {path}: {exc}", EXIT_OPEN_ERR)
+
+    def _abandon_partial(self, path: Path) -> None:
+        """Remove a claimed partial that the cache no longer needs."""
+        self._unlink_partial(path)
+        with self._locked(), self._conn:
+            self._conn.execute(
+                "DELETE FROM partial WHERE name = ?", (path.name.removesuffix(".partial"),)
+            )
+
+    def _claim_partial(self, path: Path, wait: bool) -> BinaryIO | None:
+        """Open ``path`` under an exclusive ``flock`` for writing.
+
+        Returns None if another fetch holds it and ``wait`` is false, or if
+        the partial was renamed into place or removed while this one waited;
+        the caller then looks in the cache again. An existing partial is
+        kept for the caller to resume or truncate.
+        """
+        # No O_EXCL: an existing partial is the prefix to resume from.
+        # O_NOFOLLOW still refuses a planted final-component symlink.
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0)
+        try:
+            fd = os.open(str(path), flags, 0o600)
+        except OSError as exc:
+            if exc.errno != errno.ELOOP:
+                fail(f"failed to open cache partial {path}: {exc}", EXIT_OPEN_ERR)
+            self._unlink_partial(path)
+            return self._claim_partial(path, wait)
+        fh = os.fdopen(fd, "r+b")
+        try:
+            if wait and not self._try_flock(fd):
+                with self.stages.span("fetch_wait", path.name):
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                with self._lock:
+                    self.fetch_waits += 1
+            elif not wait and not self._try_flock(fd):
+                fh.close()
+                return None
+            st = os.fstat(fd)
+            try:
+                current = os.stat(path, follow_symlinks=False)
+            except FileNotFoundError:
+                current = None
+        except BaseException:
+            fh.close()
+            raise
+        if current is None or (current.st_dev, current.st_ino) != (st.st_dev, st.st_ino):
+            fh.close()
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            fh.close()
+            fail(f"cache partial is not a regular file: {path}", EXIT_OPEN_ERR)
+        with self._locked(), self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO partial (name, last_used) VALUES (?, ?)",
+                (path.name.removesuffix(".partial"), time.time_ns()),
+            )
+        return fh
+
+    @staticmethod
+    def _try_flock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
             return False
-        self._used_bytes -= size
         return True
 
+    @property
+    def _used_bytes(self) -> int:
+        if self._conn is None:
+            return 0
+        with self._locked():
+            (used,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM volume").fetchone()
+        return used
+
+    def _remember(self, volume_name: str, size: int) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO volume (name, size, last_used) VALUES (?, ?, ?)",
+                (volume_name, size, time.time_ns()),
+            )
+            # Its partial, if any, was just renamed into place.
+            self._conn.execute("DELETE FROM partial WHERE name = ?", (volume_name,))
+
+    def _forget(self, volume_name: str) -> bool:
+        with self._conn:
+            cur = self._conn.execute("DELETE FROM volume WHERE name = ?", (volume_name,))
+        return cur.rowcount > 0
+
     def _evict_until_room(self, incoming_size: int) -> None:
-        while self._used_bytes + incoming_size > self.cap_bytes and self._order:
-            name, n = self._order.popitem(last=False)
+        (used,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM volume").fetchone()
+        while used + incoming_size > self.cap_bytes:
+            row = self._conn.execute(
+                "SELECT name, size FROM volume ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return
+            name, n = row
             try:
                 (self.root / name).unlink()
             except FileNotFoundError:
@@ -620,24 +1202,72 @@ class EncryptedCache:
                     f"failed to evict cached volume {self.root / name}: {exc}",
                     EXIT_OPEN_ERR,
                 )
-            self._used_bytes -= n
+            self._forget(name)
+            used -= n
 
     def evict(self, volume_name: str) -> bool:
         validate_volume_name(volume_name)
-        known = self._forget(volume_name)
-        removed = False
-        try:
-            (self.root / volume_name).unlink()
-            removed = True
-        except FileNotFoundError:
-            pass
-        except OSError as exc:
-            fail(
-                f"failed to evict cached volume {self.root / volume_name}: {exc}",
-                EXIT_OPEN_ERR,
-            )
+        if self._conn is None:
+            return False
+        with self._locked():
+            _unlink_idle_partial(self.root / f"{volume_name}.partial")
+            known = self._forget(volume_name)
+            removed = False
+            try:
+                (self.root / volume_name).unlink()
+                removed = True
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                fail(
+                    f"failed to evict cached volume {self.root / volume_name}: {exc}",
+                    EXIT_OPEN_ERR,
+                )
         return known or removed
 
+    def contains(self, volume_name: str) -> bool:
+        """Whether ``volume_name`` is currently tracked as a cached entry."""
+        if self._conn is None:
+            return False
+        with self._locked():
+            row = self._conn.execute(
+                "SELECT 1 FROM volume WHERE name = ?", (volume_name,)
+            ).fetchone()
+        return row is not None
+
+    def _touch(self, volume_name: str) -> Path | None:
+        """Mark an entry most-recently-used and return its path.
+
+        A file the index does not know (a crash between rename and index
+        commit, or a copy dropped in by hand) is adopted here rather than
+        by scanning the whole directory at startup.
+        """
+        path = self.root / volume_name
+        with self._locked():
+            with self._conn:
+                cur = self._conn.execute(
+                    "UPDATE volume SET last_used = ? WHERE name = ?",
+                    (time.time_ns(), volume_name),
+                )
+            if cur.rowcount:
+                return path
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except FileNotFoundError:
+                return None
+            except OSError as exc:
+                fail(f"failed to inspect cache entry {path}: {exc}", EXIT_OPEN_ERR)
+            if not stat.S_ISREG(st.st_mode) or st.st_size > self.cap_bytes:
+                return None
+            self._evict_until_room(st.st_size)
+            self._remember(volume_name, st.st_size)
+            return path
+
+    def _count_fetch(self, size: int) -> None:
+        with self._lock:
+            self.bytes_fetched += size
+            self.fetches += 1
+
     def get(self, volume_name: str, fetcher: Callable[[str], bytes]) -> bytes:
         data, _cache_hit = self.get_with_status(volume_name, fetcher)
         return data
@@ -649,93 +1279,381 @@ class EncryptedCache:
     ) -> tuple[bytes, bool]:
         validate_volume_name(volume_name)
         if self.cap_bytes <= 0:
-            data = fetcher(volume_name)
-            self.bytes_fetched += len(data)
-            self.fetches += 1
+            data = self._timed_fetch(volume_name, fetcher)
+            self._count_fetch(len(data))
             return data, False
-        if volume_name in self._order:
-            # Touch: move to end (most recently used).
-            self._order.move_to_end(volume_name)
+        cached = self._touch(volume_name)
+        if cached is not None:
             try:
-                return (self.root / volume_name).read_bytes(), True
+                return cached.read_bytes(), True
             except FileNotFoundError:
-                self._forget(volume_name)
+                with self._locked():
+                    self._forget(volume_name)
             except OSError as exc:
                 fail(
-                    f"failed to read cached volume {self.root / volume_name}: {exc}",
+                    f"failed to read cached volume {cached}: {exc}",
                     EXIT_OPEN_ERR,
                 )
-        data = fetcher(volume_name)
-        self.bytes_fetched += len(data)
-        self.fetches += 1
-        # Evict LRU until the new entry fits.
+        data = self._timed_fetch(volume_name, fetcher)
+        self._count_fetch(len(data))
+        self._store(volume_name, data)
+        return data, False
+
+    def _timed_fetch(self, volume_name: str, fetcher: Callable[[str], bytes]) -> bytes:
+        # With read-ahead the fetcher only waits for a prefetched body, so
+        # this measures the time the extractor actually stalled on the network.
+        with self.stages.span("fetch", volume_name) as span:
+            data = fetcher(volume_name)
+            span.bytes = len(data)
+        return data
+
+    def _store(self, volume_name: str, data: bytes) -> None:
         size = len(data)
         if size > self.cap_bytes:
             # Single object exceeds cache cap; bypass cache for it.
-            return data, False
-        self._evict_until_room(size)
-        self._ensure_root()
+            return
+        with self._lock:
+            self._ensure_root()
         target = self.root / volume_name
         tmp = target.with_suffix(target.suffix + ".partial")
+        fh = self._claim_partial(tmp, wait=False)
+        if fh is None:
+            # Another fetch owns the partial; it lands on its own.
+            return
+        with fh:
+            # Any resumable prefix is superseded by the full body in hand.
+            fh.truncate(0)
+            fh.write(data)
+            fh.flush()
+            with self._locked():
+                # Evict LRU until the new entry fits.
+                self._evict_until_room(size)
+                os.replace(tmp, target)
+                self._remember(volume_name, size)
+
+    def _open_cached(self, volume_name: str) -> BinaryIO | None:
+        cached = self._touch(volume_name) if self.cap_bytes > 0 else None
+        if cached is None:
+            return None
         try:
-            tmp.unlink()
+            return open(cached, "rb")
         except FileNotFoundError:
-            pass
+            with self._locked():
+                self._forget(volume_name)
         except OSError as exc:
-            fail(f"failed to remove stale cache partial {tmp}: {exc}", EXIT_OPEN_ERR)
-        # Atomic create at mode 0600. O_EXCL and O_NOFOLLOW refuse planted
-        # partials and final-component symlinks instead of truncating through
-        # them.
-        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+            fail(
+                f"failed to read cached volume {cached}: {exc}",
+                EXIT_OPEN_ERR,
+            )
+        return None
+
+    def open_from_source(
+        self, volume_name: str, source: Source, stage: str = "fetch"
+    ) -> tuple[BinaryIO, bool]:
+        """Return a readable stream of the volume and whether it was cached.
+
+        A cache hit streams straight from the cached file. On a miss the body
+        streams into ``<name>.partial`` and is renamed into place once
+        complete. If the download fails, the partial is kept, and the next
+        attempt (this run or a later one) asks the source only for the
+        missing tail. If another thread or process is already downloading
+        the volume, this waits for it and returns the cached copy. The flag
+        is True when any bytes came from local disk, so a caller that sees
+        an HMAC failure evicts and refetches in full. The download is timed
+        under ``stage``.
+        """
+        validate_volume_name(volume_name)
+        if self.cap_bytes <= 0:
+            with self.stages.span(stage, volume_name) as span:
+                data = source.fetch(volume_name)
+                span.bytes = len(data)
+            self._count_fetch(len(data))
+            return io.BytesIO(data), False
+        target = self.root / volume_name
+        tmp = target.with_suffix(target.suffix + ".partial")
+        while True:
+            cached = self._open_cached(volume_name)
+            if cached is not None:
+                return cached, True
+            with self._lock:
+                self._ensure_root()
+            fh = self._claim_partial(tmp, wait=True)
+            if fh is not None:
+                with fh:
+                    # Another fetch may have renamed its partial into place
+                    # between the lookup above and the claim, leaving this
+                    # claim on a fresh, empty partial; use its copy instead.
+                    cached = self._open_cached(volume_name)
+                    if cached is not None:
+                        self._abandon_partial(tmp)
+                        return cached, True
+                    return self._stream_from_source(volume_name, source, fh, tmp, stage)
+
+    def _stream_from_source(
+        self, volume_name: str, source: Source, fh: BinaryIO, tmp: Path, stage: str
+    ) -> tuple[BinaryIO, bool]:
+        target = self.root / volume_name
+        resumed_from = os.fstat(fh.fileno()).st_size
+        fh.seek(resumed_from)
+        with self.stages.span(stage, volume_name) as span:
+            source.fetch_into(volume_name, fh, resumed_from)
+            fh.flush()
+            size = fh.tell()
+            span.bytes = size - resumed_from
+        self._count_fetch(size - resumed_from)
+        if size > self.cap_bytes:
+            # Too big to keep: hand back the unlinked file.
+            fh.seek(0)
+            stream = open(os.dup(fh.fileno()), "rb")
+            self._unlink_partial(tmp)
+            return stream, resumed_from > 0
+        # Rename while the partial is still locked, so a waiting fetch finds
+        # the cached entry rather than an empty new partial.
+        with self._locked():
+            self._evict_until_room(size)
+            os.replace(tmp, target)
+            self._remember(volume_name, size)
         try:
-            fd = os.open(str(tmp), flags, 0o600)
-        except FileExistsError:
-            fail(f"cache partial already exists: {tmp}", EXIT_OPEN_ERR)
+            return open(target, "rb"), resumed_from > 0
         except OSError as exc:
-            fail(f"failed to create cache partial {tmp}: {exc}", EXIT_OPEN_ERR)
-        with os.fdopen(fd, "wb") as fh:
-            fh.write(data)
-        os.replace(tmp, target)
-        self._remember(volume_name, size)
-        return data, False
+            fail(f"failed to read cached volume {target}: {exc}", EXIT_OPEN_ERR)
 
 
 # ---------------------------------------------------------------------------
-# AES decrypter
+# Volume prefetch
 # ---------------------------------------------------------------------------
 
 
-class AesDecryptError(Exception):
-    pass
+class VolumePrefetcher:
+    """Bounded read-ahead of encrypted volumes on a thread pool.
 
+    ``schedule`` queues the distinct volumes a file needs, in the order the
+    extractor will open them; up to ``depth`` downloads run concurrently
+    while decrypt and write proceed on the current volume. Workers download
+    through ``EncryptedCache.open_from_source``, so read-ahead resumes
+    partials and waits on a volume another process is already fetching
+    instead of downloading it twice. ``take`` hands the extractor the opened
+    stream; ``release`` drops it when the volume turned out to be open
+    already, leaving the body in the cache. ``depth == 0`` disables
+    read-ahead and ``take`` always returns ``None``.
+    """
 
-class AesDecrypter:
-    def __init__(self, passphrase: str):
-        if not passphrase:
-            fail("empty passphrase", EXIT_USAGE)
-        self.passphrase = passphrase
-        try:
-            import pyAesCrypt  # type: ignore
-        except ImportError as exc:
-            fail(f"pyAesCrypt not installed: {exc}", EXIT_OPEN_ERR)
-        self._mod = pyAesCrypt
+    def __init__(
+        self,
+        source: Source,
+        cache: EncryptedCache,
+        depth: int,
+        stages: StageTimes | None = None,
+    ):
+        self.source = source
+        self.cache = cache
+        self.depth = depth
+        self.stages = stages or StageTimes()
+        self._pool: ThreadPoolExecutor | None = None
+        if depth > 0:
+            self._pool = ThreadPoolExecutor(
+                max_workers=depth,
+                thread_name_prefix="duplicati-r2-prefetch",
+            )
+        self._lock = threading.Lock()
+        self._queue: collections.deque[str] = collections.deque()
+        self._queued: set[str] = set()
+        self._pending: dict[str, Future[tuple[BinaryIO, bool]]] = {}
+
+    def schedule(self, volume_names: Iterable[str]) -> None:
+        """Append ``volume_names`` to the read-ahead queue, skipping repeats."""
+        if self._pool is None:
+            return
+        with self._lock:
+            for name in volume_names:
+                if name not in self._queued and name not in self._pending:
+                    self._queued.add(name)
+                    self._queue.append(name)
+            self._fill()
+
+    def _fill(self) -> None:
+        assert self._pool is not None
+        while self._queue and len(self._pending) < self.depth:
+            name = self._queue.popleft()
+            if name not in self._queued:
+                continue  # released or opened before its turn came up
+            self._queued.discard(name)
+            if self.cache.contains(name):
+                continue
+            self._pending[name] = self._pool.submit(self._fetch, name)
+
+    def _fetch(self, volume_name: str) -> tuple[BinaryIO, bool]:
+        return self.cache.open_from_source(volume_name, self.source, stage="prefetch")
+
+    def _take(self, volume_name: str) -> Future[tuple[BinaryIO, bool]] | None:
+        with self._lock:
+            self._queued.discard(volume_name)
+            future = self._pending.pop(volume_name, None)
+            if self._pool is not None:
+                self._fill()
+        return future
+
+    def take(self, volume_name: str) -> tuple[BinaryIO, bool] | None:
+        """Return the read-ahead stream and cache-hit flag, if there is one.
+
+        Waits for a download still in flight; that wait is the extractor's
+        ``fetch`` stall. ``None`` means nothing was read ahead for
+        ``volume_name``; the caller opens it through
+        ``EncryptedCache.open_from_source`` itself.
+        """
+        future = self._take(volume_name)
+        if future is None:
+            return None
+        with self.stages.span("fetch", volume_name):
+            return future.result()
 
-    def decrypt(self, encrypted: bytes, volume_name: str) -> bytes:
-        plain = io.BytesIO()
-        try:
-            self._mod.decryptStream(io.BytesIO(encrypted), plain, self.passphrase, 64 * 1024)
-        except ValueError as exc:
-            # pyAesCrypt raises ValueError for HMAC mismatch, wrong password,
-            # or any "corrupted" failure mode; all of those are data errors,
-            # not user errors. Surface the message verbatim alongside the
-            # offending volume name (loud-failure contract per docs).
-            raise AesDecryptError(f"AES decrypt failed for {volume_name}: {exc}") from exc
-        return plain.getvalue()
+    def release(self, volume_name: str) -> None:
+        """Drop read-ahead for a volume served without fetching.
 
+        A download already in flight is not wasted: it still lands in the
+        encrypted cache, for a later file to reuse.
+        """
+        future = self._take(volume_name)
+        if future is not None:
+            future.add_done_callback(self._discard)
 
-# ---------------------------------------------------------------------------
-# Zip volume reader
-# ---------------------------------------------------------------------------
+    @staticmethod
+    def _discard(future: Future[tuple[BinaryIO, bool]]) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        stream, _cache_hit = future.result()
+        stream.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._queue.clear()
+            self._queued.clear()
+            for future in self._pending.values():
+                if not future.cancel():
+                    future.add_done_callback(self._discard)
+            self._pending.clear()
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            # Released downloads finish and settle into the cache; anything
+            # still pending was cancelled above.
+            pool.shutdown(wait=True)
+
+
+# ---------------------------------------------------------------------------
+# Cache warm-up
+# ---------------------------------------------------------------------------
+
+
+def warm_cache(
+    cache: EncryptedCache,
+    source: Source,
+    volume_names: Iterable[str],
+    parallel: int,
+    on_volume: Callable[[str, int, bool], None] | None = None,
+) -> None:
+    """Download ``volume_names`` into ``cache`` without decrypting them.
+
+    Up to ``parallel`` volumes stream into the cache at once through
+    ``EncryptedCache.open_from_source``, so interrupted downloads resume and
+    a volume another process is already fetching is waited for, not fetched
+    twice. ``on_volume(name, size, cache_hit)`` runs on the calling thread
+    as each volume lands. The first failure cancels downloads not yet
+    started and is re-raised.
+    """
+
+    def fetch(volume_name: str) -> tuple[int, bool]:
+        stream, from_disk = cache.open_from_source(volume_name, source)
+        with stream:
+            return os.fstat(stream.fileno()).st_size, from_disk
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, parallel),
+        thread_name_prefix="duplicati-r2-warm",
+    ) as pool:
+        futures = {pool.submit(fetch, name): name for name in volume_names}
+        try:
+            for future in as_completed(futures):
+                size, from_disk = future.result()
+                if on_volume is not None:
+                    on_volume(futures[future], size, from_disk)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+# ---------------------------------------------------------------------------
+# AES decrypter
+# ---------------------------------------------------------------------------
+
+
+class AesDecryptError(Exception):
+    pass
+
+
+class AesDecrypter:
+    """Streams AES Crypt volumes into spooled plaintext buffers.
+
+    Decrypted output stays in process memory up to ``spool_bytes``; larger
+    volumes (every volume when ``spool_bytes`` is 0) roll over into an
+    anonymous temporary file under ``spool_dir``.
+    The file is unlinked on creation (``O_TMPFILE`` on Linux), mode 0600,
+    inside a 0700 directory, and disappears when the volume is closed, so
+    plaintext never gains a name on disk. Without a ``spool_dir`` every
+    volume stays in memory.
+    """
+
+    def __init__(
+        self,
+        passphrase: str,
+        spool_dir: str | None = None,
+        spool_bytes: int = DEFAULT_DECRYPT_SPOOL_BYTES,
+    ):
+        if not passphrase:
+            fail("empty passphrase", EXIT_USAGE)
+        self.passphrase = passphrase
+        self.spool_dir = spool_dir
+        self.spool_bytes = spool_bytes
+        if spool_dir is not None:
+            _ensure_private_dir(Path(spool_dir))
+            _chmod_private_dir(Path(spool_dir))
+        try:
+            import pyAesCrypt  # type: ignore
+        except ImportError as exc:
+            fail(f"pyAesCrypt not installed: {exc}", EXIT_OPEN_ERR)
+        self._mod = pyAesCrypt
+
+    def _new_spool(self) -> BinaryIO:
+        if self.spool_dir is None:
+            return io.BytesIO()
+        if self.spool_bytes <= 0:
+            return tempfile.TemporaryFile(dir=self.spool_dir)
+        return tempfile.SpooledTemporaryFile(  # type: ignore[return-value]
+            max_size=self.spool_bytes,
+            dir=self.spool_dir,
+        )
+
+    def decrypt(self, encrypted: BinaryIO, volume_name: str) -> BinaryIO:
+        """Decrypt ``encrypted`` into a seekable stream positioned at 0."""
+        plain = self._new_spool()
+        try:
+            self._mod.decryptStream(encrypted, plain, self.passphrase, 64 * 1024)
+        except ValueError as exc:
+            plain.close()
+            # pyAesCrypt raises ValueError for HMAC mismatch, wrong password,
+            # or any "corrupted" failure mode; all of those are data errors,
+            # not user errors. Surface the message verbatim alongside the
+            # offending volume name (loud-failure contract per docs).
+            raise AesDecryptError(f"AES decrypt failed for {volume_name}: {exc}") from exc
+        except BaseException:
+            plain.close()
+            raise
+        plain.seek(0)
+        return plain
+
+
+# ---------------------------------------------------------------------------
+# Zip volume reader
+# ---------------------------------------------------------------------------
 
 
 _HASH_BYTES_BY_NAME = {
@@ -762,19 +1680,60 @@ def decode_db_hash(value: str | None, field: str) -> bytes:
         )
 
 
+# A block as read from a volume: a copy, or a zero-copy slice of the
+# decrypted buffer for stored zip entries.
+BlockData = bytes | memoryview
+
+
+def _decrypted_view(buf: BinaryIO) -> tuple[memoryview | None, mmap.mmap | None]:
+    """Borrow the decrypted bytes behind ``buf`` without copying them.
+
+    In-memory spools expose their ``BytesIO`` buffer; spools that rolled
+    over to an anonymous temp file are mapped read-only. Anything else
+    yields ``(None, None)`` and the caller reads through ``zipfile``.
+    """
+    if isinstance(buf, tempfile.SpooledTemporaryFile):
+        buf = buf._file  # BytesIO until rollover, then the TemporaryFile
+    if isinstance(buf, io.BytesIO):
+        return buf.getbuffer(), None
+    try:
+        fd = buf.fileno()
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return None, None
+        mapped = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+    except AttributeError, OSError, ValueError, io.UnsupportedOperation:
+        return None, None
+    return memoryview(mapped), mapped
+
+
 class OpenedVolume:
-    """In-memory zip view of a decrypted dblock/dindex/dlist."""
+    """Zip view of a decrypted dblock/dindex/dlist.
+
+    ``decrypted`` is either the plaintext bytes or a seekable stream (the
+    spool ``AesDecrypter.decrypt`` returns); the volume owns the stream and
+    closes it in ``close``.
+
+    Stored (uncompressed) entries, the common case in Duplicati dblocks,
+    are returned as ``memoryview`` slices of the decrypted buffer, located
+    through their local file header, so hashing and writing a block never
+    copies it. Deflated entries fall back to ``zipfile``. A slice keeps the
+    buffer alive on its own, so it stays valid after the volume is closed.
+    """
 
     def __init__(
         self,
         name: str,
-        decrypted: bytes,
+        decrypted: bytes | BinaryIO,
         expected_blocksize: int | None,
         expected_block_hash: str,
         expected_file_hash: str,
     ):
         self.name = name
-        self._buf = io.BytesIO(decrypted)
+        self._buf: BinaryIO = (
+            io.BytesIO(decrypted) if isinstance(decrypted, (bytes, bytearray)) else decrypted
+        )
+        self.size = self._buf.seek(0, io.SEEK_END)
         try:
             self._zip = zipfile.ZipFile(self._buf)
         except zipfile.BadZipFile as exc:
@@ -791,6 +1750,16 @@ class OpenedVolume:
             expected_block_hash,
             expected_file_hash,
         )
+        self._layout = self._read_layout()
+        self._view, self._mmap = _decrypted_view(self._buf)
+        self._stored: dict[str, tuple[int, int]] = {}
+        if self._view is not None:
+            for entry, offset, length, method in self._layout:
+                if method != zipfile.ZIP_STORED:
+                    continue
+                if offset + length > len(self._view):
+                    fail(f"{name}: zip entry {entry} runs past end of volume", EXIT_DATA_ERR)
+                self._stored[entry] = (offset, length)
 
     def _validate_manifest(
         self,
@@ -824,8 +1793,13 @@ class OpenedVolume:
                     EXIT_DATA_ERR,
                 )
 
-    def block_bytes(self, block_hash: bytes) -> bytes:
+    def block_bytes(self, block_hash: bytes) -> BlockData:
         entry = base64url_name(block_hash)
+        span = self._stored.get(entry)
+        if span is not None:
+            assert self._view is not None
+            offset, length = span
+            return self._view[offset : offset + length]
         try:
             with self._zip.open(entry) as fh:
                 return fh.read()
@@ -835,6 +1809,36 @@ class OpenedVolume:
                 EXIT_DATA_ERR,
             )
 
+    def entry_layout(self) -> list[tuple[str, int, int, int]]:
+        """``(entry, data_offset, compressed_length, compress_type)`` per entry.
+
+        ``data_offset`` points past the entry's local file header, so a reader
+        holding the decrypted bytes can fetch the entry with one positional
+        read. The local header is parsed rather than assumed: its extra field
+        may differ from the central directory's copy.
+        """
+        return self._layout
+
+    def _read_layout(self) -> list[tuple[str, int, int, int]]:
+        layout: list[tuple[str, int, int, int]] = []
+        for info in self._zip.infolist():
+            self._buf.seek(info.header_offset)
+            header = self._buf.read(ZIP_LOCAL_HEADER.size)
+            if len(header) != ZIP_LOCAL_HEADER.size:
+                fail(f"{self.name}: truncated local header for {info.filename}", EXIT_DATA_ERR)
+            fields = ZIP_LOCAL_HEADER.unpack(header)
+            if fields[0] != zipfile.stringFileHeader:
+                fail(f"{self.name}: bad local header magic for {info.filename}", EXIT_DATA_ERR)
+            data_offset = info.header_offset + ZIP_LOCAL_HEADER.size + fields[9] + fields[10]
+            layout.append((info.filename, data_offset, info.compress_size, info.compress_type))
+        return layout
+
+    def copy_to(self, fh: BinaryIO) -> int:
+        """Copy the decrypted volume bytes to ``fh``; return the byte count."""
+        self._buf.seek(0)
+        shutil.copyfileobj(self._buf, fh, FETCH_CHUNK_BYTES)
+        return self._buf.tell()
+
     def close(self) -> None:
         # zipfile.ZipFile.close raises only on already-broken state; nothing
         # downstream cares once we are tearing down.
@@ -842,6 +1846,405 @@ class OpenedVolume:
             self._zip.close()
         except zipfile.BadZipFile, OSError:
             pass
+        # Block slices still in flight (a writer, the hash pool) pin the
+        # buffer; closing then raises BufferError and the buffer is freed
+        # with the last slice instead.
+        if self._view is not None:
+            self._view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+        try:
+            self._buf.close()
+        except OSError, BufferError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Decrypted volume cache
+# ---------------------------------------------------------------------------
+
+
+class IndexedVolume:
+    """Decrypted volume served from ``DecryptedVolumeCache``.
+
+    Blocks come from the offset index recorded when the volume was stored:
+    one ``pread`` per block (plus a raw inflate for deflated entries), with
+    no decrypt and no zip directory parse. Block hashes are still verified
+    by the extractor on every read.
+    """
+
+    def __init__(self, name: str, path: Path, entries: dict[str, tuple[int, int, int]]):
+        self.name = name
+        self._entries = entries
+        try:
+            self._fd = os.open(str(path), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        except OSError as exc:
+            fail(f"failed to open decrypted cache entry {path}: {exc}", EXIT_OPEN_ERR)
+
+    def block_bytes(self, block_hash: bytes) -> bytes:
+        entry = base64url_name(block_hash)
+        location = self._entries.get(entry)
+        if location is None:
+            fail(
+                f"{self.name}: missing block entry {entry} (hash {block_hash.hex()})",
+                EXIT_DATA_ERR,
+            )
+        offset, length, method = location
+        data = os.pread(self._fd, length, offset)
+        if len(data) != length:
+            fail(f"{self.name}: decrypted cache entry truncated at {entry}", EXIT_DATA_ERR)
+        if method == zipfile.ZIP_STORED:
+            return data
+        if method == zipfile.ZIP_DEFLATED:
+            try:
+                return zlib.decompress(data, -zlib.MAX_WBITS)
+            except zlib.error as exc:
+                fail(f"{self.name}: cannot inflate {entry}: {exc}", EXIT_DATA_ERR)
+        fail(f"{self.name}: unsupported zip compression {method} for {entry}", EXIT_DATA_ERR)
+
+    def close(self) -> None:
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class DecryptedVolumeCache:
+    """Opt-in on-disk cache of decrypted volumes plus a block offset index.
+
+    Layout under ``root`` (mode 0700): one ``<volume_name>`` file per
+    decrypted zip (mode 0600) and ``index.sqlite`` (mode 0600) mapping
+    ``(volume, entry)`` to the entry's data offset, compressed length, and
+    zip compression method. The index also carries each volume's size and
+    last use, so the byte cap's LRU survives restarts without a rescan.
+
+    Unlike ``EncryptedCache`` this stores plaintext: it trades the
+    encrypted-only guarantee for skipping fetch and decrypt entirely on
+    repeat restores, and is therefore off unless a cap is given.
+
+    Shared between processes like ``EncryptedCache``: index access and disk
+    mutations run under an ``flock`` on ``index.lock``, and a store writes
+    through a flock-held ``.partial`` that startup leaves alone.
+    """
+
+    def __init__(self, root: str, cap_bytes: int):
+        self.root = Path(root)
+        self.cap_bytes = cap_bytes
+        self._lock = threading.Lock()
+        _ensure_private_dir(self.root)
+        _chmod_private_dir(self.root)
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0)
+        lock = self.root / DECRYPTED_LOCK_NAME
+        try:
+            self._lock_fd = os.open(str(lock), flags, 0o600)
+        except OSError as exc:
+            fail(f"failed to open decrypted cache lock {lock}: {exc}", EXIT_OPEN_ERR)
+        with self._locked():
+            self._open_index()
+            self._scan_existing()
+            self._evict_until_room(0)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the thread lock and the ``index.lock`` ``flock``."""
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open_index(self) -> None:
+        index = self.root / DECRYPTED_INDEX_NAME
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0)
+        try:
+            os.close(os.open(str(index), flags, 0o600))
+            os.chmod(index, 0o600)
+        except OSError as exc:
+            fail(f"failed to create decrypted cache index {index}: {exc}", EXIT_OPEN_ERR)
+        try:
+            self._conn = sqlite3.connect(
+                str(index), timeout=DECRYPTED_INDEX_BUSY_SECONDS, check_same_thread=False
+            )
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS volume (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS block (
+                    volume TEXT NOT NULL,
+                    entry TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    method INTEGER NOT NULL,
+                    PRIMARY KEY (volume, entry)
+                ) WITHOUT ROWID;
+                """
+            )
+        except sqlite3.DatabaseError as exc:
+            fail(
+                f"decrypted cache index {index} is unusable ({exc}); remove {self.root} to reset it",
+                EXIT_OPEN_ERR,
+            )
+
+    def _scan_existing(self) -> None:
+        # Interrupted stores leave partials, and a crash between rename and
+        # index commit leaves an unindexed file; neither is usable. Runs
+        # under the flock, so no other store is between those two steps,
+        # but a partial another process is still writing is kept.
+        known = {row[0] for row in self._conn.execute("SELECT name FROM volume")}
+        for entry in self.root.iterdir():
+            if (
+                entry.name.startswith(DECRYPTED_INDEX_NAME)
+                or entry.name == DECRYPTED_LOCK_NAME
+                or entry.name in known
+            ):
+                continue
+            if entry.name.endswith(".partial"):
+                _unlink_idle_partial(entry, "stale decrypted cache partial")
+                continue
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                fail(f"failed to remove stale decrypted cache entry {entry}: {exc}", EXIT_OPEN_ERR)
+
+    def _drop(self, volume_name: str) -> None:
+        try:
+            (self.root / volume_name).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            fail(
+                f"failed to evict decrypted volume {self.root / volume_name}: {exc}",
+                EXIT_OPEN_ERR,
+            )
+        with self._conn:
+            self._conn.execute("DELETE FROM block WHERE volume = ?", (volume_name,))
+            self._conn.execute("DELETE FROM volume WHERE name = ?", (volume_name,))
+
+    def _evict_until_room(self, incoming_size: int) -> None:
+        (used,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM volume").fetchone()
+        while used + incoming_size > self.cap_bytes:
+            row = self._conn.execute(
+                "SELECT name, size FROM volume ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return
+            self._drop(row[0])
+            used -= row[1]
+
+    def open(self, volume_name: str) -> IndexedVolume | None:
+        """Return the cached decrypted volume, or ``None`` on a miss."""
+        validate_volume_name(volume_name)
+        with self._locked():
+            if self._conn.execute(
+                "SELECT 1 FROM volume WHERE name = ?", (volume_name,)
+            ).fetchone() is None:
+                return None
+            path = self.root / volume_name
+            if not path.is_file():
+                self._drop(volume_name)
+                return None
+            entries = {
+                entry: (offset, length, method)
+                for entry, offset, length, method in self._conn.execute(
+                    "SELECT entry, offset, length, method FROM block WHERE volume = ?",
+                    (volume_name,),
+                )
+            }
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE volume SET last_used = ? WHERE name = ?",
+                    (time.time_ns(), volume_name),
+                )
+            # Opened under the flock so another process cannot evict it first.
+            return IndexedVolume(volume_name, path, entries)
+
+    def store(self, vol: OpenedVolume) -> None:
+        """Persist ``vol``'s decrypted bytes and entry layout."""
+        validate_volume_name(vol.name)
+        if vol.size > self.cap_bytes:
+            return
+        target = self.root / vol.name
+        tmp = target.with_suffix(target.suffix + ".partial")
+        fd = _create_partial(tmp, "decrypted cache partial")
+        if fd is None:
+            return  # another writer is storing this volume
+        with os.fdopen(fd, "wb") as fh:
+            committed = False
+            try:
+                size = vol.copy_to(fh)
+                layout = vol.entry_layout()
+                fh.flush()
+                with self._locked():
+                    self._evict_until_room(size)
+                    committed = _commit_partial(fd, tmp, target)
+                    if not committed:
+                        return
+                    with self._conn:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO volume (name, size, last_used) VALUES (?, ?, ?)",
+                            (vol.name, size, time.time_ns()),
+                        )
+                        self._conn.execute("DELETE FROM block WHERE volume = ?", (vol.name,))
+                        self._conn.executemany(
+                            "INSERT INTO block (volume, entry, offset, length, method) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            [(vol.name, *location) for location in layout],
+                        )
+            finally:
+                if not committed:
+                    _discard_partial(fd, tmp)
+
+    def close(self) -> None:
+        self._conn.close()
+        os.close(self._lock_fd)
+
+
+# What the extractor's open-volume LRU holds: a freshly decrypted zip or a
+# decrypted-cache entry read through its offset index.
+VolumeView = OpenedVolume | IndexedVolume
+
+
+# ---------------------------------------------------------------------------
+# Plaintext block cache
+# ---------------------------------------------------------------------------
+
+
+class BlockCache:
+    """Opt-in content-addressed cache of verified plaintext blocks.
+
+    One file per block under ``root`` (mode 0700), named by the block's
+    base64url hash, mode 0600, written through a flock-held
+    ``<name>.partial`` created with ``O_EXCL|O_NOFOLLOW``; a block another
+    process is already storing is simply not cached here. Byte-capped LRU
+    like ``EncryptedCache``; a hit bumps the file's mtime, which is the
+    order a restart rebuilds. A block is re-hashed on every read and
+    dropped on mismatch, so a tampered or bit-rotted entry falls back to
+    the dblock instead of reaching the sink.
+    Blocks are shared by hash across files and snapshots, so a block already
+    restored once is never decrypted again while it stays cached.
+    """
+
+    def __init__(self, root: str, cap_bytes: int, block_hash_algo: str):
+        self.root = Path(root)
+        self.cap_bytes = cap_bytes
+        self.block_hash_algo = block_hash_algo
+        self.hits = 0
+        self._order: collections.OrderedDict[str, int] = collections.OrderedDict()
+        # Names being written outside the lock; their bytes already count.
+        self._pending: set[str] = set()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        _ensure_private_dir(self.root)
+        _chmod_private_dir(self.root)
+        self._scan_existing()
+
+    def _scan_existing(self) -> None:
+        entries: list[tuple[int, str, int]] = []
+        for entry in self.root.iterdir():
+            if entry.name.endswith(".partial"):
+                _unlink_idle_partial(entry, "stale block cache partial")
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            except OSError as exc:
+                fail(f"failed to inspect block cache entry {entry}: {exc}", EXIT_OPEN_ERR)
+            entries.append((st.st_mtime_ns, entry.name, st.st_size))
+        for _mtime, name, size in sorted(entries):
+            self._order[name] = size
+            self._used_bytes += size
+        self._evict_until_room(0)
+
+    def _drop(self, name: str) -> None:
+        size = self._order.pop(name, None)
+        if size is not None:
+            self._used_bytes -= size
+        try:
+            (self.root / name).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            fail(f"failed to evict cached block {self.root / name}: {exc}", EXIT_OPEN_ERR)
+
+    def _evict_until_room(self, incoming_size: int) -> None:
+        while self._used_bytes + incoming_size > self.cap_bytes and self._order:
+            self._drop(next(iter(self._order)))
+
+    def contains(self, block_hash: bytes) -> bool:
+        with self._lock:
+            return base64url_name(block_hash) in self._order
+
+    def get(self, block_hash: bytes) -> bytes | None:
+        """Return the cached block if present and its hash still matches."""
+        name = base64url_name(block_hash)
+        with self._lock:
+            if name not in self._order:
+                return None
+            self._order.move_to_end(name)
+        try:
+            fd = os.open(str(self.root / name), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+            with os.fdopen(fd, "rb") as fh:
+                block = fh.read()
+                os.utime(fd)
+        except FileNotFoundError:
+            block = None
+        except OSError as exc:
+            fail(f"failed to read cached block {self.root / name}: {exc}", EXIT_OPEN_ERR)
+        if block is None or hashlib.new(self.block_hash_algo, block).digest() != block_hash:
+            with self._lock:
+                self._drop(name)
+            return None
+        with self._lock:
+            self.hits += 1
+        return block
+
+    def put(self, block_hash: bytes, block: BlockData) -> None:
+        """Store a block the caller has already verified against its hash."""
+        name = base64url_name(block_hash)
+        size = len(block)
+        if size > self.cap_bytes:
+            return
+        # Reserve the name and its bytes under the lock; the write and
+        # rename run outside it so writers do not serialise on disk I/O.
+        with self._lock:
+            if name in self._order or name in self._pending:
+                return
+            self._evict_until_room(size)
+            self._pending.add(name)
+            self._used_bytes += size
+        committed = False
+        try:
+            target = self.root / name
+            tmp = target.with_suffix(target.suffix + ".partial")
+            fd = _create_partial(tmp, "block cache partial")
+            if fd is not None:
+                with os.fdopen(fd, "wb") as fh:
+                    try:
+                        fh.write(block)
+                        fh.flush()
+                        committed = _commit_partial(fd, tmp, target)
+                    finally:
+                        if not committed:
+                            _discard_partial(fd, tmp)
+        finally:
+            with self._lock:
+                self._pending.discard(name)
+                if committed:
+                    self._order[name] = size
+                else:
+                    self._used_bytes -= size
 
 
 # ---------------------------------------------------------------------------
@@ -856,6 +2259,8 @@ class FileEntry:
     blockset_id: int
     full_size: int | None
     full_hash: str | None
+    # FilesetEntry.Lastmodified (epoch seconds); carried into tar output.
+    mtime: int | None = None
 
 
 @dataclass
@@ -867,10 +2272,90 @@ class BlockRef:
     block_size: int
 
 
+@dataclass
+class FilePlan:
+    """A resolved file: its DB entry plus content blocks in stream order."""
+
+    entry: FileEntry
+    refs: list[BlockRef]
+
+
 @dataclass
 class ExtractStats:
     plaintext_size: int = 0
     dblocks_touched: set[str] = field(default_factory=set)
+    refetches_saved: int = 0
+    files: int = 0
+    files_skipped: int = 0
+    bytes_cloned: int = 0
+    bytes_sparse: int = 0
+    bytes_delta: int = 0
+
+    def merge(self, other: ExtractStats) -> None:
+        """Fold a writer worker's per-file counters into this run total."""
+        self.plaintext_size += other.plaintext_size
+        self.files += other.files
+        self.files_skipped += other.files_skipped
+        self.bytes_delta += other.bytes_delta
+        self.bytes_cloned += other.bytes_cloned
+        self.bytes_sparse += other.bytes_sparse
+        self.dblocks_touched |= other.dblocks_touched
+
+
+def shared_block_hashes(plans: Iterable[FilePlan]) -> set[bytes]:
+    """Content hashes referenced more than once across ``plans``.
+
+    Only these can be cloned from an earlier write, so only these are worth
+    remembering while the restore runs.
+    """
+    counts = collections.Counter(ref.block_hash for plan in plans for ref in plan.refs)
+    return {block_hash for block_hash, n in counts.items() if n > 1}
+
+
+def count_volume_opens(plans: Iterable[FilePlan], capacity: int = MAX_OPEN_VOLUMES) -> int:
+    """Simulate the extractor's open-volume LRU over ``plans``.
+
+    Returns how many times a volume would be fetched and decrypted when the
+    plans are written in the given order.
+    """
+    lru: collections.OrderedDict[str, None] = collections.OrderedDict()
+    opens = 0
+    for plan in plans:
+        for ref in plan.refs:
+            if ref.volume_name in lru:
+                lru.move_to_end(ref.volume_name)
+                continue
+            opens += 1
+            lru[ref.volume_name] = None
+            if len(lru) > capacity:
+                lru.popitem(last=False)
+    return opens
+
+
+def schedule_plans(plans: list[FilePlan]) -> list[int]:
+    """Order multi-file writes so files sharing dblocks run back to back.
+
+    Returns indices into ``plans`` in write order.
+
+    Volumes are ranked by first appearance in the incoming (path) order, and
+    each file is keyed by the lowest and highest rank it touches. Sorting on
+    that key walks the volume sequence roughly once, so a dblock is fetched
+    and decrypted about once instead of again every time a path far down the
+    list reaches back to it after the open-volume LRU has rolled over. Ties
+    keep path order, which keeps the schedule deterministic.
+    """
+    rank: dict[str, int] = {}
+    for plan in plans:
+        for ref in plan.refs:
+            rank.setdefault(ref.volume_name, len(rank))
+
+    def key(index: int) -> tuple[int, int, int]:
+        ranks = [rank[ref.volume_name] for ref in plans[index].refs]
+        if not ranks:
+            return (-1, -1, index)
+        return (min(ranks), max(ranks), index)
+
+    return sorted(range(len(plans)), key=key)
 
 
 class BlockResolver:
@@ -893,9 +2378,13 @@ class BlockResolver:
         self,
         conn: sqlite3.Connection,
         block_hash_algo: str,
-        fetch_block: Callable[[str, bytes], bytes],
+        fetch_block: Callable[[str, bytes], BlockData],
+        stages: StageTimes | None = None,
     ):
         self.conn = conn
+        # "plan" covers the SQL; it includes any blocklist blocks a plan
+        # had to fetch, which are also counted under their own stages.
+        self.stages = stages or StageTimes()
         size = _HASH_BYTES_BY_NAME.get(block_hash_algo.upper())
         if not size:
             fail(
@@ -905,31 +2394,10 @@ class BlockResolver:
         self.hash_size: int = size
         self._fetch_block = fetch_block
 
-    def _block_lookup_hash_batch_size(self) -> int:
-        variable_limit = self.conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
-        # Each content-block hash is looked up in padded and unpadded base64
-        # forms, so split by raw hashes and keep both encodings under SQLite's
-        # per-statement bind-variable cap.
-        return max(1, (variable_limit - SQLITE_BIND_SAFETY_MARGIN) // 2)
-
     def lookup_file(self, snapshot_id: int, path: str) -> FileEntry:
         qpath, qpath_alt = exact_match_variants(path)
-        row = self.conn.execute(
-            """
-            SELECT
-              f.ID         AS file_id,
-              f.Path       AS path,
-              f.BlocksetID AS blockset_id,
-              bs.Length    AS size,
-              bs.FullHash  AS full_hash
-            FROM File f
-              JOIN FilesetEntry fse ON fse.FileID = f.ID
-              LEFT JOIN Blockset bs ON bs.ID = f.BlocksetID
-            WHERE fse.FilesetID = ?
-              AND f.Path IN (?, ?)
-            """,
-            (snapshot_id, qpath, qpath_alt),
-        ).fetchone()
+        with self.stages.span("plan"):
+            row = self._lookup_file_row(snapshot_id, qpath, qpath_alt)
         if row is None:
             fail(
                 f"path '{path}' not in snapshot {snapshot_id}",
@@ -946,119 +2414,331 @@ class BlockResolver:
             blockset_id=row["blockset_id"],
             full_size=row["size"],
             full_hash=row["full_hash"],
+            mtime=row["mtime"],
         )
 
-    def block_refs(self, blockset_id: int, expected_size: int | None = None) -> list[BlockRef]:
-        """Resolve a blockset's content blocks in stream order.
-
-        ``expected_size`` is the file's plaintext length from
-        ``Blockset.Length``; passing ``0`` short-circuits the lookup for
-        zero-byte files (which legitimately have neither ``BlocksetEntry``
-        nor ``BlocklistHash`` rows).
-        """
-        if expected_size == 0:
-            return []
+    def _lookup_file_row(self, snapshot_id: int, qpath: str, qpath_alt: str) -> sqlite3.Row | None:
+        return self.conn.execute(
+            """
+            SELECT
+              f.ID         AS file_id,
+              f.Path       AS path,
+              f.BlocksetID AS blockset_id,
+              bs.Length    AS size,
+              bs.FullHash  AS full_hash,
+              fse.Lastmodified AS mtime
+            FROM File f
+              JOIN FilesetEntry fse ON fse.FileID = f.ID
+              LEFT JOIN Blockset bs ON bs.ID = f.BlocksetID
+            WHERE fse.FilesetID = ?
+              AND f.Path IN (?, ?)
+            """,
+            (snapshot_id, qpath, qpath_alt),
+        ).fetchone()
 
-        # Path 1: BlocksetEntry covers the whole blockset.
+    @staticmethod
+    def _snapshot_where(snapshot_id: int, prefix: str | None) -> tuple[str, tuple[object, ...]]:
+        where = "fse.FilesetID = ? AND f.BlocksetID >= 0"
+        params: tuple[object, ...] = (snapshot_id,)
+        if prefix:
+            where += " AND substr(f.Path, 1, ?) = ?"
+            params += (len(prefix), prefix)
+        return where, params
+
+    def snapshot_files(self, snapshot_id: int, prefix: str | None = None) -> Iterator[FileEntry]:
+        """Timed wrapper around ``_snapshot_files``; see there."""
+        entries = self._snapshot_files(snapshot_id, prefix)
+        while True:
+            with self.stages.span("plan"):
+                entry = next(entries, None)
+            if entry is None:
+                return
+            yield entry
+
+    def _snapshot_files(self, snapshot_id: int, prefix: str | None = None) -> Iterator[FileEntry]:
+        """Stream every file under ``prefix`` in (BlocksetID, Path) order."""
+        where, params = self._snapshot_where(snapshot_id, prefix)
         rows = self.conn.execute(
-            """
-            SELECT b.Hash AS hash, b.Size AS size, rv.Name AS volume
+            f"""
+            SELECT
+              f.ID         AS file_id,
+              f.Path       AS path,
+              f.BlocksetID AS blockset_id,
+              bs.Length    AS size,
+              bs.FullHash  AS full_hash,
+              fse.Lastmodified AS mtime
+            FROM FilesetEntry fse
+              JOIN File f           ON f.ID = fse.FileID
+              LEFT JOIN Blockset bs ON bs.ID = f.BlocksetID
+            WHERE {where}
+            ORDER BY f.BlocksetID, f.Path
+            """,
+            params,
+        )
+        for row in rows:
+            yield FileEntry(
+                file_id=row["file_id"],
+                path=row["path"],
+                blockset_id=row["blockset_id"],
+                full_size=row["size"],
+                full_hash=row["full_hash"],
+                mtime=row["mtime"],
+            )
+
+    def snapshot_plans(
+        self,
+        snapshot_id: int,
+        prefix: str | None = None,
+        keep: Callable[[FileEntry], bool] | None = None,
+    ) -> Iterator[FilePlan]:
+        """Timed wrapper around ``_snapshot_plans``; see there."""
+        plans = self._snapshot_plans(snapshot_id, prefix, keep)
+        while True:
+            with self.stages.span("plan"):
+                plan = next(plans, None)
+            if plan is None:
+                return
+            yield plan
+
+    def _snapshot_plans(
+        self,
+        snapshot_id: int,
+        prefix: str | None = None,
+        keep: Callable[[FileEntry], bool] | None = None,
+    ) -> Iterator[FilePlan]:
+        """Stream a FilePlan for every file in the snapshot under ``prefix``.
+
+        Bulk counterpart of ``lookup_file`` + ``block_refs``: one cursor over
+        the snapshot's files and one over all of their ``BlocksetEntry``
+        rows, both ordered by BlocksetID and merge-joined here, instead of a
+        query pair per path. Files sharing a blockset share one resolution.
+        Blocksets without ``BlocksetEntry`` rows fall back to the
+        ``BlocklistHash`` walk in ``block_refs``. ``prefix`` selects paths
+        that start with it verbatim (``None`` selects everything). Files
+        ``keep`` rejects are dropped before their blocks are resolved, so a
+        blockset none of whose files are kept costs no blocklist fetch.
+        """
+        where, params = self._snapshot_where(snapshot_id, prefix)
+        files = self._snapshot_files(snapshot_id, prefix)
+        entries = self.conn.execute(
+            f"""
+            SELECT be.BlocksetID AS blockset_id, b.Hash AS hash, b.Size AS size,
+                   rv.Name AS volume
             FROM BlocksetEntry be
               JOIN Block b         ON b.ID = be.BlockID
               JOIN Remotevolume rv ON rv.ID = b.VolumeID
-            WHERE be.BlocksetID = ?
-            ORDER BY be."Index"
+            WHERE be.BlocksetID IN (
+              SELECT f.BlocksetID
+              FROM FilesetEntry fse
+                JOIN File f ON f.ID = fse.FileID
+              WHERE {where}
+            )
+            ORDER BY be.BlocksetID, be."Index"
             """,
-            (blockset_id,),
-        ).fetchall()
-        if rows:
-            return [
+            params,
+        )
+        entry_row = entries.fetchone()
+        for blockset_id, group in itertools.groupby(files, key=lambda e: e.blockset_id):
+            file_entries = list(group)
+            if keep is not None:
+                file_entries = [entry for entry in file_entries if keep(entry)]
+                if not file_entries:
+                    continue
+            refs: list[BlockRef] = []
+            while entry_row is not None and entry_row["blockset_id"] < blockset_id:
+                entry_row = entries.fetchone()
+            while entry_row is not None and entry_row["blockset_id"] == blockset_id:
+                refs.append(
+                    BlockRef(
+                        volume_name=entry_row["volume"],
+                        block_hash=decode_db_hash(entry_row["hash"], "Block.Hash"),
+                        block_size=entry_row["size"],
+                    )
+                )
+                entry_row = entries.fetchone()
+            if not refs and file_entries[0].full_size != 0:
+                # Untimed variant: this generator is already timed as "plan".
+                size = file_entries[0].full_size
+                refs = self._block_refs_many([(blockset_id, size)])[blockset_id]
+            for entry in file_entries:
+                yield FilePlan(entry, refs)
+
+    def block_refs_many(
+        self,
+        blocksets: Iterable[tuple[int, int | None]],
+    ) -> dict[int, list[BlockRef]]:
+        """Resolve many ``(blockset_id, expected_size)`` pairs at once.
+
+        Same result per blockset as ``block_refs``, but ``BlocksetEntry``
+        and ``BlocklistHash`` rows come from one join against a temp table
+        of the wanted IDs, each distinct blocklist block is fetched once,
+        and every content hash across all blocksets is looked up in one
+        ``Block`` join, so hashes shared between files are resolved once.
+        """
+        with self.stages.span("plan"):
+            return self._block_refs_many(blocksets)
+
+    def _block_refs_many(
+        self,
+        blocksets: Iterable[tuple[int, int | None]],
+    ) -> dict[int, list[BlockRef]]:
+        sizes = dict(blocksets)
+        refs: dict[int, list[BlockRef]] = {blockset_id: [] for blockset_id in sizes}
+        wanted = [blockset_id for blockset_id, size in sizes.items() if size != 0]
+        if not wanted:
+            return refs
+
+        # Path 1: BlocksetEntry covers the whole blockset.
+        load_temp_keys(self.conn, "wanted_blockset", "INTEGER", wanted)
+        for r in self.conn.execute(
+            """
+            SELECT be.BlocksetID AS blockset_id, b.Hash AS hash, b.Size AS size,
+                   rv.Name AS volume
+            FROM temp.wanted_blockset w
+              CROSS JOIN BlocksetEntry be ON be.BlocksetID = w.key
+              JOIN Block b          ON b.ID = be.BlockID
+              JOIN Remotevolume rv  ON rv.ID = b.VolumeID
+            ORDER BY be.BlocksetID, be."Index"
+            """
+        ):
+            refs[r["blockset_id"]].append(
                 BlockRef(
                     volume_name=r["volume"],
                     block_hash=decode_db_hash(r["hash"], "Block.Hash"),
                     block_size=r["size"],
                 )
-                for r in rows
-            ]
+            )
+        chained = [blockset_id for blockset_id in wanted if not refs[blockset_id]]
+        if not chained:
+            return refs
 
-        # Path 2: BlocklistHash chain.
+        # Path 2: BlocklistHash chains.
+        load_temp_keys(self.conn, "wanted_blockset", "INTEGER", chained)
         list_rows = self.conn.execute(
             """
-            SELECT bh.Hash AS list_hash, rv.Name AS list_volume
-            FROM BlocklistHash bh
-              JOIN Block b         ON b.Hash = bh.Hash
-              JOIN Remotevolume rv ON rv.ID = b.VolumeID
-            WHERE bh.BlocksetID = ?
-            ORDER BY bh."Index"
-            """,
-            (blockset_id,),
+            SELECT bh.BlocksetID AS blockset_id, bh."Index" AS list_index,
+                   bh.Hash AS list_hash, rv.Name AS list_volume
+            FROM temp.wanted_blockset w
+              CROSS JOIN BlocklistHash bh ON bh.BlocksetID = w.key
+              JOIN Block b          ON b.Hash = bh.Hash
+              JOIN Remotevolume rv  ON rv.ID = b.VolumeID
+            ORDER BY bh.BlocksetID, bh."Index", rv.ID, b.ID
+            """
         ).fetchall()
-        if not list_rows:
-            fail(
-                f"blockset {blockset_id} has no BlocksetEntry and no BlocklistHash rows",
-                EXIT_DATA_ERR,
-            )
-        # Look up each content block by hash.
-        content_block_hashes: list[bytes] = []
+        blobs: dict[bytes, bytes] = {}
+        content_hashes: dict[int, list[bytes]] = {blockset_id: [] for blockset_id in chained}
+        seen: tuple[int, int] | None = None
         for lr in list_rows:
+            if (lr["blockset_id"], lr["list_index"]) == seen:
+                continue  # same blocklist block stored in another volume
+            seen = (lr["blockset_id"], lr["list_index"])
             list_hash_bytes = decode_db_hash(lr["list_hash"], "BlocklistHash.Hash")
-            blob = self._fetch_block(lr["list_volume"], list_hash_bytes)
-            if len(blob) % self.hash_size != 0:
+            blob = blobs.get(list_hash_bytes)
+            if blob is None:
+                # Copy: the hashes sliced out below are used as dict keys.
+                blob = bytes(self._fetch_block(lr["list_volume"], list_hash_bytes))
+                if len(blob) % self.hash_size != 0:
+                    fail(
+                        f"blocklist block {lr['list_hash']} length {len(blob)} not a multiple of hash size {self.hash_size}",
+                        EXIT_DATA_ERR,
+                    )
+                blobs[list_hash_bytes] = blob
+            hashes = content_hashes[lr["blockset_id"]]
+            for i in range(0, len(blob), self.hash_size):
+                hashes.append(blob[i : i + self.hash_size])
+        listed = {lr["blockset_id"] for lr in list_rows}
+        for blockset_id, hashes in content_hashes.items():
+            if not hashes:
+                if blockset_id not in listed:
+                    fail(
+                        f"blockset {blockset_id} has no BlocksetEntry and no BlocklistHash rows",
+                        EXIT_DATA_ERR,
+                    )
                 fail(
-                    f"blocklist block {lr['list_hash']} length {len(blob)} not a multiple of hash size {self.hash_size}",
+                    f"blockset {blockset_id} BlocklistHash rows produced no content hashes",
                     EXIT_DATA_ERR,
                 )
-            for i in range(0, len(blob), self.hash_size):
-                content_block_hashes.append(blob[i : i + self.hash_size])
 
-        if not content_block_hashes:
-            fail(
-                f"blockset {blockset_id} BlocklistHash rows produced no content hashes",
-                EXIT_DATA_ERR,
-            )
-        unique_hashes = list(dict.fromkeys(content_block_hashes))
-        block_rows: list[sqlite3.Row] = []
-        batch_size = self._block_lookup_hash_batch_size()
-        for offset in range(0, len(unique_hashes), batch_size):
-            hash_batch = unique_hashes[offset : offset + batch_size]
-            b64_set = {
-                encoded
-                for h in hash_batch
-                for encoded in (
-                    base64.b64encode(h).decode("ascii"),
-                    base64.b64encode(h).decode("ascii").rstrip("="),
-                )
-            }
-            placeholders = ",".join("?" for _ in b64_set)
-            block_rows.extend(
-                self.conn.execute(
-                    f"""
-                    SELECT b.ID AS block_id, b.Hash AS hash, b.Size AS size,
-                           rv.Name AS volume, rv.ID AS rv_id
-                    FROM Block b
-                      JOIN Remotevolume rv ON rv.ID = b.VolumeID
-                    WHERE b.Hash IN ({placeholders})
-                    ORDER BY rv.ID, b.ID
-                    """,
-                    tuple(sorted(b64_set)),
-                ).fetchall()
-            )
+        block_index = self._lookup_block_hashes(
+            h for hashes in content_hashes.values() for h in hashes
+        )
+        for blockset_id, hashes in content_hashes.items():
+            blockset_refs = refs[blockset_id]
+            for h in hashes:
+                hit = block_index.get(h)
+                if hit is None:
+                    fail(
+                        f"blocklist references hash {h.hex()} not present in Block table",
+                        EXIT_DATA_ERR,
+                    )
+                volume, size = hit
+                blockset_refs.append(BlockRef(volume_name=volume, block_hash=h, block_size=size))
+        return refs
+
+    def _lookup_block_hashes(self, hashes: Iterable[bytes]) -> dict[bytes, tuple[str, int]]:
+        """Map raw block hashes to ``(volume, size)`` with one temp-table join.
+
+        The wanted hashes go into ``temp.wanted_block_hash`` and are joined
+        against ``Block`` through its ``(Hash, Size)`` index, so there is no
+        bind-variable cap to batch around and one query plan regardless of
+        how many blocks a file has. ``Block.Hash`` is base64 text, padded or
+        not depending on the writer, so both spellings are loaded; the
+        lowest volume ID wins for blocks stored more than once.
+        """
+        spellings = set()
+        for h in set(hashes):
+            padded = base64.b64encode(h).decode("ascii")
+            spellings.add(padded)
+            spellings.add(padded.rstrip("="))
+        load_temp_keys(self.conn, "wanted_block_hash", "TEXT", spellings)
         block_index: dict[bytes, tuple[str, int]] = {}
-        for row in block_rows:
+        for row in self.conn.execute(
+            """
+            SELECT b.Hash AS hash, b.Size AS size, rv.Name AS volume
+            FROM temp.wanted_block_hash w
+              -- CROSS JOIN pins the loop order: walk the (small) wanted set
+              -- and probe Block's (Hash, Size) index, never scan Block.
+              CROSS JOIN Block b   ON b.Hash = w.key
+              JOIN Remotevolume rv ON rv.ID = b.VolumeID
+            ORDER BY rv.ID, b.ID
+            """
+        ):
             raw_hash = decode_db_hash(row["hash"], "Block.Hash")
             block_index.setdefault(raw_hash, (row["volume"], row["size"]))
+        return block_index
 
-        refs: list[BlockRef] = []
-        for h in content_block_hashes:
-            hit = block_index.get(h)
-            if hit is None:
-                fail(
-                    f"blocklist references hash {h.hex()} not present in Block table",
-                    EXIT_DATA_ERR,
-                )
-            volume, size = hit
-            refs.append(BlockRef(volume_name=volume, block_hash=h, block_size=size))
-        return refs
+    def volume_sizes(self, volume_names: Iterable[str]) -> dict[str, int | None]:
+        """Encrypted size of each volume from ``Remotevolume.Size``.
+
+        ``None`` for a volume whose size the database does not know
+        (Duplicati records ``-1`` until an upload completes).
+        """
+        load_temp_keys(self.conn, "wanted_volume", "TEXT", volume_names)
+        sizes: dict[str, int | None] = {}
+        for row in self.conn.execute(
+            """
+            SELECT rv.Name AS name, rv.Size AS size
+            FROM temp.wanted_volume w
+              CROSS JOIN Remotevolume rv ON rv.Name = w.key
+            """
+        ):
+            size = row["size"]
+            sizes[row["name"]] = size if size is not None and size >= 0 else None
+        return sizes
+
+    def block_refs(self, blockset_id: int, expected_size: int | None = None) -> list[BlockRef]:
+        """Resolve a blockset's content blocks in stream order.
+
+        ``expected_size`` is the file's plaintext length from
+        ``Blockset.Length``; passing ``0`` short-circuits the lookup for
+        zero-byte files (which legitimately have neither ``BlocksetEntry``
+        nor ``BlocklistHash`` rows).
+        """
+        return self.block_refs_many([(blockset_id, expected_size)])[blockset_id]
+
+
+# (ref, bytes, already verified, clone source (fd, offset) or None)
+_PendingBlock = tuple[BlockRef, BlockData, bool, tuple[int, int] | None]
 
 
 class Extractor:
@@ -1073,121 +2753,538 @@ class Extractor:
         blocksize: int | None,
         block_hash_algo: str,
         file_hash_algo: str,
+        parallel_fetch: int = 0,
+        decrypted_cache: DecryptedVolumeCache | None = None,
+        block_cache: BlockCache | None = None,
+        hash_workers: int = 0,
+        stages: StageTimes | None = None,
     ):
         self.conn = conn
+        self.stages = stages or StageTimes()
         self.source = source
         self.cache = cache
         self.decrypter = decrypter
         self.blocksize = blocksize
         self.block_hash_algo = block_hash_algo.upper()
         self.file_hash_algo = file_hash_algo.upper()
-        self._open_volumes: collections.OrderedDict[str, OpenedVolume] = collections.OrderedDict()
-        self.resolver = BlockResolver(conn, block_hash_algo, self._fetch_block_bytes)
+        self.decrypted_cache = decrypted_cache
+        self.block_cache = block_cache
+        self._hash_pool: ThreadPoolExecutor | None = None
+        self._hash_window = 0
+        self._start_hash_pool(hash_workers)
+        self._open_volumes: collections.OrderedDict[str, VolumeView] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._opening: dict[str, threading.Event] = {}
+        self._pins: collections.Counter[VolumeView] = collections.Counter()
+        self._retired: set[VolumeView] = set()
+        # Block clones: hashes worth reusing and, once a file holding one is
+        # committed, where its bytes landed.
+        self.clone_candidates: set[bytes] = set()
+        self._written: dict[bytes, tuple[Path, int]] = {}
+        # An all-zero block is recognised by its hash, so it is never
+        # fetched or scanned; output files get a hole instead of the bytes.
+        self._zero_block = bytes(blocksize or 0)
+        self._zero_hash: bytes | None = None
+        if blocksize:
+            try:
+                self._zero_hash = hashlib.new(self.block_hash_algo, self._zero_block).digest()
+            except ValueError:
+                pass  # reported by the first block verification
+        self.prefetcher = VolumePrefetcher(source, cache, parallel_fetch, self.stages)
+        self.resolver = BlockResolver(
+            conn, block_hash_algo, self._fetch_block_bytes, self.stages
+        )
 
-    def _open_volume(self, volume_name: str) -> OpenedVolume:
-        cached = self._open_volumes.get(volume_name)
-        if cached is not None:
-            self._open_volumes.move_to_end(volume_name)
-            return cached
-        encrypted, cache_hit = self.cache.get_with_status(volume_name, self.source.fetch)
+    def _open_volume(self, volume_name: str, pin: bool = False) -> VolumeView:
+        """Return the decrypted view of ``volume_name``, opening it once.
+
+        Writer threads share the open-volume LRU. A volume is fetched and
+        decrypted by the first thread that asks for it; the others wait for
+        that open rather than downloading it again. ``pin`` keeps the volume
+        from being closed by LRU eviction until ``_unpin``.
+        """
+        while True:
+            with self._lock:
+                vol = self._open_volumes.get(volume_name)
+                if vol is not None:
+                    self._open_volumes.move_to_end(volume_name)
+                    if pin:
+                        self._pins[vol] += 1
+                    break
+                opening = self._opening.get(volume_name)
+                if opening is None:
+                    opening = self._opening[volume_name] = threading.Event()
+                    break
+            opening.wait()
+        if vol is not None:
+            self.prefetcher.release(volume_name)
+            return vol
+        try:
+            vol = self._load_volume(volume_name)
+            with self._lock:
+                self._open_volumes[volume_name] = vol
+                if pin:
+                    self._pins[vol] += 1
+                while len(self._open_volumes) > MAX_OPEN_VOLUMES:
+                    _name, evicted = self._open_volumes.popitem(last=False)
+                    if self._pins[evicted]:
+                        # Another writer is mid-read; it closes on unpin.
+                        self._retired.add(evicted)
+                    else:
+                        evicted.close()
+        finally:
+            with self._lock:
+                del self._opening[volume_name]
+            opening.set()
+        return vol
+
+    def _unpin(self, vol: VolumeView) -> None:
+        with self._lock:
+            self._pins[vol] -= 1
+            if self._pins[vol]:
+                return
+            del self._pins[vol]
+            if vol not in self._retired:
+                return
+            self._retired.discard(vol)
+        vol.close()
+
+    def _load_volume(self, volume_name: str) -> VolumeView:
+        if self.decrypted_cache is not None:
+            indexed = self.decrypted_cache.open(volume_name)
+            if indexed is not None:
+                self.prefetcher.release(volume_name)
+                return indexed
+        opened = self.prefetcher.take(volume_name)
+        if opened is None:
+            opened = self.cache.open_from_source(volume_name, self.source)
+        encrypted, cache_hit = opened
         try:
-            decrypted = self.decrypter.decrypt(encrypted, volume_name)
+            with encrypted:
+                decrypted = self._decrypt(encrypted, volume_name)
         except AesDecryptError as exc:
             if not cache_hit or not self.cache.evict(volume_name):
                 fail(str(exc), EXIT_DATA_ERR)
-            encrypted, _cache_hit = self.cache.get_with_status(
-                volume_name,
-                self.source.fetch,
-            )
+            encrypted, _cache_hit = self.cache.open_from_source(volume_name, self.source)
             try:
-                decrypted = self.decrypter.decrypt(encrypted, volume_name)
+                with encrypted:
+                    decrypted = self._decrypt(encrypted, volume_name)
             except AesDecryptError as retry_exc:
                 fail(str(retry_exc), EXIT_DATA_ERR)
-        vol = OpenedVolume(
-            volume_name,
-            decrypted,
-            self.blocksize,
-            self.block_hash_algo,
-            self.file_hash_algo,
-        )
-        self._open_volumes[volume_name] = vol
-        while len(self._open_volumes) > MAX_OPEN_VOLUMES:
-            _name, evicted = self._open_volumes.popitem(last=False)
-            evicted.close()
+        with self.stages.span("zip", volume_name):
+            vol = OpenedVolume(
+                volume_name,
+                decrypted,
+                self.blocksize,
+                self.block_hash_algo,
+                self.file_hash_algo,
+            )
+        if self.decrypted_cache is not None:
+            self.decrypted_cache.store(vol)
         return vol
 
-    def _fetch_block_bytes(self, volume_name: str, block_hash: bytes) -> bytes:
-        vol = self._open_volume(volume_name)
-        block = vol.block_bytes(block_hash)
-        self._verify_block_hash(volume_name, block_hash, block)
+    def _decrypt(self, encrypted: BinaryIO, volume_name: str) -> BinaryIO:
+        with self.stages.span("decrypt", volume_name) as span:
+            span.bytes = encrypted.seek(0, io.SEEK_END)  # ciphertext in
+            encrypted.seek(0)
+            return self.decrypter.decrypt(encrypted, volume_name)
+
+    def _start_hash_pool(self, hash_workers: int) -> None:
+        """Start the block-verification pool, unless it cannot help.
+
+        Blocks below ``HASHLIB_GIL_MINSIZE`` are hashed with the GIL held, so
+        for them the pool stays off and blocks are verified inline.
+        """
+        if hash_workers <= 0 or (self.blocksize is not None and self.blocksize < HASHLIB_GIL_MINSIZE):
+            return
+        self._hash_pool = ThreadPoolExecutor(
+            max_workers=hash_workers,
+            thread_name_prefix="duplicati-r2-hash",
+        )
+        self._hash_window = 2 * hash_workers
+
+    def _read_block(
+        self, volume_name: str, block_hash: bytes, tally: StageTally | None = None
+    ) -> tuple[BlockData, bool]:
+        """Return a block and whether it is already verified.
+
+        Block-cache hits were re-hashed by the cache; bytes read from a
+        volume still need ``_verify_block_hash`` before they are used.
+        """
+        if self.block_cache is not None:
+            started = time.perf_counter() if tally is not None else 0.0
+            cached = self.block_cache.get(block_hash)
+            if tally is not None:
+                tally.add("block_cache", started, len(cached) if cached is not None else 0)
+            if cached is not None:
+                return cached, True
+        vol = self._open_volume(volume_name, pin=True)
+        try:
+            started = time.perf_counter() if tally is not None else 0.0
+            block = vol.block_bytes(block_hash)
+            if tally is not None:
+                tally.add("zip", started, len(block))
+            return block, False
+        finally:
+            self._unpin(vol)
+
+    def _fetch_block_bytes(self, volume_name: str, block_hash: bytes) -> BlockData:
+        tally = self.stages.tally()
+        block, verified = self._read_block(volume_name, block_hash, tally)
+        if not verified:
+            self._verify_block_hash(volume_name, block_hash, block, tally)
+            if self.block_cache is not None:
+                self.block_cache.put(block_hash, block)
+        self.stages.merge(tally)
         return block
 
-    def _verify_block_hash(self, volume_name: str, block_hash: bytes, block: bytes) -> None:
+    def _needs_volume(self, ref: BlockRef) -> bool:
+        """Whether reading ``ref`` will have to open its volume."""
+        if (
+            self._is_zero(ref)
+            or ref.volume_name in self._open_volumes
+            or ref.block_hash in self._written
+        ):
+            return False
+        return self.block_cache is None or not self.block_cache.contains(ref.block_hash)
+
+    def _is_zero(self, ref: BlockRef) -> bool:
+        return ref.block_hash == self._zero_hash and ref.block_size == len(self._zero_block)
+
+    def _verify_block_hash(
+        self,
+        volume_name: str,
+        block_hash: bytes,
+        block: BlockData,
+        tally: StageTally | None = None,
+    ) -> None:
+        started = time.perf_counter() if tally is not None else 0.0
         try:
-            digest = hashlib.new(self.block_hash_algo)
+            digest = hashlib.new(self.block_hash_algo, block)
         except ValueError as exc:
             fail(
                 f"unsupported BlockHash algorithm: {self.block_hash_algo!r} ({exc})",
                 EXIT_DATA_ERR,
             )
-        digest.update(block)
+        if tally is not None:
+            tally.add("hash", started, len(block))
         if digest.digest() != block_hash:
             fail(
                 f"block hash mismatch for {base64url_name(block_hash)} from {volume_name}: computed {digest.hexdigest()}, expected {block_hash.hex()}",
                 EXIT_DATA_ERR,
             )
 
-    def extract_file(
+    def _verify_batch(self, batch: list[_PendingBlock]) -> None:
+        """Verify a batch on a hash-pool thread, with its own tally."""
+        tally = self.stages.tally()
+        for ref, block, verified, _source in batch:
+            if not verified:
+                self._verify_block_hash(ref.volume_name, ref.block_hash, block, tally)
+        self.stages.merge(tally)
+
+    def _read_written(
+        self, ref: BlockRef, out: OutputFile, tally: StageTally | None = None
+    ) -> tuple[bytes, tuple[int, int]] | None:
+        """Re-read ``ref`` from a region this restore already wrote.
+
+        Looks in ``out`` itself, then in files committed earlier. Returns the
+        bytes and the ``(fd, offset)`` to clone from, or None when the block
+        has to come from its volume. The bytes are hashed again, so a region
+        changed on disk since it was written is simply not reused.
+        """
+        if ref.block_hash not in self.clone_candidates:
+            return None
+        offset = out.regions.get(ref.block_hash)
+        if offset is not None:
+            fd = out.fd
+        else:
+            with self._lock:
+                written = self._written.get(ref.block_hash)
+            if written is None:
+                return None
+            path, offset = written
+            fd = out.source_fd(path)
+            if fd is None:
+                return None
+        started = time.perf_counter() if tally is not None else 0.0
+        try:
+            data = os.pread(fd, ref.block_size, offset)
+        except OSError:
+            return None
+        reusable = (
+            len(data) == ref.block_size
+            and hashlib.new(self.block_hash_algo, data).digest() == ref.block_hash
+        )
+        if tally is not None:
+            tally.add("reuse", started, len(data))
+        return (data, (fd, offset)) if reusable else None
+
+    def record_written(self, target: Path, out: OutputFile) -> None:
+        """Offer the clone candidates in committed ``target`` to later files."""
+        with self._lock:
+            for block_hash, offset in out.regions.items():
+                self._written.setdefault(block_hash, (target, offset))
+
+    def plan_file(self, snapshot_id: int, abs_path: str) -> FilePlan:
+        """Resolve ``abs_path`` to its entry and ordered BlockRefs."""
+        entry = self.resolver.lookup_file(snapshot_id, abs_path)
+        return FilePlan(entry, self.resolver.block_refs(entry.blockset_id, entry.full_size))
+
+    def plan_files(
+        self,
+        snapshot_id: int,
+        abs_paths: Iterable[str],
+        keep: Callable[[FileEntry], bool] | None = None,
+    ) -> list[FilePlan]:
+        """Plan many paths, resolving their blocksets in one batch."""
+        return self.plan_entries(self.lookup_files(snapshot_id, abs_paths), keep)
+
+    def lookup_files(self, snapshot_id: int, abs_paths: Iterable[str]) -> list[FileEntry]:
+        return [self.resolver.lookup_file(snapshot_id, path) for path in abs_paths]
+
+    def plan_entries(
+        self,
+        entries: Iterable[FileEntry],
+        keep: Callable[[FileEntry], bool] | None = None,
+    ) -> list[FilePlan]:
+        """Resolve blocks for ``entries`` in one batch.
+
+        Files ``keep`` rejects are dropped before any block is resolved.
+        """
+        kept = [entry for entry in entries if keep is None or keep(entry)]
+        refs = self.resolver.block_refs_many((entry.blockset_id, entry.full_size) for entry in kept)
+        return [FilePlan(entry, refs[entry.blockset_id]) for entry in kept]
+
+    def plan_snapshot(
+        self,
+        snapshot_id: int,
+        prefix: str | None = None,
+        keep: Callable[[FileEntry], bool] | None = None,
+    ) -> Iterator[FilePlan]:
+        """Stream plans for every file under ``prefix`` in BlocksetID order."""
+        return self.resolver.snapshot_plans(snapshot_id, prefix, keep)
+
+    def snapshot_files(self, snapshot_id: int, prefix: str | None = None) -> Iterator[FileEntry]:
+        """Stream the files ``plan_snapshot`` would plan, without their blocks."""
+        return self.resolver.snapshot_files(snapshot_id, prefix)
+
+    def volumes_for(self, plans: Iterable[FilePlan]) -> list[str]:
+        """Volumes that writing ``plans`` would read, in first-use order.
+
+        All-zero blocks and blocks already in the block cache need no volume.
+        """
+        needed: dict[str, None] = {}
+        for plan in plans:
+            for ref in plan.refs:
+                if ref.volume_name in needed or self._is_zero(ref):
+                    continue
+                if self.block_cache is None or not self.block_cache.contains(ref.block_hash):
+                    needed[ref.volume_name] = None
+        return list(needed)
+
+    def extract_file(
+        self,
+        snapshot_id: int,
+        abs_path: str,
+        sink_writer: Callable[[BlockData], object],
+        stats: ExtractStats,
+        delta_against: Path | None = None,
+    ) -> None:
+        plan = self.plan_file(snapshot_id, abs_path)
+        if delta_against is not None:
+            stats.bytes_delta += self.seed_delta(plan, delta_against)
+        self.write_file(plan, sink_writer, stats)
+
+    def seed_delta(self, plan: FilePlan, local: Path) -> int:
+        """Offer the blocks of ``local`` that ``plan`` needs as clone sources.
+
+        ``local`` is hashed in ``blocksize`` chunks with the database's block
+        hash. Chunks matching one of ``plan``'s blocks are registered like
+        regions of an already committed output, so ``_write_file`` re-hashes
+        and clones (or copies) them from ``local`` and the prefetcher never
+        schedules a volume that only they would need. Matching is by hash,
+        so a block found at another offset counts too. Returns the plaintext
+        bytes of ``plan`` that ``local`` covers.
+        """
+        if not self.blocksize:
+            fail("--delta-against needs the database's blocksize configuration", EXIT_DATA_ERR)
+        wanted = {ref.block_hash for ref in plan.refs if not self._is_zero(ref)}
+        found: dict[bytes, int] = {}
+        try:
+            fd = os.open(str(local), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        except OSError as exc:
+            fail(f"failed to open --delta-against file {local}: {exc}", EXIT_OPEN_ERR)
+        try:
+            with self.stages.span("delta", str(local)) as span:
+                offset = 0
+                while chunk := os.pread(fd, self.blocksize, offset):
+                    digest = hashlib.new(self.block_hash_algo, chunk).digest()
+                    if digest in wanted:
+                        found.setdefault(digest, offset)
+                    offset += len(chunk)
+                span.bytes = offset
+        except OSError as exc:
+            fail(f"failed to read --delta-against file {local}: {exc}", EXIT_OPEN_ERR)
+        finally:
+            os.close(fd)
+        with self._lock:
+            for block_hash, block_offset in found.items():
+                self._written.setdefault(block_hash, (local, block_offset))
+        self.clone_candidates.update(found)
+        return sum(ref.block_size for ref in plan.refs if ref.block_hash in found)
+
+    def write_file(
         self,
-        snapshot_id: int,
-        abs_path: str,
-        sink_writer: Callable[[bytes], object],
+        plan: FilePlan,
+        sink_writer: Callable[[BlockData], object],
         stats: ExtractStats,
     ) -> None:
-        entry = self.resolver.lookup_file(snapshot_id, abs_path)
-        refs = self.resolver.block_refs(entry.blockset_id, entry.full_size)
+        with self.stages.span("file", plan.entry.path) as span:
+            span.bytes = plan.entry.full_size or 0
+            self._write_file(plan, sink_writer, stats)
+
+    def _write_file(
+        self,
+        plan: FilePlan,
+        sink_writer: Callable[[BlockData], object],
+        stats: ExtractStats,
+    ) -> None:
+        entry, refs = plan.entry, plan.refs
         if not refs:
             # Zero-byte file: opener still needs to create the destination,
             # but there is nothing to fetch, decrypt, hash, or write.
+            stats.files += 1
             return
-        digest = hashlib.new(self.file_hash_algo) if self.file_hash_algo else None
+        # Read ahead the volumes this file still needs; ones already open
+        # are served from the decrypted LRU and blocks in the block cache
+        # never touch their volume, so neither is scheduled.
+        self.prefetcher.schedule(ref.volume_name for ref in refs if self._needs_volume(ref))
+        # A single-block file's FullHash is its block hash when both use the
+        # same algorithm; the verified block hash then covers the file too.
+        single_block = len(refs) == 1 and self.file_hash_algo == self.block_hash_algo
+        digest = (
+            hashlib.new(self.file_hash_algo)
+            if self.file_hash_algo and not single_block
+            else None
+        )
         bytes_written = 0
+        # Output files can take clone candidates from regions already written
+        # in this restore instead of fetching and writing them again.
+        out = sink_writer if isinstance(sink_writer, OutputFile) else None
+        # Per-block timings for this file, folded into self.stages once at
+        # the end; None unless --json/--trace asked for them.
+        tally = self.stages.tally()
+
+        def emit(batch: list[_PendingBlock]) -> None:
+            nonlocal bytes_written
+            for ref, block, verified, source in batch:
+                started = time.perf_counter() if tally is not None else 0.0
+                if self._is_zero(ref):
+                    if out is not None:
+                        out.skip(len(block))
+                        stats.bytes_sparse += len(block)
+                    else:
+                        sink_writer(block)
+                elif source is not None:
+                    if out is not None and out.clone(*source, len(block)):
+                        stats.bytes_cloned += len(block)
+                    else:
+                        sink_writer(block)
+                else:
+                    if out is not None and ref.block_hash in self.clone_candidates:
+                        out.regions.setdefault(ref.block_hash, out.offset)
+                    if not verified and self.block_cache is not None:
+                        self.block_cache.put(ref.block_hash, block)
+                    stats.dblocks_touched.add(ref.volume_name)
+                    sink_writer(block)
+                if tally is not None:
+                    tally.add("write", started, len(block))
+                if digest is not None:
+                    started = time.perf_counter() if tally is not None else 0.0
+                    digest.update(block)
+                    if tally is not None:
+                        tally.add("hash", started, len(block))
+                bytes_written += len(block)
+
+        # Blocks are verified before they reach the sink. With a hash pool
+        # they are verified in batches on worker threads (hashlib releases
+        # the GIL for blocks of at least HASHLIB_GIL_MINSIZE bytes) while
+        # later blocks are read; batches are written strictly in order as
+        # their verification completes.
+        pending: collections.deque[tuple[list[_PendingBlock], Future[None]]] = collections.deque()
+        batch: list[_PendingBlock] = []
+        batch_bytes = 0
         for ref in refs:
-            block = self._fetch_block_bytes(ref.volume_name, ref.block_hash)
+            source: tuple[int, int] | None = None
+            if self._is_zero(ref):
+                block, verified = self._zero_block, True
+            elif out is not None and (reused := self._read_written(ref, out, tally)) is not None:
+                block, source = reused
+                verified = True
+            else:
+                block, verified = self._read_block(ref.volume_name, ref.block_hash, tally)
             if len(block) != ref.block_size:
                 fail(
                     f"block {base64url_name(ref.block_hash)} from {ref.volume_name} has size {len(block)}, expected {ref.block_size}",
                     EXIT_DATA_ERR,
                 )
-            stats.dblocks_touched.add(ref.volume_name)
-            sink_writer(block)
-            if digest is not None:
-                digest.update(block)
-            bytes_written += len(block)
+            if self._hash_pool is None:
+                if not verified:
+                    self._verify_block_hash(ref.volume_name, ref.block_hash, block, tally)
+                emit([(ref, block, verified, source)])
+                continue
+            batch.append((ref, block, verified, source))
+            batch_bytes += len(block)
+            if batch_bytes >= HASH_BATCH_BYTES:
+                pending.append((batch, self._hash_pool.submit(self._verify_batch, batch)))
+                batch, batch_bytes = [], 0
+                while len(pending) > self._hash_window:
+                    done, future = pending.popleft()
+                    future.result()
+                    emit(done)
+        if batch:
+            assert self._hash_pool is not None
+            pending.append((batch, self._hash_pool.submit(self._verify_batch, batch)))
+        while pending:
+            done, future = pending.popleft()
+            future.result()
+            emit(done)
+        self.stages.merge(tally)
+
         if entry.full_size is not None and bytes_written != entry.full_size:
             fail(
-                f"size mismatch for {abs_path}: wrote {bytes_written}, Blockset.Length={entry.full_size}",
+                f"size mismatch for {entry.path}: wrote {bytes_written}, Blockset.Length={entry.full_size}",
                 EXIT_DATA_ERR,
             )
-        if digest is not None and entry.full_hash:
+        if entry.full_hash and (digest is not None or single_block):
             try:
                 expected = base64.b64decode(entry.full_hash + "=" * (-len(entry.full_hash) % 4))
             except binascii.Error as exc:
                 fail(
-                    f"Blockset.FullHash for {abs_path} is not valid base64 ({exc}); DB likely corrupt",
+                    f"Blockset.FullHash for {entry.path} is not valid base64 ({exc}); DB likely corrupt",
                     EXIT_DATA_ERR,
                 )
-            if digest.digest() != expected:
+            actual = digest.digest() if digest is not None else refs[0].block_hash
+            if actual != expected:
                 fail(
-                    f"FullHash mismatch for {abs_path}: computed {digest.hexdigest()}, expected {expected.hex()}",
+                    f"FullHash mismatch for {entry.path}: computed {actual.hex()}, expected {expected.hex()}",
                     EXIT_DATA_ERR,
                 )
         stats.plaintext_size += bytes_written
+        stats.files += 1
 
     def close(self) -> None:
-        for vol in self._open_volumes.values():
+        self.prefetcher.close()
+        if self._hash_pool is not None:
+            self._hash_pool.shutdown(wait=True, cancel_futures=True)
+            self._hash_pool = None
+        if self.decrypted_cache is not None:
+            self.decrypted_cache.close()
+        for vol in [*self._open_volumes.values(), *self._retired]:
             vol.close()
         self._open_volumes.clear()
+        self._retired.clear()
+        self._pins.clear()
 
 
 # ---------------------------------------------------------------------------
@@ -1224,9 +3321,106 @@ def _ensure_private_dir(path: Path) -> None:
             _chmod_private_dir(directory)
 
 
+class OutputFile:
+    """Staged output file written at a tracked offset.
+
+    Callable like any sink writer. ``regions`` records where clone
+    candidates landed so later blocks, in this file or (once it is
+    committed) in other files, can be cloned from them; ``clone`` fills the
+    next region from another file without a userspace copy; ``skip``
+    leaves a hole for an all-zero block.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.offset = 0
+        self.regions: dict[bytes, int] = {}
+        self._sources: dict[Path, int | None] = {}
+        self._reflink = True
+        # FICLONERANGE only takes offsets and lengths in whole filesystem
+        # blocks; anything else goes straight to copy_file_range.
+        try:
+            self._clone_align = os.fstatvfs(fd).f_bsize
+        except OSError:
+            self._reflink = False
+        self._copy_range = hasattr(os, "copy_file_range")
+
+    def __call__(self, block: BlockData) -> None:
+        view = memoryview(block)
+        while view:
+            written = os.pwrite(self.fd, view, self.offset)
+            self.offset += written
+            view = view[written:]
+
+    def clone(self, src_fd: int, src_offset: int, length: int) -> bool:
+        """Append ``length`` bytes of ``src_fd`` at ``src_offset`` by cloning.
+
+        Tries a reflink (``FICLONERANGE``; btrfs, xfs) when both offsets and
+        the length are block-aligned, and then ``copy_file_range``. Returns
+        False when neither applies, leaving the caller to write the bytes
+        itself; a filesystem that refuses one of them outright is not asked
+        again.
+        """
+        align = self._clone_align if self._reflink else 0
+        if align and src_offset % align == 0 and length % align == 0 and self.offset % align == 0:
+            try:
+                fcntl.ioctl(
+                    self.fd,
+                    FICLONERANGE,
+                    FILE_CLONE_RANGE.pack(src_fd, src_offset, length, self.offset),
+                )
+            except OSError:
+                self._reflink = False
+            else:
+                self.offset += length
+                return True
+        if self._copy_range:
+            done = 0
+            try:
+                while done < length:
+                    copied = os.copy_file_range(
+                        src_fd,
+                        self.fd,
+                        length - done,
+                        src_offset + done,
+                        self.offset + done,
+                    )
+                    if copied == 0:
+                        return False
+                    done += copied
+            except OSError as exc:
+                if exc.errno in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP):
+                    self._copy_range = False
+                return False
+            self.offset += length
+            return True
+        return False
+
+    def skip(self, length: int) -> None:
+        """Leave a hole of ``length`` zero bytes; committing sets the size."""
+        self.offset += length
+
+    def source_fd(self, path: Path) -> int | None:
+        """Read-only descriptor for a committed output file, opened once."""
+        if path not in self._sources:
+            try:
+                self._sources[path] = os.open(
+                    str(path), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0)
+                )
+            except OSError:
+                self._sources[path] = None
+        return self._sources[path]
+
+    def close_sources(self) -> None:
+        for fd in self._sources.values():
+            if fd is not None:
+                os.close(fd)
+        self._sources.clear()
+
+
 @contextlib.contextmanager
 def _atomic_writer(dest: Path):
-    """Yield a writer for ``dest``; commit-on-success, unlink-on-failure.
+    """Yield an ``OutputFile`` for ``dest``; commit-on-success, unlink-on-failure.
 
     Stages bytes through a sibling ``<dest>.partial`` file (mode 0600) and
     atomically renames into place only after the body completes without
@@ -1244,28 +3438,34 @@ def _atomic_writer(dest: Path):
         fail(f"failed to remove stale output partial {tmp}: {exc}", EXIT_OPEN_ERR)
     # Atomic creation at mode 0600. O_EXCL and O_NOFOLLOW refuse planted
     # partials and final-component symlinks instead of truncating through them.
-    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
+    # Opened read-write: blocks repeated within the file are cloned from
+    # the file's own earlier regions.
+    flags = os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, "O_NOFOLLOW", 0)
     try:
         fd = os.open(str(tmp), flags, 0o600)
     except FileExistsError:
         fail(f"temporary output path already exists: {tmp}", EXIT_OPEN_ERR)
     except OSError as exc:
         fail(f"failed to create temporary output path {tmp}: {exc}", EXIT_OPEN_ERR)
-    fh = os.fdopen(fd, "wb")
+    out = OutputFile(fd)
     committed = False
     try:
-        yield fh.write
-        fh.flush()
-        os.fsync(fh.fileno())
-        fh.close()
+        yield out
+        # A trailing hole from ``skip`` still has to count toward the size.
+        os.ftruncate(fd, out.offset)
+        os.fsync(fd)
+        os.close(fd)
+        fd = -1
         os.replace(tmp, dest)
         committed = True
     finally:
+        out.close_sources()
         if not committed:
-            try:
-                fh.close()
-            except OSError:
-                pass
+            if fd >= 0:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
             try:
                 os.unlink(tmp)
             except FileNotFoundError:
@@ -1281,6 +3481,64 @@ def _stdout_writer():
         out.flush()
 
 
+class TarStream:
+    """Write restored files as one POSIX (pax) tar stream through ``write``.
+
+    Nothing is staged: each member's header is built from its FileEntry
+    (``Blockset.Length`` is known before any block is read), its blocks
+    pass straight through, and ``close`` ends the archive. With
+    ``compress`` the stream is a single zstd frame (Python 3.14
+    ``compression.zstd``). A restore that fails mid-member leaves the
+    stream without its end-of-archive marker, so ``tar`` reports it
+    truncated instead of extracting a short file.
+    """
+
+    def __init__(self, write: Callable[[BlockData], object], compress: bool = False):
+        self._write = write
+        self._compressor = None
+        if compress:
+            try:
+                from compression import zstd  # type: ignore
+            except ImportError as exc:
+                fail(f"zstd output needs Python 3.14 compression.zstd ({exc})", EXIT_USAGE)
+            self._compressor = zstd.ZstdCompressor()
+
+    def _emit(self, data: BlockData) -> None:
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+            if not data:
+                return
+        self._write(data)
+
+    @contextlib.contextmanager
+    def member(self, entry: FileEntry) -> Iterator[Callable[[BlockData], None]]:
+        """Yield the sink writer for ``entry``'s content."""
+        info = tarfile.TarInfo(_archive_member_name(entry.path))
+        info.size = entry.full_size or 0
+        info.mtime = entry.mtime or 0
+        info.mode = 0o600
+        self._emit(info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape"))
+        yield self._emit
+        # write_file has already failed the run if fewer bytes arrived.
+        padding = -info.size % tarfile.BLOCKSIZE
+        if padding:
+            self._emit(bytes(padding))
+
+    def close(self) -> None:
+        self._emit(bytes(2 * tarfile.BLOCKSIZE))
+        if self._compressor is not None:
+            self._write(self._compressor.flush())
+
+
+def _archive_member_name(src_path: str) -> str:
+    rel = src_path.lstrip("/").rstrip("/")
+    if not rel:
+        fail("refusing to archive an empty relative path", EXIT_USAGE)
+    if any(part == ".." for part in rel.split("/")):
+        fail(f"path {src_path!r} contains '..' segments; refusing in tar output", EXIT_USAGE)
+    return rel
+
+
 def _validate_output_dir_target(output_dir: Path, src_path: str) -> Path:
     rel = src_path.lstrip("/").rstrip("/")
     if not rel:
@@ -1305,6 +3563,165 @@ def _validate_output_dir_target(output_dir: Path, src_path: str) -> Path:
     return target
 
 
+# ---------------------------------------------------------------------------
+# Restore journal
+# ---------------------------------------------------------------------------
+
+
+class RestoreJournal:
+    """Append-only record of the files an ``--output-dir`` restore committed.
+
+    ``<output-dir>/.duplicati-r2-extract.journal`` (mode 0600) holds one JSON
+    object per line: a header naming the slug and snapshot, then one line
+    per file after ``_atomic_writer`` renamed it into place, carrying its
+    path, size and the FullHash it verified against. A fresh run truncates
+    the journal; ``resume=True`` loads it instead, refuses a journal from
+    another slug or snapshot, and appends. Lines are written with one
+    ``O_APPEND`` write each and never fsynced: a line lost to a crash only
+    means that file is restored again, and a torn last line is ignored.
+    """
+
+    def __init__(self, output_dir: Path, slug: str, snapshot_id: int, resume: bool):
+        self.path = output_dir / JOURNAL_NAME
+        self.done: dict[str, tuple[int, str | None]] = {}
+        self._lock = threading.Lock()
+        header = {"slug": slug, "snapshot_id": snapshot_id}
+        torn = resume and self._load(header)
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0)
+        if not resume:
+            flags |= os.O_TRUNC
+        try:
+            self._fd = os.open(str(self.path), flags, 0o600)
+        except OSError as exc:
+            fail(f"failed to open restore journal {self.path}: {exc}", EXIT_OPEN_ERR)
+        if torn:
+            # Terminate the torn line so the next record starts on its own.
+            os.write(self._fd, b"\n")
+        if os.fstat(self._fd).st_size == 0:
+            self._append(header)
+
+    def _load(self, header: dict[str, object]) -> bool:
+        """Read committed records; return whether the last line is torn."""
+        try:
+            with open(self.path, "rb") as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return False
+        except OSError as exc:
+            fail(f"failed to read restore journal {self.path}: {exc}", EXIT_OPEN_ERR)
+        records = []
+        for line in data.splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        if records and records[0] != header:
+            fail(
+                f"restore journal {self.path} is for {records[0]!r}, not {header!r}; "
+                "pass the matching --snapshot or drop --resume",
+                EXIT_USAGE,
+            )
+        for record in records[1:]:
+            self.done[record["path"]] = (record["size"], record["full_hash"])
+        return bool(data) and not data.endswith(b"\n")
+
+    def _append(self, record: dict[str, object]) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.write(self._fd, line.encode("utf-8"))
+
+    def is_done(self, entry: FileEntry, target: Path) -> bool:
+        """Whether ``entry`` was committed to ``target`` and is still there."""
+        if self.done.get(entry.path) != (entry.full_size, entry.full_hash):
+            return False
+        try:
+            st = os.stat(target, follow_symlinks=False)
+        except OSError:
+            return False
+        return stat.S_ISREG(st.st_mode) and st.st_size == entry.full_size
+
+    def record(self, entry: FileEntry) -> None:
+        self._append({"path": entry.path, "size": entry.full_size, "full_hash": entry.full_hash})
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+# ---------------------------------------------------------------------------
+# Existing-output check
+# ---------------------------------------------------------------------------
+
+
+def _existing_matches(entry: FileEntry, target: Path, file_hash_algo: str) -> bool:
+    """Whether ``target`` already holds ``entry``'s bytes, by size and FullHash.
+
+    A snapshot file without a FullHash, or with one that does not decode,
+    never matches, so the restore that follows reports it as it would
+    without the check.
+    """
+    try:
+        fd = os.open(str(target), os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return False
+    with os.fdopen(fd, "rb") as fh:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode) or st.st_size != entry.full_size:
+            return False
+        if not entry.full_hash:
+            return False
+        try:
+            expected = base64.b64decode(entry.full_hash + "=" * (-len(entry.full_hash) % 4))
+        except binascii.Error:
+            return False
+        return hashlib.file_digest(fh, lambda: hashlib.new(file_hash_algo)).digest() == expected
+
+
+def find_identical(
+    candidates: Iterable[tuple[FileEntry, Path]],
+    file_hash_algo: str | None,
+    workers: int,
+) -> set[str]:
+    """Snapshot paths whose existing target already matches; see ``--skip-identical``.
+
+    Sizes are compared on the calling thread; files whose size matches are
+    hashed on ``workers`` threads (hashlib releases the GIL on large
+    buffers), with submission windowed so a streamed ``candidates`` is never
+    held whole. Pass ``file_hash_algo=None`` to trust sizes alone.
+    """
+    identical: set[str] = set()
+    running: set[Future[str | None]] = set()
+
+    def check(entry: FileEntry, target: Path, algo: str) -> str | None:
+        return entry.path if _existing_matches(entry, target, algo) else None
+
+    def settle(done: Iterable[Future[str | None]]) -> None:
+        for future in done:
+            path = future.result()
+            if path is not None:
+                identical.add(path)
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, workers),
+        thread_name_prefix="duplicati-r2-identical",
+    ) as pool:
+        for entry, target in candidates:
+            try:
+                st = os.stat(target, follow_symlinks=False)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode) or st.st_size != entry.full_size:
+                continue
+            if file_hash_algo is None:
+                identical.add(entry.path)
+                continue
+            if len(running) >= 2 * max(1, workers):
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                settle(done)
+            running.add(pool.submit(check, entry, target, file_hash_algo))
+        settle(as_completed(running))
+    return identical
+
+
 # ---------------------------------------------------------------------------
 # Manifest cross-check
 # ---------------------------------------------------------------------------
@@ -1352,13 +3769,31 @@ def _bytes_value(value: str) -> int:
         raise argparse.ArgumentTypeError(f"invalid size {value!r}: {exc}")
 
 
+def _non_negative_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid count {value!r}: {exc}")
+    if n < 0:
+        raise argparse.ArgumentTypeError(f"count must be >= 0 (got {n})")
+    return n
+
+
+def _positive_int(value: str) -> int:
+    n = _non_negative_int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"count must be >= 1 (got {n})")
+    return n
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="duplicati-r2-extract",
         description=(
             "Extract a single file (or a glob) from a Duplicati R2 archive: "
             "fetches only the dblocks the file needs, decrypts in process "
-            "memory, never persists plaintext outside the chosen output."
+            "memory, never persists plaintext outside the chosen output "
+            "unless --decrypted-cache-size or --block-cache-size is set."
         ),
     )
     parser.add_argument("slug", help="Target slug (manifest .targets.<slug>).")
@@ -1385,9 +3820,80 @@ def build_parser() -> argparse.ArgumentParser:
             "mode and requires --output-dir."
         ),
     )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help=(
+            "Restore every file in the snapshot. Resolves blocks with a few "
+            "set-based queries instead of two per path; requires --output-dir."
+        ),
+    )
+    parser.add_argument(
+        "--prefix",
+        help=(
+            "Like --all, limited to paths under this directory (a missing "
+            "leading '/' is added). Requires --output-dir."
+        ),
+    )
     parser.add_argument(
         "--output-dir",
-        help="Destination directory for --include mode. Mirrors snapshot tree.",
+        help="Destination directory for --include/--all/--prefix mode. Mirrors snapshot tree.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=("dir", "tar", "tar.zst"),
+        default="dir",
+        help=(
+            "With --include/--all/--prefix: 'dir' (default) mirrors the tree "
+            "under --output-dir; 'tar' streams one pax archive to --output "
+            "('-' for stdout) with each file's snapshot mtime, and 'tar.zst' "
+            "compresses it with zstd. Archives skip the per-file fsync and "
+            "rename."
+        ),
+    )
+    parser.add_argument(
+        "--delta-against",
+        metavar="PATH",
+        help=(
+            "Single-file mode: reuse the blocks of a local copy (e.g. a "
+            "damaged database file). PATH is hashed in blocksize chunks; "
+            "matching blocks are copied from it and only volumes holding "
+            "differing blocks are fetched. PATH may be the --output file."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Continue an interrupted --include/--all/--prefix restore: files "
+            f"the output dir's {JOURNAL_NAME} records as committed, with the "
+            "same size and FullHash and still present, are skipped without "
+            "being planned or fetched."
+        ),
+    )
+    parser.add_argument(
+        "--skip-identical",
+        nargs="?",
+        const="hash",
+        choices=("hash", "size"),
+        help=(
+            "With --include/--all/--prefix, leave alone targets that already "
+            "hold the snapshot's file: same size as Blockset.Length and, "
+            "unless 'size' is given, the same FullHash, hashed locally on "
+            "max(--workers, --hash-workers) threads. Only the rest are "
+            "planned and fetched."
+        ),
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help=(
+            "Download the dblocks a restore of <path>, --include, --all or "
+            "--prefix would read into the encrypted cache, without writing "
+            "any output, and report bytes and ETA; the restore itself then "
+            "runs from local disk. Downloads --parallel-fetch volumes at once "
+            f"(default here: {PREFETCH_DEFAULT_PARALLEL})."
+        ),
     )
     parser.add_argument(
         "--source",
@@ -1421,6 +3927,90 @@ def build_parser() -> argparse.ArgumentParser:
         default=DEFAULT_CACHE_BYTES,
         help="Encrypted cache size cap in bytes (suffixes K/M/G accepted, 0 disables).",
     )
+    parser.add_argument(
+        "--decrypt-spool-size",
+        type=_bytes_value,
+        default=DEFAULT_DECRYPT_SPOOL_BYTES,
+        help=(
+            "Decrypted volumes larger than this spill from process memory into "
+            "an unlinked 0600 temp file under the 0700 cache root, or a 0700 "
+            "temp dir with --cache-size 0 (suffixes K/M/G accepted, default "
+            "8M, 0 spills every volume)."
+        ),
+    )
+    parser.add_argument(
+        "--decrypted-cache-size",
+        type=_bytes_value,
+        default=0,
+        help=(
+            "Keep up to this many bytes of decrypted volumes, with a block "
+            "offset index, under <cache root>/decrypted (0700/0600) so repeat "
+            "extracts skip fetch and decrypt. Stores plaintext on disk; "
+            "suffixes K/M/G accepted (default: 0, off)."
+        ),
+    )
+    parser.add_argument(
+        "--block-cache-size",
+        type=_bytes_value,
+        default=0,
+        help=(
+            "Keep up to this many bytes of verified plaintext blocks, keyed "
+            "by block hash, under <cache root>/blocks (0700/0600); re-hashed "
+            "on every read. Stores plaintext on disk; suffixes K/M/G accepted "
+            "(default: 0, off)."
+        ),
+    )
+    parser.add_argument(
+        "--parallel-fetch",
+        type=_non_negative_int,
+        default=0,
+        metavar="N",
+        help=(
+            "Download up to N upcoming dblocks in background threads while the "
+            "current one is decrypted and written (default: 0, sequential)."
+        ),
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help=(
+            "Write Chrome trace JSON (chrome://tracing, Perfetto) with one "
+            "event per volume fetch, decrypt and zip open and per file written."
+        ),
+    )
+    parser.add_argument(
+        "--s3-connections",
+        type=_positive_int,
+        default=None,
+        metavar="N",
+        help=(
+            "Size of the S3 connection pool shared by all fetching threads "
+            f"(default: the larger of {S3_DEFAULT_CONNECTIONS} and "
+            "--parallel-fetch plus --workers)."
+        ),
+    )
+    parser.add_argument(
+        "--hash-workers",
+        type=_non_negative_int,
+        default=0,
+        metavar="N",
+        help=(
+            "Verify block hashes in ~1 MiB batches on N threads while later "
+            "blocks are read; blocks still reach the output only after they "
+            "verify (default: 0, inline)."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=1,
+        metavar="N",
+        help=(
+            "With --include, --all or --prefix, write up to N output files "
+            "concurrently; decrypted dblocks are shared between workers "
+            "(default: 1)."
+        ),
+    )
     parser.add_argument(
         "--db",
         help="Override SQLite path (skips manifest resolution).",
@@ -1488,28 +4078,282 @@ def _load_manifest_for_layout(args: argparse.Namespace) -> dict | None:
     return load_manifest(config_path)
 
 
+def _write_target(
+    extractor: Extractor,
+    plan: FilePlan,
+    target: Path,
+    journal: RestoreJournal | None = None,
+) -> ExtractStats:
+    stats = ExtractStats()
+    with _atomic_writer(target) as out:
+        extractor.write_file(plan, out, stats)
+    extractor.record_written(target, out)
+    if journal is not None:
+        journal.record(plan.entry)
+    return stats
+
+
+def _write_planned(
+    extractor: Extractor,
+    planned: Iterable[tuple[FilePlan, Path]],
+    workers: int,
+    stats: ExtractStats,
+    journal: RestoreJournal | None = None,
+) -> None:
+    """Write ``planned`` in order, up to ``workers`` files at a time.
+
+    ``planned`` may be a lazy stream; it is only advanced on the calling
+    thread, so planning queries stay there (the SQLite connection is not
+    shared) and workers only fetch, decrypt, verify, and write. Submission
+    is windowed so the plan order still decides which volumes are open
+    together. The first failure cancels everything not yet started and is
+    re-raised once running writes settle; their partial files are unlinked
+    by ``_atomic_writer``.
+    """
+    if workers <= 1:
+        for plan, target in planned:
+            stats.merge(_write_target(extractor, plan, target, journal))
+        return
+    pending = iter(planned)
+    running: set[Future[ExtractStats]] = set()
+    with ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix="duplicati-r2-writer",
+    ) as pool:
+        try:
+            exhausted = False
+            while not exhausted or running:
+                while not exhausted and len(running) < workers * 2:
+                    item = next(pending, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    plan, target = item
+                    running.add(pool.submit(_write_target, extractor, plan, target, journal))
+                if not running:
+                    break
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stats.merge(future.result())
+        finally:
+            for future in running:
+                future.cancel()
+
+
+def _write_archive(
+    extractor: Extractor,
+    plans: Iterable[FilePlan],
+    args: argparse.Namespace,
+    stats: ExtractStats,
+) -> None:
+    """``--output-format tar[.zst]``: stream ``plans`` into one archive.
+
+    Files are written one after another, in plan order, to stdout or to
+    ``--output`` through ``_atomic_writer``, so the only fsync and rename
+    are the archive's own. With no plans nothing is written; the caller
+    reports the empty selection.
+    """
+    plans = iter(plans)
+    first = next(plans, None)
+    if first is None:
+        return
+    compress = args.output_format == "tar.zst"
+    sink = _stdout_writer() if args.output == "-" else _atomic_writer(Path(args.output))
+    with sink as writer:
+        archive = TarStream(writer, compress)
+        for plan in itertools.chain((first,), plans):
+            with archive.member(plan.entry) as member:
+                extractor.write_file(plan, member, stats)
+        archive.close()
+
+
+def _skip_filter(
+    args: argparse.Namespace,
+    extractor: Extractor,
+    journal: RestoreJournal,
+    entries: Iterable[FileEntry],
+    target_for: Callable[[FileEntry], Path],
+    stats: ExtractStats,
+) -> Callable[[FileEntry], bool] | None:
+    """Planning filter for ``--resume`` and ``--skip-identical``.
+
+    Files ``journal`` lists as done, and with ``--skip-identical`` files
+    whose target already matches, are dropped and counted in
+    ``files_skipped``. ``entries`` is only walked for ``--skip-identical``;
+    identical files verified by hash are journalled so a later ``--resume``
+    trusts them, while size-only matches are just skipped.
+    """
+    identical: set[str] = set()
+    if args.skip_identical:
+        identical = find_identical(
+            (
+                (entry, target)
+                for entry in entries
+                for target in (target_for(entry),)
+                if not journal.is_done(entry, target)
+            ),
+            extractor.file_hash_algo if args.skip_identical == "hash" else None,
+            max(args.workers, args.hash_workers),
+        )
+    if not journal.done and not identical:
+        return None
+
+    def keep(entry: FileEntry) -> bool:
+        if entry.path in identical:
+            if args.skip_identical == "hash":
+                journal.record(entry)
+        elif not journal.is_done(entry, target_for(entry)):
+            return True
+        stats.files_skipped += 1
+        return False
+
+    return keep
+
+
+def _prefetch(
+    args: argparse.Namespace,
+    conn: sqlite3.Connection,
+    extractor: Extractor,
+    cache: EncryptedCache,
+    source: Source,
+    snapshot_id: int,
+) -> dict[str, int]:
+    """``--prefetch``: cache every dblock the selected restore would read.
+
+    Planning is the restore's own, so a multi-blocklist file still has its
+    blocklist blocks decrypted in memory to learn its content blocks; file
+    content is never decrypted. Progress and ETA go to stderr unless
+    ``--json`` is set.
+    """
+    plans: Iterable[FilePlan]
+    if args.include:
+        include_pattern = _normalize_include_pattern(args.include)
+        src_paths = list(_glob_paths(conn, snapshot_id, include_pattern))
+        if not src_paths:
+            fail(f"no paths in snapshot {snapshot_id} match {args.include!r}", EXIT_OPEN_ERR)
+        plans = extractor.plan_files(snapshot_id, src_paths)
+    elif args.all or args.prefix is not None:
+        prefix = _normalize_restore_prefix(args.prefix) if args.prefix is not None else None
+        stream = extractor.plan_snapshot(snapshot_id, prefix)
+        first = next(stream, None)
+        if first is None:
+            scope = f"under {prefix!r}" if prefix else "to restore"
+            fail(f"no files in snapshot {snapshot_id} {scope}", EXIT_OPEN_ERR)
+        plans = itertools.chain([first], stream)
+    else:
+        plans = [extractor.plan_file(snapshot_id, args.path)]
+
+    names = extractor.volumes_for(plans)
+    sizes = extractor.resolver.volume_sizes(names)
+    needed_bytes = sum(size or 0 for size in sizes.values())
+    if needed_bytes > cache.cap_bytes:
+        fail(
+            f"restore reads {human_size(needed_bytes)} of dblocks, more than "
+            f"--cache-size {human_size(cache.cap_bytes)}; raise --cache-size",
+            EXIT_USAGE,
+        )
+    cached = {name for name in names if cache.contains(name)}
+    missing = [name for name in names if name not in cached]
+    total = sum(sizes.get(name) or 0 for name in missing)
+    if not args.json:
+        warn(
+            f"prefetching {len(missing)} of {len(names)} dblocks "
+            f"({human_size(total)}); {len(cached)} already cached"
+        )
+
+    started = time.monotonic()
+    last_report = started
+    done = 0
+    done_bytes = 0
+
+    def report(volume_name: str, size: int, _from_disk: bool) -> None:
+        nonlocal done, done_bytes, last_report
+        done += 1
+        done_bytes += sizes.get(volume_name) or size
+        now = time.monotonic()
+        if args.json or (now - last_report < PREFETCH_PROGRESS_SECONDS and done < len(missing)):
+            return
+        last_report = now
+        rate = done_bytes / max(now - started, 1e-6)
+        eta = max(0, total - done_bytes) / rate if rate else 0
+        warn(
+            f"prefetched {done}/{len(missing)} dblocks, {human_size(done_bytes)}/"
+            f"{human_size(total)}, {human_size(int(rate))}/s, ETA {eta:.0f}s"
+        )
+
+    # Touch the cached ones before any download can evict them.
+    warm_cache(cache, source, [name for name in names if name in cached], 1)
+    warm_cache(cache, source, missing, args.parallel_fetch or PREFETCH_DEFAULT_PARALLEL, report)
+    return {
+        "dblocks_needed": len(names),
+        "dblocks_cached": len(cached),
+        "bytes_needed": needed_bytes,
+    }
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
 
     # Mode validation.
-    if args.include is not None:
+    bulk_modes = [
+        flag
+        for flag, chosen in (
+            ("--include", args.include is not None),
+            ("--all", args.all),
+            ("--prefix", args.prefix is not None),
+        )
+        if chosen
+    ]
+    if len(bulk_modes) > 1:
+        fail(f"pass only one of {', '.join(bulk_modes)}", EXIT_USAGE)
+    if args.prefetch:
+        if bulk_modes and args.path is not None:
+            fail(f"pass either <path> or {bulk_modes[0]}, not both", EXIT_USAGE)
+        if not bulk_modes and not args.path:
+            fail("--prefetch needs <path>, --include, --all or --prefix", EXIT_USAGE)
+        if args.output or args.output_dir:
+            fail("--prefetch writes no output; drop --output/--output-dir", EXIT_USAGE)
+        if args.cache_size <= 0:
+            fail("--prefetch fills the encrypted cache; it cannot run with --cache-size 0", EXIT_USAGE)
+    elif bulk_modes:
+        mode = bulk_modes[0]
         if args.path is not None:
-            fail("pass either <path> or --include, not both", EXIT_USAGE)
-        if not args.output_dir:
-            fail("--include requires --output-dir", EXIT_USAGE)
-        if args.output:
-            fail(
-                "--output is not valid with --include; use --output-dir instead",
-                EXIT_USAGE,
-            )
+            fail(f"pass either <path> or {mode}, not both", EXIT_USAGE)
+        if args.output_format == "dir":
+            if not args.output_dir:
+                fail(f"{mode} requires --output-dir", EXIT_USAGE)
+            if args.output:
+                fail(
+                    f"--output is not valid with {mode}; use --output-dir instead",
+                    EXIT_USAGE,
+                )
+        else:
+            if not args.output:
+                fail(
+                    f"--output-format {args.output_format} needs --output (use '-' for stdout)",
+                    EXIT_USAGE,
+                )
+            if args.output_dir:
+                fail(f"--output-dir is not valid with --output-format {args.output_format}", EXIT_USAGE)
+            if args.workers > 1:
+                fail("--workers is only valid with --output-format dir", EXIT_USAGE)
     else:
         if not args.path:
-            fail("missing positional <path> (or use --include)", EXIT_USAGE)
+            fail("missing positional <path> (or use --include/--all/--prefix)", EXIT_USAGE)
         if not args.output:
             fail("missing --output (use '-' for stdout)", EXIT_USAGE)
         if args.output_dir:
-            fail("--output-dir is only valid with --include", EXIT_USAGE)
+            fail("--output-dir is only valid with --include/--all/--prefix", EXIT_USAGE)
+        if args.workers > 1:
+            fail("--workers is only valid with --include/--all/--prefix", EXIT_USAGE)
+    if args.output_format != "dir" and (args.prefetch or not bulk_modes):
+        fail("--output-format is only valid with --include/--all/--prefix", EXIT_USAGE)
+    if args.delta_against and (args.prefetch or bulk_modes or args.output == "-"):
+        fail("--delta-against is only valid with <path> and a file --output", EXIT_USAGE)
+    for flag, chosen in (("--resume", args.resume), ("--skip-identical", args.skip_identical)):
+        if chosen and not args.output_dir:
+            fail(f"{flag} is only valid with --include/--all/--prefix and --output-dir", EXIT_USAGE)
 
     # Database open (Cut A semantics).
     conn = open_db(resolve_db_path(args))
@@ -1525,6 +4369,11 @@ def main(argv: list[str] | None = None) -> int:
         blocksize = int(blocksize_str) if blocksize_str else None
     except ValueError:
         blocksize = None
+    if args.hash_workers and blocksize is not None and blocksize < HASHLIB_GIL_MINSIZE:
+        warn(
+            f"--hash-workers ignored: {blocksize}-byte blocks are hashed without "
+            "releasing the GIL, so they are verified inline"
+        )
 
     # Credentials and source.
     env: dict[str, str] = {}
@@ -1533,15 +4382,43 @@ def main(argv: list[str] | None = None) -> int:
     passphrase = _resolve_passphrase(args, env)
     manifest = _load_manifest_for_layout(args)
     layout = resolve_bucket_layout(args, env, manifest)
-    source = build_source(args.source, env, layout)
+    # Every thread that can fetch at once gets a pooled connection: the
+    # prefetchers plus each writer opening a volume that was not read ahead.
+    s3_connections = args.s3_connections or max(
+        S3_DEFAULT_CONNECTIONS, args.parallel_fetch + args.workers
+    )
+    source = build_source(args.source, env, layout, s3_connections)
 
     # Cache + decrypter. Cache is namespaced by short hostname (matches the
     # bucket prefix's hostname element) and the sanitized slug so concurrent
     # extracts against different targets don't collide.
     slug_dir = sanitize_slug(args.slug)
     cache_root = Path(args.cache_dir) / layout.hostname / slug_dir
-    cache = EncryptedCache(str(cache_root), args.cache_size)
-    decrypter = AesDecrypter(passphrase)
+    stages = StageTimes(trace=args.trace is not None, enabled=args.json)
+    cache = EncryptedCache(str(cache_root), args.cache_size, stages)
+    # With the encrypted cache off nothing else belongs under the cache root,
+    # so large volumes spill into a private directory under the system
+    # temp dir instead, removed again on exit.
+    spool_root: tempfile.TemporaryDirectory[str] | None = None
+    if args.cache_size > 0:
+        spool_dir = str(cache_root)
+    else:
+        spool_root = tempfile.TemporaryDirectory(prefix="duplicati-r2-spool-")
+        spool_dir = spool_root.name
+    decrypter = AesDecrypter(passphrase, spool_dir, args.decrypt_spool_size)
+    decrypted_cache = None
+    if args.decrypted_cache_size > 0:
+        decrypted_cache = DecryptedVolumeCache(
+            str(cache_root / "decrypted"),
+            args.decrypted_cache_size,
+        )
+    block_cache = None
+    if args.block_cache_size > 0:
+        block_cache = BlockCache(
+            str(cache_root / "blocks"),
+            args.block_cache_size,
+            block_hash_algo.upper(),
+        )
 
     extractor = Extractor(
         conn=conn,
@@ -1551,23 +4428,27 @@ def main(argv: list[str] | None = None) -> int:
         blocksize=blocksize,
         block_hash_algo=block_hash_algo,
         file_hash_algo=file_hash_algo,
+        parallel_fetch=args.parallel_fetch,
+        decrypted_cache=decrypted_cache,
+        block_cache=block_cache,
+        hash_workers=args.hash_workers,
+        stages=stages,
     )
 
     started = time.monotonic()
     stats = ExtractStats()
 
+    prefetched: dict[str, int] = {}
+    journal: RestoreJournal | None = None
     try:
-        if args.include:
-            output_dir = Path(args.output_dir)
-            _ensure_private_dir(output_dir)
+        if args.prefetch:
+            prefetched = _prefetch(args, conn, extractor, cache, source, snapshot["ID"])
+        elif args.include:
             include_pattern = _normalize_include_pattern(args.include)
-            matched = False
-            for src_path in _glob_paths(conn, snapshot["ID"], include_pattern):
-                matched = True
-                target = _validate_output_dir_target(output_dir, src_path)
-                with _atomic_writer(target) as writer:
-                    extractor.extract_file(snapshot["ID"], src_path, writer, stats)
-            if not matched:
+            # Plan every match up front so writes can be ordered by dblock
+            # locality; targets are validated before anything is written.
+            src_paths = list(_glob_paths(conn, snapshot["ID"], include_pattern))
+            if not src_paths:
                 suffix = ""
                 if include_pattern != args.include:
                     suffix = f" (normalized to {include_pattern!r})"
@@ -1575,6 +4456,70 @@ def main(argv: list[str] | None = None) -> int:
                     f"no paths in snapshot {snapshot['ID']} match {args.include!r}{suffix}",
                     EXIT_OPEN_ERR,
                 )
+            entries = extractor.lookup_files(snapshot["ID"], src_paths)
+            keep = None
+            if args.output_format == "dir":
+                output_dir = Path(args.output_dir)
+                _ensure_private_dir(output_dir)
+                targets = {p: _validate_output_dir_target(output_dir, p) for p in src_paths}
+                journal = RestoreJournal(output_dir, args.slug, snapshot["ID"], args.resume)
+                keep = _skip_filter(
+                    args, extractor, journal, entries, lambda entry: targets[entry.path], stats
+                )
+            else:
+                for path in src_paths:
+                    _archive_member_name(path)
+            plans = extractor.plan_entries(entries, keep)
+            extractor.clone_candidates = shared_block_hashes(plans)
+            order = schedule_plans(plans)
+            stats.refetches_saved = max(
+                0,
+                count_volume_opens(plans) - count_volume_opens(plans[i] for i in order),
+            )
+            if args.output_format == "dir":
+                _write_planned(
+                    extractor,
+                    [(plans[i], targets[plans[i].entry.path]) for i in order],
+                    args.workers,
+                    stats,
+                    journal,
+                )
+            else:
+                _write_archive(extractor, (plans[i] for i in order), args, stats)
+        elif (args.all or args.prefix is not None) and args.output_format != "dir":
+            prefix = _normalize_restore_prefix(args.prefix) if args.prefix is not None else None
+            _write_archive(extractor, extractor.plan_snapshot(snapshot["ID"], prefix), args, stats)
+            if stats.files == 0:
+                scope = f"under {prefix!r}" if prefix else "to restore"
+                fail(f"no files in snapshot {snapshot['ID']} {scope}", EXIT_OPEN_ERR)
+        elif args.all or args.prefix is not None:
+            output_dir = Path(args.output_dir)
+            _ensure_private_dir(output_dir)
+            prefix = _normalize_restore_prefix(args.prefix) if args.prefix is not None else None
+            journal = RestoreJournal(output_dir, args.slug, snapshot["ID"], args.resume)
+            keep = _skip_filter(
+                args,
+                extractor,
+                journal,
+                extractor.snapshot_files(snapshot["ID"], prefix),
+                lambda entry: _validate_output_dir_target(output_dir, entry.path),
+                stats,
+            )
+            # Streamed in BlocksetID order, which follows backup order and so
+            # dblock locality closely enough; nothing is held for all files.
+            _write_planned(
+                extractor,
+                (
+                    (plan, _validate_output_dir_target(output_dir, plan.entry.path))
+                    for plan in extractor.plan_snapshot(snapshot["ID"], prefix, keep)
+                ),
+                args.workers,
+                stats,
+                journal,
+            )
+            if stats.files + stats.files_skipped == 0:
+                scope = f"under {prefix!r}" if prefix else "to restore"
+                fail(f"no files in snapshot {snapshot['ID']} {scope}", EXIT_OPEN_ERR)
         else:
             assert args.path is not None  # validated by mode-validation block above
             assert args.output is not None
@@ -1582,25 +4527,65 @@ def main(argv: list[str] | None = None) -> int:
                 with _stdout_writer() as writer:
                     extractor.extract_file(snapshot["ID"], args.path, writer, stats)
             else:
+                delta_against = Path(args.delta_against) if args.delta_against else None
                 with _atomic_writer(Path(args.output)) as writer:
-                    extractor.extract_file(snapshot["ID"], args.path, writer, stats)
+                    extractor.extract_file(
+                        snapshot["ID"], args.path, writer, stats, delta_against
+                    )
     finally:
         extractor.close()
+        if spool_root is not None:
+            spool_root.cleanup()
+        if journal is not None:
+            journal.close()
+        # Written on failure too: a trace of a run that died is the useful one.
+        if args.trace is not None:
+            stages.write_trace(args.trace)
 
     elapsed = time.monotonic() - started
-    if args.json:
+    if args.json and args.prefetch:
+        summary = {
+            "slug": args.slug,
+            "snapshot_id": snapshot["ID"],
+            "snapshot_timestamp": iso_utc(snapshot["Timestamp"]),
+            **prefetched,
+            "bytes_fetched": cache.bytes_fetched,
+            "dblocks_fetched": cache.fetches,
+            "dblock_fetch_waits": cache.fetch_waits,
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": stages.summary(),
+        }
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+    elif args.json:
         summary = {
             "slug": args.slug,
             "snapshot_id": snapshot["ID"],
             "snapshot_timestamp": iso_utc(snapshot["Timestamp"]),
             "plaintext_bytes": stats.plaintext_size,
             "bytes_fetched": cache.bytes_fetched,
+            # Encrypted bytes downloaded per plaintext byte written. Whole
+            # dblocks are the smallest fetchable unit (see docs), so a small
+            # file from a large dblock shows a large ratio.
+            "fetch_amplification": (
+                round(cache.bytes_fetched / stats.plaintext_size, 3)
+                if stats.plaintext_size
+                else None
+            ),
             "dblocks_fetched": cache.fetches,
+            "dblock_fetch_waits": cache.fetch_waits,
             "dblocks_touched": len(stats.dblocks_touched),
+            "refetches_saved": stats.refetches_saved,
+            "files": stats.files,
+            "files_skipped": stats.files_skipped,
+            "bytes_cloned": stats.bytes_cloned,
+            "bytes_sparse": stats.bytes_sparse,
+            "bytes_delta": stats.bytes_delta,
+            "block_cache_hits": block_cache.hits if block_cache is not None else 0,
             "blocksize": blocksize,
             "block_hash": block_hash_algo,
             "file_hash": file_hash_algo,
             "elapsed_seconds": round(elapsed, 3),
+            "stages": stages.summary(),
         }
         print(json.dumps(summary, indent=2), file=sys.stderr)
     return 0
@@ -1685,5 +4670,15 @@ def _normalize_include_pattern(pattern: str) -> str:
     return pattern
 
 
+def _normalize_restore_prefix(prefix: str) -> str:
+    """Anchor ``prefix`` at '/' and end it at a directory boundary.
+
+    ``/home/user`` must not pick up ``/home/username``; a bare ``/`` (or an
+    empty prefix) selects the whole snapshot.
+    """
+    stripped = prefix.strip("/")
+    return f"/{stripped}/" if stripped else "/"
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Restore throughput benchmark for duplicati-r2-extract.
+
+Builds a fixture with ``make_fixture.py`` (every argument this script does
+not recognise is passed through, so ``--files 500 --file-size 1M
+--dedupe-ratio 0.3`` shapes the archive), then times three restores
+against a ``file://`` source, each from a cold cache:
+
+- ``single``: the largest file, positional path to ``--output``
+- ``include``: ``--include '*'`` into an output directory
+- ``all``: ``--all`` into an output directory
+
+Each run records wall seconds, MB/s of plaintext, the child's peak RSS and
+the extractor's ``stages`` timers, and the report is printed as JSON on
+stdout. Restored bytes are compared with the fixture plaintext so a fast
+but wrong run never reports a number.
+
+``--baseline`` takes an earlier report for the same fixture arguments. Each
+scenario's best run is compared with the baseline's best, and the script
+exits 1 after printing the report if MB/s fell, or peak RSS or bytes
+fetched grew, by more than ``--max-regression``. Only the fixture arguments
+must match, so a baseline taken without an ``--extract-arg`` checks that
+flag's cost: ``--block-size 64K --extract-arg=--hash-workers=4 --baseline
+inline.json`` compares pooled hash verification with inline verification.
+"""
+
+from __future__ import annotations
+
+import argparse
+import filecmp
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent
+PASSPHRASE_ENV = "BENCH_PW"
+SLUG = "test"
+DEFAULT_MAX_REGRESSION = 0.10
+
+
+def parse_summary(output: str) -> dict[str, object]:
+    """Return the ``--json`` summary from the extractor's stderr.
+
+    The summary is the last thing written and starts with a ``{`` line of
+    its own; warnings before it are prefixed lines, so braces inside them
+    are never mistaken for its start.
+    """
+    lines = output.splitlines(keepends=True)
+    starts = [n for n, line in enumerate(lines) if line.rstrip("\n") == "{"]
+    if not starts:
+        raise ValueError("no --json summary on stderr")
+    return json.loads("".join(lines[starts[-1] :]))
+
+
+def best_runs(runs: list[dict[str, object]]) -> dict[str, dict[str, float]]:
+    """Per scenario, the best MB/s, peak RSS and bytes fetched over its runs."""
+    best: dict[str, dict[str, float]] = {}
+    for run in runs:
+        entry = best.setdefault(
+            str(run["scenario"]),
+            {"mb_per_s": 0.0, "peak_rss_kib": float("inf"), "bytes_fetched": float("inf")},
+        )
+        entry["mb_per_s"] = max(entry["mb_per_s"], float(run["mb_per_s"] or 0))
+        entry["peak_rss_kib"] = min(entry["peak_rss_kib"], float(run["peak_rss_kib"]))
+        entry["bytes_fetched"] = min(entry["bytes_fetched"], float(run["bytes_fetched"]))
+    return best
+
+
+def regressions(
+    report: dict[str, object], baseline: dict[str, object], max_regression: float
+) -> list[str]:
+    """Describe every metric that got worse than ``baseline`` by more than the limit."""
+    found: list[str] = []
+    current = best_runs(report["runs"])
+    for scenario, before in best_runs(baseline["runs"]).items():
+        after = current.get(scenario)
+        if after is None:
+            continue
+        if after["mb_per_s"] < before["mb_per_s"] * (1 - max_regression):
+            found.append(
+                f"{scenario}: {after['mb_per_s']:.2f} MB/s, baseline {before['mb_per_s']:.2f}"
+            )
+        for metric in ("peak_rss_kib", "bytes_fetched"):
+            if after[metric] > before[metric] * (1 + max_regression):
+                found.append(
+                    f"{scenario}: {metric} {after[metric]:.0f}, baseline {before[metric]:.0f}"
+                )
+    return found
+
+
+def run_extract(command: list[str], env: dict[str, str]) -> dict[str, object]:
+    """Run one restore; return its JSON summary plus wall time and peak RSS."""
+    with tempfile.TemporaryFile() as stderr:
+        started = time.perf_counter()
+        proc = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+        # wait4 reports this child's own rusage; RUSAGE_CHILDREN would give
+        # the maximum over every run so far.
+        _pid, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - started
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        stderr.seek(0)
+        output = stderr.read().decode("utf-8", "replace")
+    if proc.returncode != 0:
+        sys.exit(f"bench: {' '.join(command)} exited {proc.returncode}:\n{output}")
+    try:
+        summary = parse_summary(output)
+    except ValueError as exc:
+        sys.exit(f"bench: {' '.join(command)}: {exc}:\n{output}")
+    plaintext = int(summary["plaintext_bytes"])
+    return {
+        "seconds": round(seconds, 3),
+        "plaintext_bytes": plaintext,
+        "mb_per_s": round(plaintext / seconds / 1e6, 2) if seconds else None,
+        "peak_rss_kib": usage.ru_maxrss,
+        "bytes_fetched": summary["bytes_fetched"],
+        "stages": summary["stages"],
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark duplicati-r2-extract restores.",
+        epilog="Unrecognised arguments are passed to make_fixture.py.",
+    )
+    parser.add_argument("--work", required=True, type=Path, help="Scratch directory")
+    parser.add_argument(
+        "--extract",
+        default=None,
+        help="duplicati-r2-extract executable (default: the script next to this one)",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=("single", "include", "all"),
+        help="Scenario to run; repeatable (default: all three)",
+    )
+    parser.add_argument(
+        "--extract-arg",
+        action="append",
+        default=[],
+        metavar="ARG",
+        help="Extra argument for every restore, e.g. --extract-arg=--workers=4",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Earlier report to compare against; regressions exit 1",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=DEFAULT_MAX_REGRESSION,
+        metavar="FRACTION",
+        help=f"Allowed slowdown or growth against --baseline (default: {DEFAULT_MAX_REGRESSION})",
+    )
+    args, fixture_args = parser.parse_known_args(argv)
+
+    baseline = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["fixture"]["args"] != fixture_args:
+            sys.exit(
+                f"bench: {args.baseline} was built with fixture arguments "
+                f"{baseline['fixture']['args']}, not {fixture_args}"
+            )
+
+    work: Path = args.work
+    fixture = work / "fixture"
+    db = work / "fixture.sqlite"
+    if fixture.exists():
+        shutil.rmtree(fixture)
+    fixture.mkdir(parents=True)
+    env = dict(os.environ, **{PASSPHRASE_ENV: "bench"})
+    made = subprocess.run(
+        [
+            sys.executable,
+            str(SCRIPTS / "make_fixture.py"),
+            "--out",
+            str(fixture),
+            "--db",
+            str(db),
+            "--passphrase",
+            env[PASSPHRASE_ENV],
+            *fixture_args,
+        ],
+        check=True,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    shape = json.loads(made.stderr)
+    largest = max(shape["files"], key=lambda f: f["size"])["path"]
+
+    extract = (
+        [args.extract]
+        if args.extract
+        else [sys.executable, str(SCRIPTS.parent / "duplicati_r2_extract.py")]
+    )
+    base = [
+        *extract,
+        "--db",
+        str(db),
+        "--source",
+        f"file://{fixture}",
+        "--passphrase-env",
+        PASSPHRASE_ENV,
+        "--json",
+        *args.extract_arg,
+    ]
+    runs: list[dict[str, object]] = []
+    for scenario in args.scenario or ["single", "include", "all"]:
+        for attempt in range(args.repeat):
+            scratch = work / f"{scenario}-{attempt}"
+            if scratch.exists():
+                shutil.rmtree(scratch)
+            cache = ["--cache-dir", str(scratch / "cache")]
+            if scenario == "single":
+                target = scratch / "out.bin"
+                command = [*base, *cache, "--output", str(target), SLUG, largest]
+            else:
+                mode = ["--include", "*"] if scenario == "include" else ["--all"]
+                command = [*base, *cache, *mode, "--output-dir", str(scratch / "out"), SLUG]
+            result = run_extract(command, env)
+            if scenario == "single":
+                same = filecmp.cmp(target, fixture / "plaintext" / largest.lstrip("/"), shallow=False)
+            else:
+                same = all(
+                    filecmp.cmp(
+                        scratch / "out" / f["path"].lstrip("/"),
+                        fixture / "plaintext" / f["path"].lstrip("/"),
+                        shallow=False,
+                    )
+                    for f in shape["files"]
+                )
+            if not same:
+                sys.exit(f"bench: {scenario} restore does not match the fixture plaintext")
+            runs.append({"scenario": scenario, "run": attempt, **result})
+            shutil.rmtree(scratch)
+
+    report = {
+        "fixture": {
+            "args": fixture_args,
+            "files": len(shape["files"]),
+            "plaintext_bytes": sum(f["size"] for f in shape["files"]),
+            "unique_blocks": shape["unique_blocks"],
+            "dblock_volumes": shape["dblock_volumes"],
+        },
+        "extract_args": args.extract_arg,
+        "runs": runs,
+    }
+    print(json.dumps(report, indent=2))
+    if baseline is not None:
+        found = regressions(report, baseline, args.max_regression)
+        if found:
+            print(f"bench: regressed against {args.baseline}:", file=sys.stderr)
+            for line in found:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
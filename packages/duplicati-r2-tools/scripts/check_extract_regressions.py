@@ -8,6 +8,7 @@ import base64
 import collections
 import contextlib
 import errno
+import fcntl
 import hashlib
 import io
 import json
@@ -15,15 +16,23 @@ import os
 import sqlite3
 import stat
 import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import time
 import zipfile
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO
 
 import duplicati_r2_extract as extract_mod
 from duplicati_r2_extract import (
     EXIT_DATA_ERR,
     EXIT_OPEN_ERR,
     EXIT_USAGE,
+    JOURNAL_NAME,
     BucketLayout,
     BlockRef,
     BlockResolver,
@@ -31,8 +40,11 @@ from duplicati_r2_extract import (
     ExtractStats,
     Extractor,
     FileEntry,
+    FilePlan,
     FileSource,
     OpenedVolume,
+    RestoreJournal,
+    VolumePrefetcher,
     _atomic_writer,
     _ensure_private_dir,
     _glob_paths,
@@ -62,6 +74,66 @@ def expect_exit_stderr_contains(
     assert needle in stderr.getvalue()
 
 
+def _bare_extractor(source: object, cache: object) -> Extractor:
+    """Extractor with its shared-state plumbing but no DB, for unit checks."""
+    extractor = object.__new__(Extractor)
+    extractor.source = source
+    extractor.cache = cache
+    extractor._open_volumes = collections.OrderedDict()
+    extractor._lock = threading.Lock()
+    extractor._opening = {}
+    extractor._pins = collections.Counter()
+    extractor._retired = set()
+    extractor.prefetcher = VolumePrefetcher(source, cache, 0)
+    extractor.decrypted_cache = None
+    extractor.block_cache = None
+    extractor._hash_pool = None
+    extractor._hash_window = 0
+    extractor.clone_candidates = set()
+    extractor._written = {}
+    extractor._zero_block = b""
+    extractor._zero_hash = None
+    extractor.stages = extract_mod.StageTimes()
+    return extractor
+
+
+def _file_plan(file_id: int, path: str, blocks: list[bytes]) -> FilePlan:
+    """Plan for a file made of ``blocks``, in order, all from ``vol1.aes``."""
+    payload = b"".join(blocks)
+    return FilePlan(
+        FileEntry(
+            file_id=file_id,
+            path=path,
+            blockset_id=file_id,
+            full_size=len(payload),
+            full_hash=base64.b64encode(hashlib.sha256(payload).digest()).decode("ascii"),
+        ),
+        [BlockRef("vol1.aes", hashlib.sha256(block).digest(), len(block)) for block in blocks],
+    )
+
+
+def _serving_extractor(
+    blocks: list[bytes], blocksize: int | None = None
+) -> tuple[Extractor, list[bytes]]:
+    """SHA256 ``_bare_extractor`` whose volumes hold ``blocks``.
+
+    Also returns the list each block read from a volume is appended to.
+    """
+    by_hash = {hashlib.sha256(block).digest(): block for block in blocks}
+    extractor = _bare_extractor(object(), object())
+    extractor.blocksize = blocksize
+    extractor.block_hash_algo = "SHA256"
+    extractor.file_hash_algo = "SHA256"
+    reads: list[bytes] = []
+
+    def read_block(_volume: str, block_hash: bytes, _tally: object = None) -> tuple[bytes, bool]:
+        reads.append(by_hash[block_hash])
+        return by_hash[block_hash], False
+
+    extractor._read_block = read_block
+    return extractor, reads
+
+
 def check_cache_recovery(work: Path) -> None:
     cache_root = work / "unit-cache"
     seen_fetches: list[str] = []
@@ -97,6 +169,8 @@ def check_cache_cap_on_startup(work: Path) -> None:
 def check_cache_partial_removal_failure_message(work: Path) -> None:
     cache_root = work / "partial-remove-fail-cache"
     cache_root.mkdir()
+    # A partial is only stale once its volume is cached in full.
+    (cache_root / "vol1.aes").write_bytes(b"complete")
     partial = cache_root / "vol1.aes.partial"
     partial.write_bytes(b"stale")
     real_unlink = Path.unlink
@@ -119,6 +193,373 @@ def check_cache_partial_removal_failure_message(work: Path) -> None:
         Path.unlink = real_unlink
 
 
+def check_cache_resumes_partial(work: Path) -> None:
+    cache_root = work / "resume-cache"
+    cache_root.mkdir()
+    (cache_root / "vol1.aes.partial").write_bytes(b"encrypted-")
+    (cache_root / "huge.aes.partial").write_bytes(b"x" * 2048)
+    cache = EncryptedCache(str(cache_root), 1024)
+    assert (cache_root / "vol1.aes.partial").exists()
+    assert not (cache_root / "huge.aes.partial").exists()
+    offsets: list[int] = []
+
+    class TailSource(extract_mod.Source):
+        def fetch(self, name: str) -> bytes:
+            return b"encrypted-" + name.encode("ascii")
+
+        def fetch_into(self, name: str, sink: BinaryIO, offset: int = 0) -> None:
+            offsets.append(offset)
+            super().fetch_into(name, sink, offset)
+
+    stream, from_disk = cache.open_from_source("vol1.aes", TailSource())
+    with stream:
+        assert stream.read() == b"encrypted-vol1.aes"
+    assert from_disk
+    assert offsets == [10]
+    assert cache.bytes_fetched == len(b"vol1.aes")
+    assert not (cache_root / "vol1.aes.partial").exists()
+    assert cache.contains("vol1.aes")
+
+
+def check_cache_bounds_orphan_partials(work: Path) -> None:
+    """Startup bounds leftover partials through the index, without a scan."""
+    cache_root = work / "orphan-partial-cache"
+    cache = EncryptedCache(str(cache_root), 100)
+    cache.get("full.aes", lambda _name: b"f" * 40)
+    held = cache._claim_partial(cache_root / "held.aes.partial", wait=False)
+    assert held is not None
+    held.write(b"h" * 30)
+    held.flush()
+    for name, size in (("old.aes", 30), ("mid.aes", 20), ("new.aes", 20), ("full.aes", 5)):
+        fh = cache._claim_partial(cache_root / f"{name}.partial", wait=False)
+        assert fh is not None
+        with fh:
+            fh.write(name[0].encode("ascii") * size)
+
+    real_scan = EncryptedCache._scan_existing
+
+    def no_scan(self: EncryptedCache) -> None:
+        raise AssertionError("startup scanned a cache with a usable index")
+
+    EncryptedCache._scan_existing = no_scan
+    try:
+        with held:
+            EncryptedCache(str(cache_root), 100)
+    finally:
+        EncryptedCache._scan_existing = real_scan
+    # Newest first within the 60 bytes left: new and mid stay resumable, old
+    # does not fit, full's volume is already cached. held is still being
+    # written by another fetch, so it stays even past the cap.
+    remaining = sorted(p.name for p in cache_root.glob("*.partial"))
+    assert remaining == ["held.aes.partial", "mid.aes.partial", "new.aes.partial"], remaining
+
+
+def check_cache_index_skips_startup_scan(work: Path) -> None:
+    cache_root = work / "indexed-cache"
+    cache = EncryptedCache(str(cache_root), 100)
+    cache.get("old.aes", lambda _name: b"o" * 40)
+    cache.get("new.aes", lambda _name: b"n" * 40)
+    cache.get("old.aes", lambda _name: b"refetched")
+    assert stat.S_IMODE((cache_root / extract_mod.CACHE_INDEX_NAME).stat().st_mode) == 0o600
+
+    real_scan = EncryptedCache._scan_existing
+
+    def no_scan(self: EncryptedCache) -> None:
+        raise AssertionError("startup scanned a cache with a usable index")
+
+    EncryptedCache._scan_existing = no_scan
+    try:
+        reopened = EncryptedCache(str(cache_root), 100)
+        assert reopened._used_bytes == 80
+        # A file the index lost track of is adopted on lookup; LRU order
+        # survived the restart, so "new" is the entry evicted to fit it.
+        (cache_root / "stray.aes").write_bytes(b"s" * 30)
+        assert reopened.get_with_status("stray.aes", lambda _name: b"fetched") == (b"s" * 30, True)
+        assert (cache_root / "old.aes").exists()
+        assert not (cache_root / "new.aes").exists()
+        # An entry deleted behind the index's back is refetched.
+        (cache_root / "old.aes").unlink()
+        assert reopened.get_with_status("old.aes", lambda _name: b"o" * 40) == (b"o" * 40, False)
+        # A smaller cap evicts at startup without a scan.
+        EncryptedCache(str(cache_root), 50)
+        assert not (cache_root / "stray.aes").exists()
+        assert (cache_root / "old.aes").exists()
+    finally:
+        EncryptedCache._scan_existing = real_scan
+
+    index = cache_root / extract_mod.CACHE_INDEX_NAME
+    for suffix in ("-wal", "-shm"):
+        Path(f"{index}{suffix}").unlink(missing_ok=True)
+    index.write_bytes(b"not a sqlite database" * 10)
+    rebuilt = EncryptedCache(str(cache_root), 50)
+    assert rebuilt.contains("old.aes")
+    assert rebuilt._used_bytes == 40
+
+
+def check_cache_shared_between_processes(work: Path) -> None:
+    # Two instances on one root stand in for two processes: each has its own
+    # thread lock, lock-file descriptor and in-memory LRU.
+    cache_root = work / "shared-cache"
+    first = EncryptedCache(str(cache_root), 1024)
+    second = EncryptedCache(str(cache_root), 1024)
+    started = threading.Event()
+    release = threading.Event()
+    fetched: list[str] = []
+
+    class GatedSource(extract_mod.Source):
+        def fetch(self, name: str) -> bytes:
+            return b"encrypted-" + name.encode("ascii")
+
+        def fetch_into(self, name: str, sink: BinaryIO, offset: int = 0) -> None:
+            fetched.append(name)
+            started.set()
+            assert release.wait(5)
+            super().fetch_into(name, sink, offset)
+
+    results: dict[str, tuple[bytes, bool]] = {}
+
+    def restore(label: str, cache: EncryptedCache) -> None:
+        stream, from_disk = cache.open_from_source("vol1.aes", GatedSource())
+        with stream:
+            results[label] = (stream.read(), from_disk)
+
+    leader = threading.Thread(target=restore, args=("first", first))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=restore, args=("second", second))
+    follower.start()
+    time.sleep(0.2)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert fetched == ["vol1.aes"]
+    assert results["first"] == (b"encrypted-vol1.aes", False)
+    assert results["second"] == (b"encrypted-vol1.aes", True)
+    assert second.fetch_waits == 1 and second.bytes_fetched == 0
+
+    # The leader can rename its partial into place between the follower's
+    # lookup and its claim; the follower then gets an uncontended flock on a
+    # fresh partial and must still read the cached copy, not download again.
+    real_open_cached = second._open_cached
+    lookups: list[str] = []
+
+    def late_lookup(volume_name: str) -> BinaryIO | None:
+        lookups.append(volume_name)
+        return None if len(lookups) == 1 else real_open_cached(volume_name)
+
+    second._open_cached = late_lookup
+    fetched.clear()
+    stream, from_disk = second.open_from_source("vol1.aes", GatedSource())
+    with stream:
+        assert (stream.read(), from_disk) == (b"encrypted-vol1.aes", True)
+    assert fetched == [] and second.bytes_fetched == 0
+    assert not (cache_root / "vol1.aes.partial").exists()
+
+    # LRU order is shared: a hit in one instance protects the entry from
+    # eviction by the other.
+    lru_root = work / "shared-lru-cache"
+    first = EncryptedCache(str(lru_root), 30)
+    second = EncryptedCache(str(lru_root), 30)
+    first.get("x.aes", lambda _name: b"x" * 10)
+    first.get("y.aes", lambda _name: b"y" * 10)
+    assert second.get_with_status("x.aes", lambda _name: b"refetched") == (b"x" * 10, True)
+    first.get("z.aes", lambda _name: b"z" * 15)
+    assert (lru_root / "x.aes").exists()
+    assert not (lru_root / "y.aes").exists()
+    assert not second.contains("y.aes") and second.contains("z.aes")
+    assert second._used_bytes == 25
+
+
+def check_warm_cache_downloads_without_decrypting(work: Path) -> None:
+    cache = EncryptedCache(str(work / "warm-cache"), 1024)
+    cache.get("cached.aes", lambda _name: b"already")
+    landed: list[tuple[str, int, bool]] = []
+
+    class MirrorSource(extract_mod.Source):
+        def fetch(self, name: str) -> bytes:
+            if name == "missing.aes":
+                raise FileNotFoundError(name)
+            return b"encrypted-" + name.encode("ascii")
+
+    extract_mod.warm_cache(
+        cache,
+        MirrorSource(),
+        ["cached.aes", "a.aes", "b.aes"],
+        2,
+        lambda name, size, from_disk: landed.append((name, size, from_disk)),
+    )
+    assert sorted(landed) == [("a.aes", 15, False), ("b.aes", 15, False), ("cached.aes", 7, True)]
+    assert cache.fetches == 3 and cache.contains("a.aes") and cache.contains("b.aes")
+    try:
+        extract_mod.warm_cache(cache, MirrorSource(), ["missing.aes"], 2)
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("warm_cache swallowed a failed download")
+
+
+def check_s3_fetch_resumes_with_range() -> None:
+    from botocore.exceptions import ResponseStreamingError
+
+    payload = bytes(range(256)) * 64
+    requests: list[dict[str, object]] = []
+
+    class DroppingBody:
+        def __init__(self, data: bytes, drop_after: int | None):
+            self._buf = io.BytesIO(data)
+            self._left = drop_after
+
+        def read(self, amt: int) -> bytes:
+            if self._left is not None and self._left <= 0:
+                raise ResponseStreamingError(error="connection reset")
+            if self._left is not None:
+                amt = min(amt, self._left)
+                self._left -= amt
+            return self._buf.read(amt)
+
+    class FakeClient:
+        def get_object(self, **request: object) -> dict[str, object]:
+            requests.append(request)
+            start = 0
+            if "Range" in request:
+                start = int(str(request["Range"]).removeprefix("bytes=").removesuffix("-"))
+            drop_after = 5000 if len(requests) == 1 else None
+            body = payload[start:]
+            return {"Body": DroppingBody(body, drop_after), "ContentLength": len(body), "ETag": '"v1"'}
+
+    source = object.__new__(extract_mod.S3Source)
+    source._bucket = "bucket"
+    source._prefix = "host/sub"
+    source._client = FakeClient()
+    assert source.fetch("vol1.aes") == payload
+    assert requests[0] == {"Bucket": "bucket", "Key": "host/sub/vol1.aes"}
+    assert requests[1] == {
+        "Bucket": "bucket",
+        "Key": "host/sub/vol1.aes",
+        "Range": "bytes=5000-",
+        "IfMatch": '"v1"',
+    }
+
+
+def check_fetch_many_bounds_in_flight() -> None:
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    pulled: list[str] = []
+
+    class SlowSource(extract_mod.Source):
+        def fetch(self, volume_name: str) -> bytes:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return volume_name.encode("ascii")
+
+    def names():
+        for n in range(20):
+            pulled.append(f"vol{n}.aes")
+            yield f"vol{n}.aes"
+
+    got = dict(SlowSource().fetch_many(names(), 4))
+    assert got == {f"vol{n}.aes": f"vol{n}.aes".encode("ascii") for n in range(20)}
+    assert 1 < peak <= 4
+
+    # Stopping early leaves the rest of the list unrequested.
+    pulled.clear()
+    batch = SlowSource().fetch_many(names(), 2)
+    next(batch)
+    batch.close()
+    assert len(pulled) <= 3
+
+    # A failed fetch surfaces to the caller like a sequential fetch would.
+    class FailingSource(extract_mod.Source):
+        def fetch(self, volume_name: str) -> bytes:
+            extract_mod.fail(f"missing volume on R2: {volume_name}", EXIT_OPEN_ERR)
+
+    expect_exit(EXIT_OPEN_ERR, lambda: list(FailingSource().fetch_many(["vol1.aes"], 2)))
+
+
+def check_s3_source_against_moto_server(work: Path) -> None:
+    """S3Source speaks real S3 HTTP: GET, Range resume and pooled fetch_many."""
+    try:
+        import boto3
+        from moto.server import ThreadedMotoServer
+    except ImportError as exc:
+        print(f"skipping S3Source moto server check: {exc}", file=sys.stderr)
+        return
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        endpoint = f"http://{host}:{port}"
+        client = boto3.client(
+            "s3",
+            endpoint_url=endpoint,
+            region_name="us-east-1",
+            aws_access_key_id="test",
+            aws_secret_access_key="test",
+        )
+        client.create_bucket(Bucket="backups")
+        bodies = {f"vol{n}.aes": bytes([n]) * (3000 + n) for n in range(12)}
+        for name, body in bodies.items():
+            client.put_object(Bucket="backups", Key=f"host/{name}", Body=body)
+
+        source = extract_mod.S3Source(
+            endpoint, "us-east-1", "backups", "host/", "test", "test", max_connections=4
+        )
+        assert source.fetch("vol1.aes") == bodies["vol1.aes"]
+        tail = io.BytesIO()
+        source.fetch_into("vol2.aes", tail, 1000)
+        assert tail.getvalue() == bodies["vol2.aes"][1000:]
+        assert dict(source.fetch_many(bodies, 4)) == bodies
+        expect_exit(EXIT_OPEN_ERR, source.fetch, "missing.aes")
+
+        cache = EncryptedCache(str(work / "moto-cache"), 1 << 20)
+        stream, from_disk = cache.open_from_source("vol3.aes", source)
+        with stream:
+            assert (stream.read(), from_disk) == (bodies["vol3.aes"], False)
+        assert cache.contains("vol3.aes")
+    finally:
+        server.stop()
+
+
+def check_stage_times_trace_only_labelled(work: Path) -> None:
+    stages = extract_mod.StageTimes(trace=True)
+    with stages.span("fetch", "vol1.aes") as span:
+        span.bytes = 10
+    tally = stages.tally()
+    assert tally is not None
+    for _ in range(3):
+        tally.add("hash", time.perf_counter(), 4)
+    stages.merge(tally)
+    try:
+        with stages.span("write"):
+            raise OSError("disk full")
+    except OSError:
+        pass
+    summary = stages.summary()
+    assert summary["fetch"]["bytes"] == 10 and summary["fetch"]["calls"] == 1
+    assert summary["hash"] == {"seconds": summary["hash"]["seconds"], "bytes": 12, "calls": 3}
+    assert summary["write"]["calls"] == 1  # failed spans still count
+    # Per-block tallies are counted but never traced.
+    assert [(event["name"], event["args"]) for event in stages.events or []] == [
+        ("fetch", {"label": "vol1.aes", "bytes": 10})
+    ]
+    trace = work / "stages.trace.json"
+    stages.write_trace(str(trace))
+    assert stat.S_IMODE(trace.stat().st_mode) == 0o600
+    assert json.loads(trace.read_text(encoding="utf-8"))["traceEvents"][0]["ph"] == "X"
+
+    # Without --json/--trace nothing is timed and the block loop gets no tally.
+    quiet = extract_mod.StageTimes(enabled=False)
+    with quiet.span("fetch", "vol1.aes") as span:
+        span.bytes = 10
+    assert quiet.tally() is None and quiet.summary() == {}
+
+
 def check_volume_name_rejection(work: Path) -> None:
     source_root = work / "source-root"
     source_root.mkdir()
@@ -379,25 +820,160 @@ def check_block_hash_before_sink() -> None:
         def block_refs(self, _blockset_id: int, _expected_size: int | None) -> list[BlockRef]:
             return [BlockRef("vol1.aes", expected_hash, 3)]
 
-    extractor = object.__new__(Extractor)
+    extractor = _bare_extractor(object(), object())
     extractor.block_hash_algo = "SHA256"
     extractor.file_hash_algo = "SHA256"
     extractor.resolver = FakeResolver()
 
-    def fetch_bad_block(volume: str, block_hash: bytes) -> bytes:
-        block = b"bad"
-        extractor._verify_block_hash(volume, block_hash, block)
-        return block
-
-    extractor._fetch_block_bytes = fetch_bad_block
-    written: list[bytes] = []
+    extractor._read_block = lambda _volume, _block_hash, _tally=None: (b"bad", False)
+    # Inline and pooled verification must both refuse before the sink.
+    for hash_pool in (None, ThreadPoolExecutor(max_workers=2)):
+        extractor._hash_pool = hash_pool
+        extractor._hash_window = 4
+        written: list[bytes] = []
+        try:
+            extractor.extract_file(1, "/bad.bin", written.append, ExtractStats())
+        except SystemExit as exc:
+            assert exc.code == EXIT_DATA_ERR
+        else:
+            raise AssertionError("block hash mismatch should fail")
+        finally:
+            if hash_pool is not None:
+                hash_pool.shutdown()
+        assert written == []
+
+
+def check_shared_blocks_reuse_written_regions(work: Path) -> None:
+    shared, unique_a, unique_b = (bytes([n]) * 1024 for n in (1, 2, 3))
+    plans = [
+        _file_plan(1, "/f1", [shared, unique_a, shared]),
+        _file_plan(2, "/f2", [unique_b, shared]),
+    ]
+    extractor, reads = _serving_extractor([shared, unique_a, unique_b])
+    extractor.clone_candidates = extract_mod.shared_block_hashes(plans)
+    assert extractor.clone_candidates == {hashlib.sha256(shared).digest()}
+    stats = ExtractStats()
+    targets = [work / "clone-out" / "one.bin", work / "clone-out" / "two.bin"]
+    for file_plan, target in zip(plans, targets):
+        stats.merge(extract_mod._write_target(extractor, file_plan, target))
+
+    assert targets[0].read_bytes() == shared + unique_a + shared
+    assert targets[1].read_bytes() == unique_b + shared
+    # The shared block came from its volume once; the repeat in the same
+    # file and the one in the next file were taken from the written output.
+    assert reads == [shared, unique_a, unique_b]
+    assert stats.files == 2
+
+    # A region that no longer holds the block is not reused.
+    extractor._written[hashlib.sha256(shared).digest()] = (targets[1], 0)
+    reads.clear()
+    extract_mod._write_target(extractor, plans[1], work / "clone-out" / "three.bin")
+    assert reads == [unique_b, shared]
+    assert (work / "clone-out" / "three.bin").read_bytes() == unique_b + shared
+
+
+def check_output_clone_reflinks_only_aligned_ranges(work: Path) -> None:
+    src_path = work / "clone-src.bin"
+    src_path.write_bytes(bytes(range(256)) * 32)
+    ioctls: list[tuple[int, int]] = []
+    real_ioctl = extract_mod.fcntl.ioctl
+
+    def refusing_ioctl(fd: int, request: int, arg: bytes) -> None:
+        _src, src_offset, length, _dest = extract_mod.FILE_CLONE_RANGE.unpack(arg)
+        ioctls.append((src_offset, length))
+        raise OSError(errno.EOPNOTSUPP, "no reflinks here")
+
+    src_fd = os.open(str(src_path), os.O_RDONLY)
+    dest_fd = os.open(str(work / "clone-dest.bin"), os.O_RDWR | os.O_CREAT, 0o600)
+    extract_mod.fcntl.ioctl = refusing_ioctl
     try:
-        extractor.extract_file(1, "/bad.bin", written.append, ExtractStats())
-    except SystemExit as exc:
-        assert exc.code == EXIT_DATA_ERR
-    else:
-        raise AssertionError("block hash mismatch should fail")
-    assert written == []
+        out = extract_mod.OutputFile(dest_fd)
+        out._clone_align = 4096
+        # An unaligned range never reaches the ioctl, and does not switch
+        # reflinks off for the aligned ones that follow.
+        out(b"x" * 100)
+        out.clone(src_fd, 0, 1000)
+        assert ioctls == [] and out._reflink
+        out.skip(4096 - out.offset)
+        out.clone(src_fd, 4096, 4096)
+        assert ioctls == [(4096, 4096)] and not out._reflink
+        out.clone(src_fd, 0, 4096)
+        assert ioctls == [(4096, 4096)]
+    finally:
+        extract_mod.fcntl.ioctl = real_ioctl
+        os.close(src_fd)
+        os.close(dest_fd)
+
+
+def check_delta_against_reads_only_differing_blocks(work: Path) -> None:
+    good = [bytes([n]) * 1024 for n in (1, 2, 3)] + [b"tail"]
+    plan = _file_plan(1, "/db.sqlite", good)
+    local = work / "delta" / "db.sqlite"
+    _ensure_private_dir(local.parent)
+    local.write_bytes(good[0] + b"\xff" * 1024 + good[2] + b"tail")
+
+    extractor, reads = _serving_extractor(good, blocksize=1024)
+    assert extractor.seed_delta(plan, local) == 2 * 1024 + 4
+    # Restored in place: the local copy is both the basis and the target.
+    stats = extract_mod._write_target(extractor, plan, local)
+    assert local.read_bytes() == b"".join(good)
+    assert reads == [good[1]]
+    assert stats.files == 1
+
+    missing = work / "delta" / "missing"
+    expect_exit(EXIT_OPEN_ERR, extractor.seed_delta, plan, missing)
+
+
+def check_zero_blocks_become_holes(work: Path) -> None:
+    block_size = 64 * 1024
+    zero = bytes(block_size)
+    data = b"d" * block_size
+    payload = zero + data + zero + zero
+    plan = _file_plan(1, "/disk.img", [zero, data, zero, zero])
+    extractor, reads = _serving_extractor([zero, data])
+    extractor._zero_block = zero
+    extractor._zero_hash = hashlib.sha256(zero).digest()
+    target = work / "sparse-out" / "disk.img"
+    stats = extract_mod._write_target(extractor, plan, target)
+    # Zero blocks are known by hash: never read, never written, and the
+    # trailing hole still counts toward the file size.
+    assert reads == [data]
+    assert target.read_bytes() == payload
+    assert stats.bytes_sparse == 3 * block_size
+    assert target.stat().st_blocks * 512 < len(payload)
+
+    # Streams cannot seek, so they still receive the zeros.
+    written: list[bytes] = []
+    extractor.write_file(plan, written.append, ExtractStats())
+    assert b"".join(written) == payload
+
+
+def check_hash_pool_matches_inline() -> None:
+    """Pooled verification writes the same bytes as inline verification.
+
+    Below ``HASHLIB_GIL_MINSIZE`` the pool stays off, so 1 KiB blocks take
+    the inline path; 64 KiB blocks do use it. Speed is compared by
+    ``bench_extract.py --hash-workers``, not here.
+    """
+    for block_size, pooled in ((1024, False), (64 * 1024, True)):
+        blocks = [os.urandom(block_size) for _ in range(1024 * 1024 // block_size)]
+        payload = b"".join(blocks)
+        plan = _file_plan(1, "/big.bin", blocks)
+        extractor, _reads = _serving_extractor(blocks, blocksize=block_size)
+        for workers in (0, 4):
+            extractor._hash_pool, extractor._hash_window = None, 0
+            extractor._start_hash_pool(workers)
+            uses_pool = extractor._hash_pool is not None
+            assert uses_pool == (pooled and workers > 0), (block_size, workers)
+            out = io.BytesIO()
+            stats = ExtractStats()
+            try:
+                extractor.write_file(plan, out.write, stats)
+            finally:
+                if extractor._hash_pool is not None:
+                    extractor._hash_pool.shutdown()
+            assert out.getvalue() == payload, (block_size, workers)
+            assert stats.plaintext_size == len(payload) and stats.files == 1
 
 
 def check_volume_manifest_validation() -> None:
@@ -433,10 +1009,9 @@ def check_volume_manifest_validation() -> None:
     )
 
 
-def check_blocklist_lookup_batches_sql_vars() -> None:
+def check_blocklist_lookup_ignores_sql_var_limit() -> None:
     conn = sqlite3.connect(":memory:")
     conn.row_factory = sqlite3.Row
-    conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
     conn.executescript(
         """
         CREATE TABLE Remotevolume (
@@ -449,6 +1024,7 @@ def check_blocklist_lookup_batches_sql_vars() -> None:
           Size INTEGER,
           VolumeID INTEGER
         );
+        CREATE UNIQUE INDEX BlockHashSize ON Block (Hash, Size);
         CREATE TABLE BlocksetEntry (
           BlocksetID INTEGER,
           BlockID INTEGER,
@@ -495,12 +1071,71 @@ def check_blocklist_lookup_batches_sql_vars() -> None:
         assert block_hash == blocklist_hash
         return blocklist_blob
 
+    # Hashes go through a TEMP table, not an IN list: one bind per statement.
+    conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 1)
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
     resolver = BlockResolver(conn, "SHA256", fetch_block)
     refs = resolver.block_refs(777, len(content_hashes) * 1024)
+    conn.set_trace_callback(None)
 
     assert [ref.block_hash for ref in refs] == content_hashes
     assert {ref.volume_name for ref in refs} == {"content-vol.aes"}
     assert {ref.block_size for ref in refs} == {1024}
+    lookups = [sql for sql in statements if "temp.wanted_block_hash w" in sql]
+    assert len(lookups) == 1
+    plan = " ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {lookups[0]}"))
+    assert "BlockHashSize" in plan, plan
+
+
+def check_block_refs_many_dedupes_shared_hashes() -> None:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript(
+        """
+        CREATE TABLE Remotevolume (ID INTEGER PRIMARY KEY, Name TEXT);
+        CREATE TABLE Block (ID INTEGER PRIMARY KEY, Hash TEXT, Size INTEGER, VolumeID INTEGER);
+        CREATE TABLE BlocksetEntry (BlocksetID INTEGER, BlockID INTEGER, "Index" INTEGER);
+        CREATE TABLE BlocklistHash (BlocksetID INTEGER, "Index" INTEGER, Hash TEXT);
+        INSERT INTO Remotevolume VALUES (1, 'list-vol.aes'), (2, 'content-vol.aes');
+        """
+    )
+
+    def b64(hash_bytes: bytes) -> str:
+        return base64.b64encode(hash_bytes).decode("ascii")
+
+    content_hashes = [hashlib.sha256(f"shared-{n}".encode("ascii")).digest() for n in range(4)]
+    blocklists = {
+        hashlib.sha256(b"list-a").digest(): b"".join(content_hashes[:2]),
+        hashlib.sha256(b"list-b").digest(): b"".join(content_hashes[2:]),
+    }
+    for block_id, (list_hash, blob) in enumerate(blocklists.items(), start=1):
+        conn.execute("INSERT INTO Block VALUES (?, ?, ?, 1)", (block_id, b64(list_hash), len(blob)))
+    for block_id, content_hash in enumerate(content_hashes, start=10):
+        conn.execute("INSERT INTO Block VALUES (?, ?, 1024, 2)", (block_id, b64(content_hash)))
+    list_a, list_b = blocklists
+    # 801 and 802 share their first blocklist block; 803 is BlocksetEntry-backed.
+    conn.executemany(
+        "INSERT INTO BlocklistHash VALUES (?, ?, ?)",
+        [(801, 0, b64(list_a)), (801, 1, b64(list_b)), (802, 0, b64(list_a))],
+    )
+    conn.execute("INSERT INTO BlocksetEntry VALUES (803, 10, 0)")
+    fetched: list[bytes] = []
+
+    def fetch_block(volume: str, block_hash: bytes) -> bytes:
+        assert volume == "list-vol.aes"
+        fetched.append(block_hash)
+        return blocklists[block_hash]
+
+    resolver = BlockResolver(conn, "SHA256", fetch_block)
+    refs = resolver.block_refs_many([(801, 4096), (802, 2048), (803, 1024), (804, 0)])
+
+    assert sorted(fetched) == sorted(blocklists)
+    assert [ref.block_hash for ref in refs[801]] == content_hashes
+    assert [ref.block_hash for ref in refs[802]] == content_hashes[:2]
+    assert [ref.block_hash for ref in refs[803]] == content_hashes[:1]
+    assert refs[804] == []
+    assert {ref.volume_name for ref in refs[801]} == {"content-vol.aes"}
 
 
 def check_blocksetentry_invalid_hash_exit_code() -> None:
@@ -613,7 +1248,7 @@ def check_main_normalizes_include_pattern(work: Path) -> None:
     real_glob_paths = extract_mod._glob_paths
 
     class DummyAesDecrypter:
-        def __init__(self, _passphrase: str):
+        def __init__(self, _passphrase: str, *_spool: object):
             pass
 
     def capture_glob_paths(
@@ -658,6 +1293,144 @@ def check_main_normalizes_include_pattern(work: Path) -> None:
             os.environ[passphrase_env] = old_passphrase
 
 
+def check_snapshot_plans_merge_join() -> None:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript(
+        """
+        CREATE TABLE Remotevolume (ID INTEGER PRIMARY KEY, Name TEXT);
+        CREATE TABLE Block (ID INTEGER PRIMARY KEY, Hash TEXT, Size INTEGER, VolumeID INTEGER);
+        CREATE TABLE Blockset (ID INTEGER PRIMARY KEY, Length INTEGER, FullHash TEXT);
+        CREATE TABLE BlocksetEntry (BlocksetID INTEGER, "Index" INTEGER, BlockID INTEGER);
+        CREATE TABLE BlocklistHash (BlocksetID INTEGER, "Index" INTEGER, Hash TEXT);
+        CREATE TABLE File (ID INTEGER PRIMARY KEY, Path TEXT, BlocksetID INTEGER);
+        CREATE TABLE FilesetEntry (FilesetID INTEGER, FileID INTEGER, Lastmodified INTEGER);
+        INSERT INTO Remotevolume VALUES (1, 'v1.aes'), (2, 'v2.aes');
+        """
+    )
+    hashes = [hashlib.sha256(bytes([n])).digest() for n in range(3)]
+    for block_id, (raw, volume_id) in enumerate(zip(hashes, (1, 2, 1)), start=1):
+        conn.execute(
+            "INSERT INTO Block VALUES (?, ?, 1024, ?)",
+            (block_id, base64.b64encode(raw).decode("ascii"), volume_id),
+        )
+    conn.executescript(
+        """
+        INSERT INTO Blockset VALUES (10, 2048, 'x'), (11, 1024, 'y'), (12, 0, 'z');
+        INSERT INTO BlocksetEntry VALUES (10, 1, 2), (10, 0, 1), (11, 0, 3);
+        INSERT INTO File VALUES
+          (1, '/home/user/b.bin', 10),
+          (2, '/home/user/a-copy.bin', 10),
+          (3, '/home/username/c.bin', 11),
+          (4, '/home/user/empty', 12),
+          (5, '/home/user', -100);
+        INSERT INTO FilesetEntry VALUES
+          (7, 1, 1700000001), (7, 2, 1700000002), (7, 3, 1700000003),
+          (7, 4, 1700000004), (7, 5, 1700000005), (8, 3, 1600000003);
+        """
+    )
+
+    def no_blocklist(_volume: str, _block_hash: bytes) -> bytes:
+        raise AssertionError("BlocksetEntry covers every blockset")
+
+    resolver = extract_mod.BlockResolver(conn, "SHA256", no_blocklist)
+    plans = list(resolver.snapshot_plans(7))
+    assert [plan.entry.path for plan in plans] == [
+        "/home/user/a-copy.bin",
+        "/home/user/b.bin",
+        "/home/username/c.bin",
+        "/home/user/empty",
+    ]
+    assert [ref.block_hash for ref in plans[0].refs] == hashes[:2]
+    assert plans[0].refs == plans[1].refs
+    assert [plan.entry.mtime for plan in plans] == [1700000002, 1700000001, 1700000003, 1700000004]
+    assert [ref.volume_name for ref in plans[2].refs] == ["v1.aes"]
+    assert plans[3].refs == []
+
+    prefix = extract_mod._normalize_restore_prefix("home/user")
+    assert prefix == "/home/user/"
+    assert [plan.entry.path for plan in resolver.snapshot_plans(7, prefix)] == [
+        "/home/user/a-copy.bin",
+        "/home/user/b.bin",
+        "/home/user/empty",
+    ]
+    assert extract_mod._normalize_restore_prefix("/") == "/"
+
+    # Dropping a whole blockset group must still leave the entries cursor
+    # aligned for the next one.
+    kept = list(resolver.snapshot_plans(7, keep=lambda entry: entry.blockset_id != 10))
+    assert [plan.entry.path for plan in kept] == ["/home/username/c.bin", "/home/user/empty"]
+    assert [ref.volume_name for ref in kept[0].refs] == ["v1.aes"]
+
+
+def check_restore_journal_resume(work: Path) -> None:
+    out = work / "journal-out"
+    _ensure_private_dir(out)
+    done = FileEntry(file_id=1, path="/a", blockset_id=1, full_size=3, full_hash="h-a")
+    gone = FileEntry(file_id=2, path="/b", blockset_id=2, full_size=3, full_hash="h-b")
+    (out / "a").write_bytes(b"aaa")
+    journal = RestoreJournal(out, "test", 7, resume=False)
+    journal.record(done)
+    journal.record(gone)
+    journal.close()
+    assert stat.S_IMODE((out / JOURNAL_NAME).stat().st_mode) == 0o600
+    with open(out / JOURNAL_NAME, "ab") as fh:
+        fh.write(b'{"path":"/c","si')  # torn by a crash mid-write
+
+    journal = RestoreJournal(out, "test", 7, resume=True)
+    assert journal.is_done(done, out / "a")
+    assert not journal.is_done(gone, out / "b")  # target never landed
+    changed = FileEntry(file_id=1, path="/a", blockset_id=3, full_size=3, full_hash="h-a2")
+    assert not journal.is_done(changed, out / "a")
+    journal.record(gone)
+    journal.close()
+    lines = (out / JOURNAL_NAME).read_bytes().splitlines()
+    assert json.loads(lines[-1])["path"] == "/b"
+
+    expect_exit(EXIT_USAGE, RestoreJournal, out, "test", 8, True)
+    fresh = RestoreJournal(out, "test", 8, resume=False)
+    fresh.close()
+    resumed = RestoreJournal(out, "test", 8, resume=True)
+    assert resumed.done == {}
+    resumed.close()
+
+
+def check_find_identical_compares_size_then_hash(work: Path) -> None:
+    out = work / "identical-out"
+    _ensure_private_dir(out)
+
+    def entry(name: str, data: bytes) -> FileEntry:
+        digest = base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+        return FileEntry(
+            file_id=0, path=f"/{name}", blockset_id=0, full_size=len(data), full_hash=digest
+        )
+
+    (out / "same").write_bytes(b"same bytes")
+    (out / "flipped").write_bytes(b"FLIPPED")
+    (out / "short").write_bytes(b"short")
+    (out / "link").symlink_to(out / "same")
+    candidates = [
+        (entry("same", b"same bytes"), out / "same"),
+        (entry("flipped", b"flipped"), out / "flipped"),
+        (entry("short", b"shorter"), out / "short"),
+        (entry("missing", b"missing"), out / "missing"),
+        (entry("link", b"same bytes"), out / "link"),
+    ]
+    assert extract_mod.find_identical(candidates, "SHA256", 2) == {"/same"}
+    assert extract_mod.find_identical(candidates, None, 2) == {"/same", "/flipped"}
+    unhashed = FileEntry(file_id=0, path="/same", blockset_id=0, full_size=10, full_hash=None)
+    assert extract_mod.find_identical([(unhashed, out / "same")], "SHA256", 1) == set()
+
+
+def check_bulk_modes_are_exclusive() -> None:
+    expect_exit(
+        EXIT_USAGE,
+        extract_mod.main,
+        ["test", "--all", "--prefix", "/home", "--output-dir", "/tmp/out"],
+    )
+    expect_exit(EXIT_USAGE, extract_mod.main, ["test", "--all"])
+
+
 def check_include_rejects_output_flag() -> None:
     expect_exit(
         EXIT_USAGE,
@@ -674,18 +1447,67 @@ def check_include_rejects_output_flag() -> None:
     )
 
 
+def check_tar_stream_members() -> None:
+    chunks: list[bytes] = []
+    archive = extract_mod.TarStream(lambda data: chunks.append(bytes(data)))
+    files = [("/srv/a.bin", b"x" * 700, 1700000000), ("/srv/sub/\u00e9.txt", b"", None)]
+    for path, data, mtime in files:
+        entry = FileEntry(
+            file_id=0, path=path, blockset_id=0, full_size=len(data), full_hash=None, mtime=mtime
+        )
+        with archive.member(entry) as write:
+            write(data[:500])
+            write(data[500:])
+    archive.close()
+    stream = b"".join(chunks)
+    assert len(stream) % tarfile.BLOCKSIZE == 0
+    with tarfile.open(fileobj=io.BytesIO(stream)) as tar:
+        members = tar.getmembers()
+        assert [m.name for m in members] == ["srv/a.bin", "srv/sub/\u00e9.txt"]
+        assert [m.mtime for m in members] == [1700000000, 0]
+        assert all(m.isfile() and m.mode == 0o600 for m in members)
+        assert tar.extractfile(members[0]).read() == b"x" * 700
+    expect_exit(EXIT_USAGE, extract_mod._archive_member_name, "/srv/../etc/passwd")
+
+
+def check_output_format_needs_bulk_mode_and_output() -> None:
+    expect_exit(
+        EXIT_USAGE,
+        extract_mod.main,
+        ["test", "/tiny.txt", "--output", "/tmp/out.bin", "--output-format", "tar"],
+    )
+    expect_exit(
+        EXIT_USAGE,
+        extract_mod.main,
+        ["test", "--all", "--output-dir", "/tmp/out", "--output-format", "tar"],
+    )
+    expect_exit(
+        EXIT_USAGE,
+        extract_mod.main,
+        ["test", "--all", "--output", "-", "--output-format", "tar", "--workers", "2"],
+    )
+
+
+def check_workers_require_include() -> None:
+    expect_exit(
+        EXIT_USAGE,
+        extract_mod.main,
+        ["test", "/tiny.txt", "--output", "/tmp/out.bin", "--workers", "2"],
+    )
+
+
 def check_open_volume_lru() -> None:
     class DummyCache:
-        def get_with_status(self, name: str, _fetcher: object) -> tuple[bytes, bool]:
-            return b"encrypted-" + name.encode("ascii"), False
+        def open_from_source(self, name: str, _source: object) -> tuple[io.BytesIO, bool]:
+            return io.BytesIO(b"encrypted-" + name.encode("ascii")), False
 
     class DummySource:
         def fetch(self, name: str) -> bytes:
             return b"encrypted-" + name.encode("ascii")
 
     class DummyDecrypter:
-        def decrypt(self, encrypted: bytes, _name: str) -> bytes:
-            return encrypted
+        def decrypt(self, encrypted: io.BytesIO, _name: str) -> bytes:
+            return encrypted.read()
 
     class DummyOpenedVolume:
         created: list[DummyOpenedVolume] = []
@@ -708,14 +1530,11 @@ def check_open_volume_lru() -> None:
     original_opened_volume = extract_mod.OpenedVolume
     extract_mod.OpenedVolume = DummyOpenedVolume
     try:
-        extractor = object.__new__(Extractor)
-        extractor.cache = DummyCache()
-        extractor.source = DummySource()
+        extractor = _bare_extractor(DummySource(), DummyCache())
         extractor.decrypter = DummyDecrypter()
         extractor.blocksize = 1024
         extractor.block_hash_algo = "SHA256"
         extractor.file_hash_algo = "SHA256"
-        extractor._open_volumes = collections.OrderedDict()
         for index in range(extract_mod.MAX_OPEN_VOLUMES + 1):
             extractor._open_volume(f"vol{index}.aes")
         assert len(extractor._open_volumes) == extract_mod.MAX_OPEN_VOLUMES
@@ -731,16 +1550,17 @@ def check_open_volume_evicts_corrupt_cache_hit(work: Path) -> None:
     cache = EncryptedCache(str(cache_root), 1024)
     fetches: list[str] = []
 
-    class DummySource:
+    class DummySource(extract_mod.Source):
         def fetch(self, name: str) -> bytes:
             fetches.append(name)
             return b"good"
 
     class DummyDecrypter:
-        def decrypt(self, encrypted: bytes, name: str) -> bytes:
-            if encrypted == b"bad":
+        def decrypt(self, encrypted: io.BufferedReader, name: str) -> bytes:
+            data = encrypted.read()
+            if data == b"bad":
                 raise extract_mod.AesDecryptError(f"bad cache hit for {name}")
-            return encrypted
+            return data
 
     class DummyOpenedVolume:
         def __init__(
@@ -761,14 +1581,11 @@ def check_open_volume_evicts_corrupt_cache_hit(work: Path) -> None:
     original_opened_volume = extract_mod.OpenedVolume
     extract_mod.OpenedVolume = DummyOpenedVolume
     try:
-        extractor = object.__new__(Extractor)
-        extractor.cache = cache
-        extractor.source = DummySource()
+        extractor = _bare_extractor(DummySource(), cache)
         extractor.decrypter = DummyDecrypter()
         extractor.blocksize = 1024
         extractor.block_hash_algo = "SHA256"
         extractor.file_hash_algo = "SHA256"
-        extractor._open_volumes = collections.OrderedDict()
 
         opened = extractor._open_volume("vol1.aes")
 
@@ -780,6 +1597,349 @@ def check_open_volume_evicts_corrupt_cache_hit(work: Path) -> None:
         extract_mod.OpenedVolume = original_opened_volume
 
 
+def check_open_volume_single_flight(work: Path) -> None:
+    cache = EncryptedCache(str(work / "single-flight-cache"), 0)
+    fetches: list[str] = []
+
+    class SlowSource:
+        def fetch(self, name: str) -> bytes:
+            fetches.append(name)
+            time.sleep(0.05)
+            return b"encrypted-" + name.encode("ascii")
+
+    class DummyDecrypter:
+        def decrypt(self, encrypted: io.BytesIO, _name: str) -> bytes:
+            return encrypted.read()
+
+    class DummyOpenedVolume:
+        def __init__(
+            self,
+            name: str,
+            _decrypted: bytes,
+            _expected_blocksize: int | None,
+            _expected_block_hash: str,
+            _expected_file_hash: str,
+        ):
+            self.name = name
+            self.closed = False
+
+        def close(self) -> None:
+            self.closed = True
+
+    original_opened_volume = extract_mod.OpenedVolume
+    extract_mod.OpenedVolume = DummyOpenedVolume
+    try:
+        extractor = _bare_extractor(SlowSource(), cache)
+        extractor.decrypter = DummyDecrypter()
+        extractor.blocksize = 1024
+        extractor.block_hash_algo = "SHA256"
+        extractor.file_hash_algo = "SHA256"
+        opened: list[object] = []
+        threads = [
+            threading.Thread(target=lambda: opened.append(extractor._open_volume("vol1.aes")))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert fetches == ["vol1.aes"]
+        assert len({id(vol) for vol in opened}) == 1
+
+        # A volume another writer is reading from survives LRU eviction
+        # and is closed once that writer unpins it.
+        pinned = extractor._open_volume("vol1.aes", pin=True)
+        for index in range(extract_mod.MAX_OPEN_VOLUMES):
+            extractor._open_volume(f"other{index}.aes")
+        assert "vol1.aes" not in extractor._open_volumes
+        assert not pinned.closed
+        extractor._unpin(pinned)
+        assert pinned.closed
+    finally:
+        extract_mod.OpenedVolume = original_opened_volume
+
+
+def _volume_zip(blocks: list[bytes]) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        manifest = {"Version": 2, "Blocksize": 1024, "BlockHash": "SHA256", "FileHash": "SHA256"}
+        zf.writestr("manifest", json.dumps(manifest))
+        for index, block in enumerate(blocks):
+            name = extract_mod.base64url_name(hashlib.sha256(block).digest())
+            compress = zipfile.ZIP_DEFLATED if index % 2 else zipfile.ZIP_STORED
+            zf.writestr(name, block, compress_type=compress)
+    return buf.getvalue()
+
+
+def check_stored_blocks_are_zero_copy(work: Path) -> None:
+    blocks = [bytes([n]) * 1024 for n in range(4)]
+    plain = _volume_zip(blocks)
+    spooled = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    rolled = tempfile.TemporaryFile(dir=work)
+    for buf in (spooled, rolled):
+        buf.write(plain)
+        buf.seek(0)
+        vol = OpenedVolume("vol1.aes", buf, 1024, "SHA256", "SHA256")
+        got = [vol.block_bytes(hashlib.sha256(block).digest()) for block in blocks]
+        assert [bytes(block) for block in got] == blocks
+        # _volume_zip stores even-indexed blocks and deflates the rest.
+        assert [isinstance(block, memoryview) for block in got] == [True, False, True, False]
+        vol.close()
+        # A slice still in flight outlives the volume.
+        assert bytes(got[0]) == blocks[0]
+        del got
+
+
+def check_decrypted_cache_serves_indexed_blocks(work: Path) -> None:
+    root = work / "decrypted-cache"
+    blocks = [bytes([n]) * 1024 for n in range(4)]
+    plain = _volume_zip(blocks)
+    cache = extract_mod.DecryptedVolumeCache(str(root), 2 * len(plain))
+    cache.store(extract_mod.OpenedVolume("vol1.aes", plain, 1024, "SHA256", "SHA256"))
+    cache.close()
+
+    # A fresh instance reads the persisted index; no zip parse needed.
+    cache = extract_mod.DecryptedVolumeCache(str(root), 2 * len(plain))
+    assert stat.S_IMODE(root.stat().st_mode) == 0o700
+    for entry in (root / "vol1.aes", root / extract_mod.DECRYPTED_INDEX_NAME):
+        assert stat.S_IMODE(entry.stat().st_mode) == 0o600
+    vol = cache.open("vol1.aes")
+    assert vol is not None
+    try:
+        for block in blocks:
+            assert vol.block_bytes(hashlib.sha256(block).digest()) == block
+    finally:
+        vol.close()
+    assert cache.open("vol2.aes") is None
+
+    # Two more volumes exceed the cap; the least recently used one goes.
+    for name in ("vol2.aes", "vol3.aes"):
+        cache.store(extract_mod.OpenedVolume(name, plain, 1024, "SHA256", "SHA256"))
+    assert cache.open("vol1.aes") is None
+    assert not (root / "vol1.aes").exists()
+    assert cache.open("vol3.aes") is not None
+    cache.close()
+
+    # A volume larger than the cap is refused before any plaintext is copied.
+    small = extract_mod.DecryptedVolumeCache(str(work / "decrypted-small"), len(plain) - 1)
+    oversized = extract_mod.OpenedVolume("big.aes", plain, 1024, "SHA256", "SHA256")
+
+    def no_copy(_fh: BinaryIO) -> int:
+        raise AssertionError("oversized volume was copied into the cache")
+
+    oversized.copy_to = no_copy
+    small.store(oversized)
+    assert small.open("big.aes") is None
+    assert not list((work / "decrypted-small").glob("big.aes*"))
+    small.close()
+
+
+def check_decrypted_cache_shared_across_processes(work: Path) -> None:
+    """Instances sharing a root keep each other's partials and volumes.
+
+    A second descriptor's ``flock`` stands in for another process's store.
+    """
+    root = work / "decrypted-cache-shared"
+    blocks = [bytes([n]) * 1024 for n in range(4)]
+    plain = _volume_zip(blocks)
+    cap = 16 * len(plain)
+    _ensure_private_dir(root)
+    (root / "abandoned.aes.partial").write_bytes(b"abandoned")
+    (root / "unindexed.aes").write_bytes(b"unindexed")
+    in_flight = root / "vol0.aes.partial"
+    in_flight.write_bytes(b"in flight")
+    held = os.open(str(in_flight), os.O_RDONLY)
+    try:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        first = extract_mod.DecryptedVolumeCache(str(root), cap)
+        assert in_flight.read_bytes() == b"in flight"
+        assert not (root / "abandoned.aes.partial").exists()
+        assert not (root / "unindexed.aes").exists()
+        # The volume another writer is storing is skipped, not clobbered.
+        first.store(extract_mod.OpenedVolume("vol0.aes", plain, 1024, "SHA256", "SHA256"))
+        assert first.open("vol0.aes") is None
+        assert in_flight.read_bytes() == b"in flight"
+    finally:
+        os.close(held)
+
+    # Concurrent stores through separate index connections all land.
+    second = extract_mod.DecryptedVolumeCache(str(root), cap)
+    names = [f"vol{n}.aes" for n in range(1, 9)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(
+            pool.map(
+                lambda pair: pair[0].store(
+                    extract_mod.OpenedVolume(pair[1], plain, 1024, "SHA256", "SHA256")
+                ),
+                zip([first, second] * 4, names),
+            )
+        )
+    for cache in (first, second):
+        for name in names:
+            vol = cache.open(name)
+            assert vol is not None, name
+            vol.close()
+        cache.close()
+
+
+def check_block_cache_verifies_on_read(work: Path) -> None:
+    root = work / "block-cache"
+    cache = extract_mod.BlockCache(str(root), 2048, "SHA256")
+    blocks = [bytes([n]) * 1024 for n in range(3)]
+    hashes = [hashlib.sha256(block).digest() for block in blocks]
+    cache.put(hashes[0], blocks[0])
+    entry = root / extract_mod.base64url_name(hashes[0])
+    assert stat.S_IMODE(root.stat().st_mode) == 0o700
+    assert stat.S_IMODE(entry.stat().st_mode) == 0o600
+    assert cache.get(hashes[0]) == blocks[0]
+
+    # Bit rot on disk is caught on read and the entry is dropped.
+    entry.write_bytes(b"\xff" + blocks[0][1:])
+    assert cache.get(hashes[0]) is None
+    assert not entry.exists()
+    assert not cache.contains(hashes[0])
+
+    for block_hash, block in zip(hashes, blocks):
+        cache.put(block_hash, block)
+    assert not cache.contains(hashes[0])
+    assert cache.get(hashes[2]) == blocks[2]
+    # Survives a restart.
+    assert extract_mod.BlockCache(str(root), 2048, "SHA256").get(hashes[1]) == blocks[1]
+
+    # So does LRU order: a hit bumps the entry's mtime, so after a restart
+    # the older hit is still kept over the block nobody read since.
+    entries = [root / extract_mod.base64url_name(h) for h in hashes]
+    now = time.time()
+    os.utime(entries[1], (now - 20, now - 20))
+    os.utime(entries[2], (now - 10, now - 10))
+    assert cache.get(hashes[1]) == blocks[1]
+    restarted = extract_mod.BlockCache(str(root), 2048, "SHA256")
+    restarted.put(hashes[0], blocks[0])
+    assert restarted.contains(hashes[1]) and not restarted.contains(hashes[2])
+    assert entries[1].exists() and not entries[2].exists()
+
+
+def check_block_cache_shared_across_processes(work: Path) -> None:
+    """Writers sharing a block cache skip each other's partials.
+
+    ``flock`` locks belong to the open file, so a second descriptor in this
+    process stands in for another restore writing the same block.
+    """
+    root = work / "block-cache-shared"
+    blocks = [bytes([n]) * 1024 for n in range(3)]
+    hashes = [hashlib.sha256(block).digest() for block in blocks]
+    partials = [root / f"{extract_mod.base64url_name(h)}.partial" for h in hashes]
+    _ensure_private_dir(root)
+    partials[0].write_bytes(b"abandoned")
+    partials[1].write_bytes(b"in flight")
+    held = os.open(str(partials[1]), os.O_RDONLY)
+    try:
+        fcntl.flock(held, fcntl.LOCK_EX)
+        cache = extract_mod.BlockCache(str(root), 64 * 1024, "SHA256")
+        # Startup sweeps only the partial nobody holds.
+        assert not partials[0].exists() and partials[1].read_bytes() == b"in flight"
+        # Another writer owns this block's partial: not cached, not an error.
+        cache.put(hashes[1], blocks[1])
+        assert not cache.contains(hashes[1]) and cache._used_bytes == 0
+        assert partials[1].read_bytes() == b"in flight"
+    finally:
+        os.close(held)
+
+    # A partial swept before its writer renamed it is not committed.
+    fd = extract_mod._create_partial(partials[2], "block cache partial")
+    assert fd is not None
+    try:
+        partials[2].unlink()
+        target = root / extract_mod.base64url_name(hashes[2])
+        assert not extract_mod._commit_partial(fd, partials[2], target)
+        assert not target.exists()
+    finally:
+        os.close(fd)
+    cache.put(hashes[2], blocks[2])
+    assert cache.get(hashes[2]) == blocks[2]
+
+
+def check_prefetcher_reads_ahead_once(work: Path) -> None:
+    cache = EncryptedCache(str(work / "prefetch-cache"), 1024)
+    fetches: list[str] = []
+
+    class RecordingSource(extract_mod.Source):
+        def fetch(self, name: str) -> bytes:
+            fetches.append(name)
+            return b"body-" + name.encode("ascii")
+
+    prefetcher = VolumePrefetcher(RecordingSource(), cache, 2)
+    try:
+        prefetcher.schedule(["a.aes", "b.aes", "a.aes", "c.aes"])
+        prefetcher.schedule(["b.aes", "d.aes"])
+        for name in ("a.aes", "b.aes", "d.aes"):
+            opened = prefetcher.take(name)
+            assert opened is not None, name
+            stream, _hit = opened
+            with stream:
+                assert stream.read() == b"body-" + name.encode("ascii")
+            # Read-ahead lands in the cache like any other download.
+            assert cache.contains(name)
+        assert prefetcher.take("a.aes") is None
+        # c.aes was read ahead but another writer opened it first; releasing
+        # it keeps the body in the cache instead of dropping it.
+        prefetcher.release("c.aes")
+    finally:
+        prefetcher.close()
+    assert cache.contains("c.aes")
+    assert sorted(fetches) == ["a.aes", "b.aes", "c.aes", "d.aes"]
+    assert not list((work / "prefetch-cache").glob("*.partial"))
+
+
+def check_decrypt_spools_into_private_dir(work: Path) -> None:
+    import pyAesCrypt
+
+    plaintext = hashlib.sha256(b"spool").digest() * 2048  # 64 KiB
+    encrypted = io.BytesIO()
+    pyAesCrypt.encryptStream(io.BytesIO(plaintext), encrypted, "pw", 64 * 1024)
+    ciphertext = encrypted.getvalue()
+    spool_dir = work / "decrypt-spool"
+
+    decrypter = extract_mod.AesDecrypter("pw", str(spool_dir), 4096)
+    with decrypter.decrypt(io.BytesIO(ciphertext), "vol1.aes") as plain:
+        # Past the threshold the spool is an unlinked file: nothing gains a
+        # name under the cache root, which itself is forced to 0700.
+        assert plain._rolled
+        assert plain.read() == plaintext
+        assert list(spool_dir.iterdir()) == []
+    assert stat.S_IMODE(spool_dir.stat().st_mode) == 0o700
+
+    truncated = io.BytesIO(ciphertext[:-1])
+    try:
+        decrypter.decrypt(truncated, "vol1.aes")
+    except extract_mod.AesDecryptError as exc:
+        assert "AES decrypt failed for vol1.aes" in str(exc)
+    else:
+        raise AssertionError("truncated volume should fail to decrypt")
+
+
+def check_schedule_plans_groups_shared_volumes() -> None:
+    def plan(path: str, *volumes: str) -> FilePlan:
+        return FilePlan(
+            FileEntry(0, path, 0, None, None),
+            [BlockRef(volume, hashlib.sha256(volume.encode()).digest(), 1) for volume in volumes],
+        )
+
+    # Path order interleaves two volume families; with a one-slot LRU every
+    # switch reopens a volume the previous file already decrypted.
+    plans = [
+        plan("/a", "v1.aes"),
+        plan("/b", "v2.aes"),
+        plan("/c", "v1.aes"),
+        plan("/d", "v2.aes"),
+        plan("/empty"),
+    ]
+    order = extract_mod.schedule_plans(plans)
+    assert [plans[i].entry.path for i in order] == ["/empty", "/a", "/c", "/b", "/d"]
+    assert extract_mod.count_volume_opens(plans, capacity=1) == 4
+    assert extract_mod.count_volume_opens((plans[i] for i in order), capacity=1) == 2
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--work", required=True, type=Path)
@@ -788,6 +1948,15 @@ def main(argv: list[str] | None = None) -> int:
     check_cache_recovery(args.work)
     check_cache_cap_on_startup(args.work)
     check_cache_partial_removal_failure_message(args.work)
+    check_cache_bounds_orphan_partials(args.work)
+    check_cache_resumes_partial(args.work)
+    check_cache_index_skips_startup_scan(args.work)
+    check_cache_shared_between_processes(args.work)
+    check_warm_cache_downloads_without_decrypting(args.work)
+    check_s3_fetch_resumes_with_range()
+    check_fetch_many_bounds_in_flight()
+    check_s3_source_against_moto_server(args.work)
+    check_stage_times_trace_only_labelled(args.work)
     check_volume_name_rejection(args.work)
     check_file_source_requires_absolute_path(args.work)
     check_bucket_layout_uses_raw_subpath()
@@ -803,14 +1972,36 @@ def main(argv: list[str] | None = None) -> int:
     check_sink_partial_cleanup_not_following_symlink(args.work)
     check_cache_partial_symlink_not_followed(args.work)
     check_block_hash_before_sink()
+    check_hash_pool_matches_inline()
+    check_shared_blocks_reuse_written_regions(args.work)
+    check_output_clone_reflinks_only_aligned_ranges(args.work)
+    check_delta_against_reads_only_differing_blocks(args.work)
+    check_zero_blocks_become_holes(args.work)
     check_volume_manifest_validation()
-    check_blocklist_lookup_batches_sql_vars()
+    check_blocklist_lookup_ignores_sql_var_limit()
+    check_block_refs_many_dedupes_shared_hashes()
     check_blocksetentry_invalid_hash_exit_code()
     check_include_pattern_normalization()
     check_main_normalizes_include_pattern(args.work)
     check_include_rejects_output_flag()
+    check_workers_require_include()
+    check_tar_stream_members()
+    check_output_format_needs_bulk_mode_and_output()
+    check_snapshot_plans_merge_join()
+    check_restore_journal_resume(args.work)
+    check_find_identical_compares_size_then_hash(args.work)
+    check_bulk_modes_are_exclusive()
     check_open_volume_lru()
     check_open_volume_evicts_corrupt_cache_hit(args.work)
+    check_open_volume_single_flight(args.work)
+    check_stored_blocks_are_zero_copy(args.work)
+    check_decrypted_cache_serves_indexed_blocks(args.work)
+    check_decrypted_cache_shared_across_processes(args.work)
+    check_block_cache_verifies_on_read(args.work)
+    check_block_cache_shared_across_processes(args.work)
+    check_prefetcher_reads_ahead_once(args.work)
+    check_decrypt_spools_into_private_dir(args.work)
+    check_schedule_plans_groups_shared_volumes()
     return 0
 
 
@@ -19,6 +19,15 @@ Block sizes are deliberately tiny so the multi-blocklist code path is
 exercised by a 200 KiB file: ``blocksize=1024`` and ``hash_size=32`` give
 32 hashes per blocklist block, so a 200-block file needs 7 blocklist
 blocks.
+
+Shape flags turn the same generator into a benchmark fixture for
+``bench_extract.py``: ``--files N`` replaces the four correctness files
+with ``N`` generated ``/bench/fNNNNN.bin`` files whose sizes follow
+``--file-size`` and ``--size-distribution``; ``--block-size`` and
+``--dblock-size`` set the archive geometry; ``--dedupe-ratio`` draws that
+fraction of blocks from a small shared pool; ``--blocklist-heavy`` sends
+every multi-block file through ``BlocklistHash``. Without them the output
+is the correctness fixture described above.
 """
 
 from __future__ import annotations
@@ -28,7 +37,9 @@ import base64
 import hashlib
 import io
 import json
+import math
 import os
+import random
 import sqlite3
 import sys
 import zipfile
@@ -70,31 +81,34 @@ def base64url_name(raw: bytes) -> str:
     return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
 
 
-def manifest_dict() -> dict:
+def manifest_dict(block_size: int = BLOCK_SIZE) -> dict:
     return {
         "Version": 2,
         "Created": "20260101T000000Z",
         "Encoding": "utf8",
-        "Blocksize": BLOCK_SIZE,
+        "Blocksize": block_size,
         "BlockHash": HASH_NAME,
         "FileHash": HASH_NAME,
         "AppVersion": "fixture-0.1",
     }
 
 
-def split_blocks(payload: bytes) -> list[bytes]:
+def split_blocks(payload: bytes, block_size: int = BLOCK_SIZE) -> list[bytes]:
     """Split payload into blocksize chunks; the last chunk may be partial."""
-    return [payload[i : i + BLOCK_SIZE] for i in range(0, len(payload), BLOCK_SIZE)]
+    return [payload[i : i + block_size] for i in range(0, len(payload), block_size)]
 
 
-def write_zip_in_memory(entries: list[tuple[str, bytes]]) -> bytes:
+def write_zip_in_memory(
+    entries: list[tuple[str, bytes]],
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> bytes:
     """Build a zip archive in memory with given (name, data) entries.
 
     Uses ``ZIP_DEFLATED`` to mirror Duplicati's default; ``zipfile.ZipFile``
     on the read side accepts both stored and deflated entries.
     """
     buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+    with zipfile.ZipFile(buf, "w", compression=compression) as zf:
         for name, data in entries:
             zf.writestr(name, data)
     return buf.getvalue()
@@ -107,12 +121,101 @@ def encrypt_aes(plaintext: bytes, passphrase: str) -> bytes:
     return out.getvalue()
 
 
+def parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    factor = units.get(value[-1:].upper(), 1)
+    digits = value[:-1] if factor != 1 else value
+    try:
+        size = int(digits) * factor
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {value!r}") from None
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive, got {value!r}")
+    return size
+
+
+def bench_payloads(args: argparse.Namespace) -> dict[str, bytes]:
+    """Generated ``/bench/fNNNNN.bin`` payloads for the requested shape.
+
+    Deterministic for a given ``--seed``. Non-shared blocks are random, so
+    every chunk is a distinct content block unless ``--dedupe-ratio`` picks
+    it from the shared pool.
+    """
+    rng = random.Random(args.seed)
+    shared = [rng.randbytes(args.block_size) for _ in range(16)]
+    payloads: dict[str, bytes] = {}
+    for n in range(args.files):
+        if args.size_distribution == "uniform":
+            size = rng.randint(1, 2 * args.file_size)
+        elif args.size_distribution == "lognormal":
+            # sigma=1 with mu shifted by sigma^2/2 keeps the mean at --file-size.
+            size = max(1, int(rng.lognormvariate(math.log(args.file_size) - 0.5, 1.0)))
+        else:
+            size = args.file_size
+        full, tail = divmod(size, args.block_size)
+        chunks = [
+            rng.choice(shared) if rng.random() < args.dedupe_ratio else rng.randbytes(args.block_size)
+            for _ in range(full)
+        ]
+        chunks.append(rng.randbytes(tail))
+        payloads[f"/bench/f{n:05d}.bin"] = b"".join(chunks)
+    return payloads
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Generate a Duplicati test fixture.")
     parser.add_argument("--out", required=True, help="Output directory for .aes files")
     parser.add_argument("--db", required=True, help="Output SQLite path")
     parser.add_argument("--passphrase", required=True, help="Encryption passphrase")
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=0,
+        help="Generate N benchmark files instead of the correctness set",
+    )
+    parser.add_argument(
+        "--file-size",
+        type=parse_size,
+        default=64 * 1024,
+        help="Mean benchmark file size; K/M/G accepted (default: 64K)",
+    )
+    parser.add_argument(
+        "--size-distribution",
+        choices=("fixed", "uniform", "lognormal"),
+        default="fixed",
+        help="How benchmark file sizes spread around --file-size",
+    )
+    parser.add_argument("--block-size", type=parse_size, default=BLOCK_SIZE)
+    parser.add_argument(
+        "--dblock-size",
+        type=parse_size,
+        default=DBLOCK_TARGET,
+        help="Plaintext content per dblock volume",
+    )
+    parser.add_argument(
+        "--dedupe-ratio",
+        type=float,
+        default=0.0,
+        help="Fraction of benchmark blocks drawn from a shared pool (0..1)",
+    )
+    parser.add_argument(
+        "--blocklist-heavy",
+        action="store_true",
+        help="Use BlocklistHash for every multi-block file",
+    )
+    parser.add_argument(
+        "--stored",
+        action="store_true",
+        help="Store zip entries uncompressed instead of deflating them",
+    )
+    parser.add_argument("--seed", type=int, default=0)
     args = parser.parse_args()
+    if not 0.0 <= args.dedupe_ratio <= 1.0:
+        parser.error("--dedupe-ratio must be within 0..1")
+    if args.block_size % HASH_BYTES:
+        parser.error(f"--block-size must be a multiple of {HASH_BYTES}")
+    block_size = args.block_size
+    compression = zipfile.ZIP_STORED if args.stored else zipfile.ZIP_DEFLATED
 
     out = Path(args.out)
     out.mkdir(parents=True, exist_ok=True)
@@ -138,20 +241,21 @@ def main() -> int:
     #                      exactly one blocklist block, exercising the
     #                      BlocklistHash path with K=1.
     #   big:    200 KiB -> 200 blocks across 7 blocklist blocks (K>1).
-    single_blocklist_size = BLOCK_SIZE * (BLOCK_SIZE // HASH_BYTES)  # 32 KiB
-
-    payloads = {
-        "/tiny.txt": stream(b"tiny", 50),
-        "/medium.bin": stream(b"medium", 4096),
-        "/single.bin": stream(b"single", single_blocklist_size),
-        "/big.bin": stream(b"big", 204800),
-    }
+    single_blocklist_size = block_size * (block_size // HASH_BYTES)  # 32 KiB
+
+    if args.files > 0:
+        payloads = bench_payloads(args)
+    else:
+        payloads = {
+            "/tiny.txt": stream(b"tiny", 50),
+            "/medium.bin": stream(b"medium", 4096),
+            "/single.bin": stream(b"single", single_blocklist_size),
+            "/big.bin": stream(b"big", 204800),
+        }
 
     files = [
-        FileSpec(path="/tiny.txt", payload=payloads["/tiny.txt"], blockset_id=101),
-        FileSpec(path="/medium.bin", payload=payloads["/medium.bin"], blockset_id=102),
-        FileSpec(path="/single.bin", payload=payloads["/single.bin"], blockset_id=103),
-        FileSpec(path="/big.bin", payload=payloads["/big.bin"], blockset_id=104),
+        FileSpec(path=path, payload=payload, blockset_id=101 + n)
+        for n, (path, payload) in enumerate(payloads.items())
     ]
 
     for spec in files:
@@ -183,10 +287,11 @@ def main() -> int:
         next_block_id += 1
         return b
 
-    HASHES_PER_BLOCKLIST = BLOCK_SIZE // HASH_BYTES  # 32
+    HASHES_PER_BLOCKLIST = block_size // HASH_BYTES  # 32
+    blocklist_threshold = 2 if args.blocklist_heavy else HASHES_PER_BLOCKLIST
 
     for spec in files:
-        chunks = split_blocks(spec.payload)
+        chunks = split_blocks(spec.payload, block_size)
         content_blocks = [intern_block(c) for c in chunks]
         blocks_for_file[spec.blockset_id] = content_blocks
         # Decide if blocklist indirection applies.
@@ -195,10 +300,10 @@ def main() -> int:
         # blocklist blocks. The fixture switches at >= HASHES_PER_BLOCKLIST so
         # a 32-block file lands on exactly K=1 blocklist row (exercising the
         # single-row path), and a 200-block file lands on K=7 (multi-row).
-        if len(content_blocks) >= HASHES_PER_BLOCKLIST:
+        if len(content_blocks) >= blocklist_threshold:
             # Concatenate raw hashes, split into BLOCK_SIZE chunks.
             concat = b"".join(b.raw_hash for b in content_blocks)
-            list_payloads = split_blocks(concat)
+            list_payloads = split_blocks(concat, block_size)
             blocklist_blocks = [intern_block(p, is_blocklist=True) for p in list_payloads]
             blocklists_for_file[spec.blockset_id] = blocklist_blocks
             # Sentinel: BlocksetEntry empty -> extract.py falls back to BlocklistHash.
@@ -208,7 +313,7 @@ def main() -> int:
     current: list[Block] = []
     current_size = 0
     for b in block_pool.values():
-        if current_size + len(b.payload) > DBLOCK_TARGET and current:
+        if current_size + len(b.payload) > args.dblock_size and current:
             dblock_volumes.append(current)
             current = []
             current_size = 0
@@ -232,11 +337,11 @@ def main() -> int:
     passphrase = args.passphrase
     for idx, vol in enumerate(dblock_volumes):
         entries: list[tuple[str, bytes]] = [
-            ("manifest", json.dumps(manifest_dict()).encode("utf-8")),
+            ("manifest", json.dumps(manifest_dict(block_size)).encode("utf-8")),
         ]
         for b in vol:
             entries.append((base64url_name(b.raw_hash), b.payload))
-        zip_bytes = write_zip_in_memory(entries)
+        zip_bytes = write_zip_in_memory(entries, compression)
         aes_bytes = encrypt_aes(zip_bytes, passphrase)
         (out / dblock_names[idx]).write_bytes(aes_bytes)
 
@@ -257,7 +362,7 @@ def main() -> int:
             "volumesize": 0,
         }
         entries = [
-            ("manifest", json.dumps(manifest_dict()).encode("utf-8")),
+            ("manifest", json.dumps(manifest_dict(block_size)).encode("utf-8")),
             (f"vol/{zip_pointer_name}", json.dumps(index_payload).encode("utf-8")),
         ]
         for b in vol:
@@ -312,7 +417,7 @@ def main() -> int:
 
     dlist_zip = write_zip_in_memory(
         [
-            ("manifest", json.dumps(manifest_dict()).encode("utf-8")),
+            ("manifest", json.dumps(manifest_dict(block_size)).encode("utf-8")),
             ("filelist.json", json.dumps(filelist).encode("utf-8")),
         ]
     )
@@ -359,6 +464,7 @@ def main() -> int:
           Size INTEGER,
           VolumeID INTEGER
         );
+        CREATE UNIQUE INDEX BlockHashSize ON Block (Hash, Size);
         CREATE TABLE BlocklistHash (
           BlocksetID INTEGER,
           "Index" INTEGER,
@@ -369,6 +475,7 @@ def main() -> int:
           ID INTEGER PRIMARY KEY,
           Name TEXT,
           Type TEXT,
+          Size INTEGER,
           State TEXT
         );
         CREATE TABLE Fileset (
@@ -389,7 +496,7 @@ def main() -> int:
     cur.executemany(
         "INSERT INTO Configuration VALUES (?, ?)",
         [
-            ("blocksize", str(BLOCK_SIZE)),
+            ("blocksize", str(block_size)),
             ("blockhash", HASH_NAME),
             ("filehash", HASH_NAME),
             ("Version", "19"),
@@ -419,12 +526,12 @@ def main() -> int:
     # off because extract.py does not consume them).
     for idx, name in enumerate(dblock_names):
         cur.execute(
-            "INSERT INTO Remotevolume VALUES (?, ?, 'Blocks', 'Verified')",
-            (idx + 100, name),
+            "INSERT INTO Remotevolume VALUES (?, ?, 'Blocks', ?, 'Verified')",
+            (idx + 100, name, (out / name).stat().st_size),
         )
     cur.execute(
-        "INSERT INTO Remotevolume VALUES (?, ?, 'Files', 'Verified')",
-        (1, dlist_name),
+        "INSERT INTO Remotevolume VALUES (?, ?, 'Files', ?, 'Verified')",
+        (1, dlist_name, (out / dlist_name).stat().st_size),
     )
 
     # Fileset + FilesetEntry rows.